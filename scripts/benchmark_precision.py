@@ -0,0 +1,78 @@
+"""
+Benchmark overlays and storage with and without coordinate precision snapping.
+
+Usage::
+
+    python scripts/benchmark_precision.py                       # full precision vs 1e-6 and 1e-5 degrees
+    python scripts/benchmark_precision.py --grid-size 1e-6 --repeat 5
+"""
+import argparse
+import io
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from easyclimate_map import extract_outer_boundary, get_layer
+from easyclimate_map.precision import _save_geometries
+
+
+def _best(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _size(grid_size, *layers) -> tuple:
+    """Compressed size as cached (MiB) and number of vertices."""
+    geoms = np.concatenate([np.asarray(layer.geometry.values) for layer in layers])
+    buffer = io.BytesIO()
+    if grid_size is None:
+        np.savez_compressed(buffer, blob=np.frombuffer(b"".join(shapely.to_wkb(geoms)), dtype=np.uint8))
+    else:
+        _save_geometries(buffer, geoms, grid_size)
+    return buffer.getbuffer().nbytes / 2**20, int(shapely.get_num_coordinates(geoms).sum())
+
+
+def run(grid_size, repeat: int) -> dict:
+    provinces = get_layer("provinces_polygon", grid_size=grid_size).set_crs(4326, allow_override=True)
+    basins = get_layer("tp_basins", grid_size=grid_size).to_crs(4326)
+    size_mb, vertices = _size(grid_size, provinces, basins)
+    return {
+        "grid size": "full" if grid_size is None else f"{grid_size:g}",
+        "overlay (s)": _best(lambda: gpd.overlay(provinces, basins, how="intersection", keep_geom_type=True), repeat),
+        "union (s)": _best(lambda: shapely.union_all(provinces.geometry.values), repeat),
+        "outer boundary (s)": _best(lambda: extract_outer_boundary(provinces), repeat),
+        "stored (MiB)": size_mb,
+        "vertices": vertices,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--grid-size", type=float, nargs="*", default=[1e-6, 1e-5], help="grid sizes in degrees")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    # Snapped layers are cached on first use; warm them before timing.
+    for grid_size in args.grid_size:
+        get_layer("provinces_polygon", grid_size=grid_size)
+        get_layer("tp_basins", grid_size=grid_size)
+
+    rows = [run(grid_size, args.repeat) for grid_size in [None, *args.grid_size]]
+    columns = list(rows[0])
+    widths = [max(len(column), 10) for column in columns]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{value:.3f}" if isinstance(value, float) else str(value) for value in row.values()]
+        print("  ".join(cell.rjust(width) for cell, width in zip(cells, widths)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
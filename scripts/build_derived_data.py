@@ -0,0 +1,38 @@
+"""
+Regenerate the derived data shipped in ``src/easyclimate_map/derived_data``.
+
+Usage::
+
+    python scripts/build_derived_data.py          # rebuild everything
+    python scripts/build_derived_data.py --check  # verify shipped files, exit 1 on mismatch
+"""
+import argparse
+import sys
+
+from easyclimate_map.derived import (
+    build_derived_products,
+    check_derived_products,
+    list_derived_products,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("products", nargs="*", help="products to process (default: all)")
+    parser.add_argument("--check", action="store_true", help="compare shipped files with a fresh build")
+    args = parser.parse_args()
+    names = args.products or list_derived_products()
+
+    if args.check:
+        problems = check_derived_products(names)
+        for name in problems:
+            print(f"derived product out of date: {name}")
+        return 1 if problems else 0
+
+    for name, entry in build_derived_products(names=names).items():
+        print(f"built {name} -> {entry['file']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
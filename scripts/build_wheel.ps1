@@ -1,3 +1,7 @@
 python -m pip install --upgrade pip build setuptools wheel setuptools-scm
+# Fail instead of shipping derived data that no longer matches its sources;
+# run scripts/build_derived_data.py to regenerate it.
+python scripts/build_derived_data.py --check
+if ($LASTEXITCODE -ne 0) { exit 1 }
 python -m build --wheel --no-isolation --outdir dist/
 Remove-Item -Recurse -Force .\build
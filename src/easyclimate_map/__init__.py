@@ -3,6 +3,31 @@ from .version import __version__, show_versions
 from .map_zh_CN import *
 from .map_tibetan_plateau import *
 from .tool import *
+from .layers import *
+from .vector_tiles import *
+from .distance import *
+from .attribute_index import *
+from .cache import *
+from .derived import *
+from .hierarchy import *
+from .compact import *
+from .derived_layers import *
+from .river_network import *
+from .async_getters import *
+from .memoize import *
+from .overlay import *
+from .spatial_index import *
+from .regions import *
+from .cell_cover import *
+from .datasets import *
+from .topology import *
+from .mesh_weights import *
+from .line_sampling import *
+from .clip_paths import *
+from .buffers import *
+from .nearest_centre import *
+from .grid_masks import *
+from .precision import *
 
 from rich import print
 print(
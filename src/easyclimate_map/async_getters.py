@@ -0,0 +1,230 @@
+"""
+Asynchronous getters
+"""
+import asyncio
+import weakref
+from functools import partial
+from typing import Literal
+
+from .layers import get_layer
+from .map_tibetan_plateau import get_Tibetan_Plateau_basins
+from .map_zh_CN import (
+    get_zh_CN_nation,
+    get_zh_CN_provinces,
+    get_zh_CN_river1,
+    get_zh_CN_river3,
+    get_zh_CN_1st_administration,
+    get_zh_CN_2nd_administration,
+)
+
+__all__ = [
+    "run_coalesced",
+    "aget_layer",
+    "aget_zh_CN_nation",
+    "aget_zh_CN_provinces",
+    "aget_zh_CN_river1",
+    "aget_zh_CN_river3",
+    "aget_zh_CN_1st_administration",
+    "aget_zh_CN_2nd_administration",
+    "aget_Tibetan_Plateau_basins",
+]
+
+# In-flight loads per event loop, keyed by function and frozen arguments.
+_IN_FLIGHT = weakref.WeakKeyDictionary()
+
+
+def _freeze(value):
+    """Turn ``value`` into a hashable key; lists and tuples compare equal."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+def _copy(result):
+    # Awaiters share one load; give each its own frame as the sync getters do.
+    return result.copy() if hasattr(result, "copy") else result
+
+
+async def run_coalesced(func, *args, executor=None, **kwargs):
+    """
+    Run a blocking call on an executor, sharing it among concurrent callers.
+
+    While a call of ``func`` with equal arguments is already running on the
+    current event loop, further callers await that call instead of starting a
+    new one (single-flight). Once it finishes the next call starts afresh.
+    Every awaiter receives its own copy of the result, and an exception is
+    raised in every awaiter. Cancelling one awaiter does not cancel the load
+    for the others.
+
+    Parameters
+    ----------
+    func : callable
+        Blocking function, e.g. one of the ``get_*`` getters.
+    *args, **kwargs
+        Arguments of ``func``. They must be hashable after converting lists,
+        tuples, sets and dicts to tuples.
+    executor : concurrent.futures.Executor, optional
+        Executor to run ``func`` on. Defaults to the loop's default executor.
+
+    Returns
+    -------
+    The result of ``func(*args, **kwargs)``.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = _IN_FLIGHT.setdefault(loop, {})
+    key = (func, _freeze(args), _freeze(kwargs))
+    future = in_flight.get(key)
+    if future is None:
+        future = loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        in_flight[key] = future
+
+        def _done(fut, key=key):
+            if in_flight.get(key) is fut:
+                del in_flight[key]
+
+        future.add_done_callback(_done)
+    return _copy(await asyncio.shield(future))
+
+
+async def aget_layer(
+    name: str,
+    names=None,
+    codes=None,
+    compact=False,
+    grid_size=None,
+    executor=None,
+    **kwargs,
+):
+    """
+    Asynchronous counterpart of :func:`get_layer`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_layer, name, names=names, codes=codes, compact=compact,
+        grid_size=grid_size, executor=executor, **kwargs,
+    )
+
+
+async def aget_zh_CN_nation(
+    type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
+    executor=None,
+):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_nation`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+
+    Examples
+    --------
+    >>> nation, provinces = await asyncio.gather(
+    ...     aget_zh_CN_nation(), aget_zh_CN_provinces(type="polygon")
+    ... )
+    """
+    return await run_coalesced(
+        get_zh_CN_nation, type=type, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_zh_CN_provinces(
+    type: Literal["line", "polygon"] = "line",
+    names=None,
+    codes=None,
+    compact=False,
+    grid_size=None,
+    executor=None,
+):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_provinces`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_zh_CN_provinces, type=type, names=names, codes=codes, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_zh_CN_river1(
+    type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
+    executor=None,
+):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_river1`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_zh_CN_river1, type=type, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_zh_CN_river3(
+    type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
+    executor=None,
+):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_river3`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_zh_CN_river3, type=type, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_zh_CN_1st_administration(names=None, codes=None, compact=False, grid_size=None, executor=None):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_1st_administration`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_zh_CN_1st_administration, names=names, codes=codes, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_zh_CN_2nd_administration(names=None, codes=None, compact=False, grid_size=None, executor=None):
+    """
+    Asynchronous counterpart of :func:`get_zh_CN_2nd_administration`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_zh_CN_2nd_administration, names=names, codes=codes, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
+
+
+async def aget_Tibetan_Plateau_basins(names=None, compact=False, grid_size=None, executor=None):
+    """
+    Asynchronous counterpart of :func:`get_Tibetan_Plateau_basins`.
+
+    Concurrent calls with the same arguments share a single load, see
+    :func:`run_coalesced`.
+    """
+    return await run_coalesced(
+        get_Tibetan_Plateau_basins, names=names, compact=compact,
+        grid_size=grid_size, executor=executor,
+    )
@@ -0,0 +1,258 @@
+"""
+Attribute index
+"""
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+from pandas import DataFrame
+
+__all__ = [
+    "normalize_name",
+    "AttributeIndex",
+    "get_attribute_index",
+]
+
+# Romanised names of the provincial-level divisions, keyed by their normalised
+# Chinese name. The provinces layer only carries Chinese names, so this is what
+# makes ``names="Sichuan"`` work on it.
+PROVINCE_PINYIN = {
+    "北京": ("Beijing",),
+    "天津": ("Tianjin",),
+    "河北": ("Hebei",),
+    "山西": ("Shanxi",),
+    "内蒙古": ("Nei Mongol", "Neimenggu", "Inner Mongolia"),
+    "辽宁": ("Liaoning",),
+    "吉林": ("Jilin",),
+    "黑龙江": ("Heilongjiang",),
+    "上海": ("Shanghai",),
+    "江苏": ("Jiangsu",),
+    "浙江": ("Zhejiang",),
+    "安徽": ("Anhui",),
+    "福建": ("Fujian",),
+    "江西": ("Jiangxi",),
+    "山东": ("Shandong",),
+    "河南": ("Henan",),
+    "湖北": ("Hubei",),
+    "湖南": ("Hunan",),
+    "广东": ("Guangdong",),
+    "广西": ("Guangxi",),
+    "海南": ("Hainan",),
+    "重庆": ("Chongqing",),
+    "四川": ("Sichuan",),
+    "贵州": ("Guizhou",),
+    "云南": ("Yunnan",),
+    "西藏": ("Xizang", "Tibet"),
+    "陕西": ("Shaanxi",),
+    "甘肃": ("Gansu",),
+    "青海": ("Qinghai",),
+    "宁夏": ("Ningxia",),
+    "新疆": ("Xinjiang",),
+    "台湾": ("Taiwan",),
+    "香港": ("Hong Kong", "Xianggang"),
+    "澳门": ("Macao", "Macau", "Aomen"),
+}
+
+# Longest first, so that "维吾尔自治区" is removed before "自治区".
+_ADMIN_SUFFIXES = (
+    "特别行政区",
+    "维吾尔自治区",
+    "壮族自治区",
+    "回族自治区",
+    "自治区",
+    "省",
+    "市",
+)
+
+
+def normalize_name(name) -> str:
+    """
+    Normalise a Chinese or romanised place name to a lookup key.
+
+    Applies Unicode NFKC normalisation, case folding, removes whitespace and
+    punctuation such as ``-``, ``'`` and ``·``, and strips administrative
+    suffixes (``省``, ``市``, ``自治区``, ``特别行政区`` ...), so that e.g.
+    ``"四川省"``, ``"四川"`` and ``"sichuan"`` can be matched against each other.
+
+    Parameters
+    ----------
+    name : str
+
+    Returns
+    -------
+    str
+        The normalised key. Empty for missing names.
+    """
+    if not isinstance(name, str):
+        return ""
+    key = unicodedata.normalize("NFKC", name).casefold()
+    key = "".join(ch for ch in key if ch.isalnum())
+    for suffix in _ADMIN_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            key = key[: -len(suffix)]
+            break
+    return key
+
+
+def _normalize_code(code) -> int:
+    try:
+        return int(str(code).strip())
+    except ValueError:
+        raise KeyError(f"Invalid administrative code {code!r}") from None
+
+
+class AttributeIndex:
+    """
+    In-memory index from feature names and codes to feature ids of one layer.
+
+    Feature ids are the 0-based record numbers of the shapefile, which allows
+    reading only the selected features with ``fids=``.
+
+    Parameters
+    ----------
+    table : pandas.DataFrame
+        Attribute table of the layer in file order (no geometry needed).
+    name_fields : sequence of str
+        Columns holding feature names (Chinese or romanised).
+    code_fields : sequence of str
+        Columns holding integer administrative codes, in order of
+        preference. A code is looked up in the first field that contains it,
+        so current codes (``ADCODE99``) take precedence over historical ones
+        (``ADCODE93``) that were reassigned, e.g. 510000 to Chongqing.
+    aliases : dict, optional
+        Extra names per normalised name, e.g. :data:`PROVINCE_PINYIN`.
+
+    Examples
+    --------
+    >>> index = get_attribute_index("provinces_polygon")
+    >>> index.lookup(names=["四川省", "Chongqing"])
+    array([...])
+    >>> index.lookup(codes=510000)
+    array([...])
+    """
+
+    def __init__(self, table: DataFrame, name_fields=(), code_fields=(), aliases=None):
+        self.name_fields = tuple(name_fields)
+        self.code_fields = tuple(code_fields)
+        self._names = {}
+        # One map per code field, looked up in order.
+        self._codes = []
+
+        for field in self.name_fields:
+            for key, group in _group(table[field].map(normalize_name)):
+                if key:
+                    self._names.setdefault(key, []).append(group)
+        if aliases:
+            for key, extra in aliases.items():
+                key = normalize_name(key)
+                if key in self._names:
+                    for alias in extra:
+                        self._names.setdefault(normalize_name(alias), []).extend(self._names[key])
+
+        for field in self.code_fields:
+            codes = {}
+            for key, group in _group(table[field]):
+                codes.setdefault(_normalize_code(key), []).append(group)
+            self._codes.append({k: np.unique(np.concatenate(v)) for k, v in codes.items()})
+
+        self._names = {k: np.unique(np.concatenate(v)) for k, v in self._names.items()}
+        self.size = len(table)
+
+    @property
+    def names(self) -> list:
+        """All normalised name keys known to the index."""
+        return sorted(self._names)
+
+    @property
+    def codes(self) -> list:
+        """All administrative codes known to the index."""
+        return sorted(set().union(*self._codes))
+
+    def lookup(self, names=None, codes=None) -> np.ndarray:
+        """
+        Return the sorted feature ids matching any of ``names`` or ``codes``.
+
+        Parameters
+        ----------
+        names : str or list of str, optional
+            Names in any form accepted by :func:`normalize_name`, e.g.
+            ``"四川省"``, ``"四川"`` or ``"Sichuan"``.
+        codes : int, str or list, optional
+            Administrative codes such as ``510000``. Each code is matched
+            against the first code field containing it.
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted unique feature ids.
+
+        Raises
+        ------
+        KeyError
+            If a name or code is not present in the layer.
+        """
+        selected = []
+        if names is not None:
+            if not self.name_fields:
+                raise KeyError("This layer has no name attribute to select on")
+            for name in [names] if isinstance(names, str) else names:
+                try:
+                    selected.append(self._names[normalize_name(name)])
+                except KeyError:
+                    raise KeyError(f"No feature named {name!r}") from None
+        if codes is not None:
+            if not self.code_fields:
+                raise KeyError("This layer has no code attribute to select on")
+            for code in [codes] if isinstance(codes, (str, int, np.integer)) else codes:
+                key = _normalize_code(code)
+                match = next((codes[key] for codes in self._codes if key in codes), None)
+                if match is None:
+                    raise KeyError(f"No feature with code {code!r}")
+                selected.append(match)
+        if not selected:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(selected))
+
+
+def _group(values):
+    """Yield ``(value, positions)`` pairs for the distinct non-null values."""
+    series = values.reset_index(drop=True)
+    series = series[series.notna()]
+    for key, positions in series.groupby(series, sort=False).indices.items():
+        yield key, series.index.to_numpy()[positions]
+
+
+def get_attribute_index(layer: str) -> AttributeIndex:
+    """
+    Build (once per process) the attribute index of a bundled layer.
+
+    Only the name and code columns are read, without geometries, so building
+    the index is much cheaper than loading the layer.
+
+    Parameters
+    ----------
+    layer : str
+        Catalogue name, see :func:`list_layers`.
+
+    Returns
+    -------
+    AttributeIndex
+    """
+    from .layers import get_layer_spec, _layer_fingerprint
+
+    name = get_layer_spec(layer).name
+    return _build_attribute_index(name, _layer_fingerprint(name))
+
+
+@lru_cache(maxsize=None)
+def _build_attribute_index(layer: str, fingerprint: str) -> AttributeIndex:
+    from .layers import get_layer_spec, read_shapefile_from_archive
+
+    spec = get_layer_spec(layer)
+    columns = list(spec.name_fields + spec.code_fields)
+    kwargs = {"encoding": spec.encoding} if spec.encoding is not None else {}
+    table = read_shapefile_from_archive(
+        spec.path, member=spec.member, ignore_geometry=True, columns=columns, **kwargs
+    )
+    aliases = PROVINCE_PINYIN if spec.name == "provinces_polygon" else None
+    return AttributeIndex(table, spec.name_fields, spec.code_fields, aliases=aliases)
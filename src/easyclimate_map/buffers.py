@@ -0,0 +1,189 @@
+"""
+Geodesic buffers
+"""
+import hashlib
+import json
+import os
+import pickle
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame
+
+from .cache import get_cache_dir, cache_lock
+from .layers import get_layer_spec, _layer_fingerprint, _resolve_layer
+
+__all__ = [
+    "geodesic_buffer",
+]
+
+# Features are cut into tiles of this size and each tile is buffered in its
+# own azimuthal equidistant projection; within 2-3 degrees of the tile centre
+# distances are off by well under 0.1 %.
+_TILE_DEGREES = 4.0
+
+
+@lru_cache(maxsize=512)
+def _tile_transformers(lon0: float, lat0: float) -> tuple:
+    from pyproj import CRS, Transformer
+
+    crs = CRS.from_proj4(f"+proj=aeqd +lat_0={lat0} +lon_0={lon0} +datum=WGS84 +units=m")
+    return (
+        Transformer.from_crs(4326, crs, always_xy=True),
+        Transformer.from_crs(crs, 4326, always_xy=True),
+    )
+
+
+def _transform(geoms: np.ndarray, transformer) -> np.ndarray:
+    def func(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return shapely.transform(geoms, func)
+
+
+def _split_by_tile(geoms: np.ndarray) -> tuple:
+    """Cut geometries along the tile grid; returns pieces, owners and tile keys."""
+    bounds = shapely.bounds(geoms)
+    lo = np.floor(bounds[:, :2] / _TILE_DEGREES).astype(np.int64)
+    # A feature ending exactly on a tile edge does not need the next tile.
+    hi = np.maximum(np.ceil(bounds[:, 2:] / _TILE_DEGREES).astype(np.int64) - 1, lo)
+    nx, ny = hi[:, 0] - lo[:, 0] + 1, hi[:, 1] - lo[:, 1] + 1
+    counts = nx * ny
+    owner = np.repeat(np.arange(len(geoms)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ti = lo[owner, 0] + k % nx[owner]
+    tj = lo[owner, 1] + k // nx[owner]
+    pieces = geoms[owner].copy()
+    # Only features spanning several tiles are cut.
+    split = counts[owner] > 1
+    boxes = shapely.box(
+        ti[split] * _TILE_DEGREES, tj[split] * _TILE_DEGREES,
+        (ti[split] + 1) * _TILE_DEGREES, (tj[split] + 1) * _TILE_DEGREES,
+    )
+    pieces[split] = shapely.intersection(pieces[split], boxes)
+    keep = ~shapely.is_empty(pieces)
+    return pieces[keep], owner[keep], ti[keep], tj[keep]
+
+
+def _buffer_tile(pieces: np.ndarray, ti: int, tj: int, distance_m: float, resolution: int, dissolve: bool):
+    forward, inverse = _tile_transformers((ti + 0.5) * _TILE_DEGREES, (tj + 0.5) * _TILE_DEGREES)
+    buffered = shapely.buffer(_transform(pieces, forward), distance_m, quad_segs=resolution)
+    if dissolve:
+        buffered = np.array([shapely.union_all(buffered)], dtype=object)
+    buffered = _transform(buffered, inverse)
+    # Reprojection can nudge nearly touching rings into each other.
+    invalid = ~shapely.is_valid(buffered)
+    buffered[invalid] = shapely.make_valid(buffered[invalid])
+    return buffered
+
+
+def _compute_buffer(gdf: GeoDataFrame, distance_km: float, resolution: int, dissolve: bool) -> GeoDataFrame:
+    geoms = np.asarray(gdf.geometry.values)
+    valid = np.flatnonzero(~(shapely.is_missing(geoms) | shapely.is_empty(geoms)))
+    pieces, owner, ti, tj = _split_by_tile(geoms[valid])
+    owner = valid[owner]
+    tiles, tile_of = np.unique(np.column_stack([ti, tj]), axis=0, return_inverse=True)
+    tile_of = tile_of.ravel()
+    order = np.argsort(tile_of, kind="stable")
+    starts = np.searchsorted(tile_of[order], np.arange(len(tiles)))
+    groups = np.split(order, starts[1:])
+
+    def run(t):
+        members = groups[t]
+        buffered = _buffer_tile(pieces[members], *tiles[t], distance_km * 1000.0, resolution, dissolve)
+        return buffered, owner[members]
+
+    with ThreadPoolExecutor() as pool:
+        results = list(pool.map(run, range(len(tiles))))
+
+    if not results:
+        # No non-empty geometries: nothing to buffer.
+        return GeoDataFrame(geometry=[], crs=4326) if dissolve else gdf.iloc[:0].set_crs(4326, allow_override=True)
+    if dissolve:
+        merged = shapely.union_all(np.concatenate([geoms for geoms, _ in results]))
+        return GeoDataFrame(geometry=[merged], crs=4326)
+    buffered = np.concatenate([geoms for geoms, _ in results])
+    owners = np.concatenate([owners for _, owners in results])
+    out = gdf.iloc[np.unique(owners)].copy()
+    sort = np.argsort(owners, kind="stable")
+    bounds = np.searchsorted(owners[sort], np.unique(owners))
+    out[gdf.geometry.name] = [
+        shapely.union_all(part) for part in np.split(buffered[sort], bounds[1:])
+    ]
+    return out.set_crs(4326, allow_override=True)
+
+
+def _buffer_path(name: str, distance_km: float, resolution: int, dissolve: bool, fingerprint: str):
+    key = json.dumps([name, distance_km, resolution, dissolve, fingerprint])
+    directory = get_cache_dir() / "buffers"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{name.replace('/', '__')}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.pkl"
+
+
+@lru_cache(maxsize=16)
+def _load_buffer(name: str, distance_km: float, resolution: int, dissolve: bool, fingerprint: str) -> GeoDataFrame:
+    path = _buffer_path(name, distance_km, resolution, dissolve, fingerprint)
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                result = _compute_buffer(_resolve_layer(name), distance_km, resolution, dissolve)
+                tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+                try:
+                    with open(tmp, "wb") as f:
+                        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return result
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def geodesic_buffer(layer, distance_km: float, resolution: int = 8, dissolve: bool = True) -> GeoDataFrame:
+    """
+    Buffer a layer by a distance in kilometres.
+
+    Buffering in degrees stretches buffers east-west by ``1 / cos(lat)``.
+    Here features are cut along a 4-degree tile grid, and the pieces of
+    each tile are buffered together in an azimuthal equidistant projection
+    centred on the tile, tiles running in parallel threads. Because the
+    buffer of a union is the union of the buffers, the merged result is the
+    buffer of the whole features; the projections distort distances by well
+    under 0.1 %. Buffers of catalogue layers are cached in the cache directory (see
+    :func:`get_cache_dir`) per layer content, distance, resolution and
+    ``dissolve``.
+
+    Parameters
+    ----------
+    layer : str or geopandas.GeoDataFrame
+        A catalogue name such as ``"nation_line"`` or ``"river3_line"``, or
+        a GeoDataFrame.
+    distance_km : float
+        Buffer distance in kilometres. Must be positive.
+    resolution : int, default 8
+        Segments per quarter circle of the buffer's rounded corners.
+    dissolve : bool, default True
+        Merge all buffers into one feature. Otherwise each feature gets its
+        own buffer and keeps its attributes.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        Buffers in longitude/latitude (EPSG:4326).
+
+    Examples
+    --------
+    >>> border_zone = geodesic_buffer("nation_line", 50)
+    >>> riparian = geodesic_buffer("river3_line", 5)
+    """
+    if distance_km <= 0:
+        raise ValueError("distance_km must be positive")
+    if isinstance(layer, str):
+        spec = get_layer_spec(layer)
+        return _load_buffer(
+            spec.name, float(distance_km), int(resolution), bool(dissolve), _layer_fingerprint(spec.name)
+        ).copy()
+    return _compute_buffer(_resolve_layer(layer), float(distance_km), int(resolution), bool(dissolve))
@@ -0,0 +1,250 @@
+"""
+Cache locations
+"""
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+__all__ = [
+    "get_cache_dir",
+    "file_fingerprint",
+    "cache_lock",
+    "atomic_directory",
+]
+
+CACHE_DIR_ENV = "EASYCLIMATE_MAP_CACHE_DIR"
+# Seconds to wait for another process to finish populating a cache entry.
+LOCK_TIMEOUT = 600.0
+# Age in seconds after which a lock is considered abandoned regardless of owner.
+LOCK_STALE_AFTER = 3600.0
+# Files read together with a .shp, covered by its fingerprint.
+SHAPEFILE_SIDECARS = (".shx", ".dbf", ".prj", ".cpg")
+
+
+def get_cache_dir() -> Path:
+    """
+    Return the directory holding files cached by ``easyclimate-map``.
+
+    The location can be set with the ``EASYCLIMATE_MAP_CACHE_DIR``
+    environment variable. Otherwise ``%LOCALAPPDATA%\\easyclimate_map`` is used
+    on Windows and ``$XDG_CACHE_HOME/easyclimate_map`` (``~/.cache`` by
+    default) elsewhere. The directory is created if needed.
+
+    Returns
+    -------
+    pathlib.Path
+    """
+    path = os.environ.get(CACHE_DIR_ENV)
+    if path:
+        path = Path(path)
+    elif sys.platform == "win32":
+        path = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "easyclimate_map"
+    else:
+        path = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "easyclimate_map"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def file_fingerprint(path) -> str:
+    """
+    Return the SHA-256 hex digest of a file's content.
+
+    Digests are memoised per ``(path, size, mtime)`` so repeated calls in one
+    process only stat the file. For a ``.shp`` file the digest also covers its
+    sidecar files (``.shx``, ``.dbf``, ``.prj``, ``.cpg``), so that editing
+    the attributes of a shapefile changes its fingerprint.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+
+    Returns
+    -------
+    str
+    """
+    stat = os.stat(path)
+    digest = _file_fingerprint(str(path), stat.st_size, stat.st_mtime_ns)
+    if Path(path).suffix.lower() != ".shp":
+        return digest
+    combined = hashlib.sha256(digest.encode())
+    for sidecar in _shapefile_sidecars(Path(path)):
+        stat = os.stat(sidecar)
+        combined.update(sidecar.suffix.lower().encode())
+        combined.update(_file_fingerprint(str(sidecar), stat.st_size, stat.st_mtime_ns).encode())
+    return combined.hexdigest()
+
+
+def _shapefile_sidecars(path: Path) -> list:
+    sidecars = []
+    for suffix in SHAPEFILE_SIDECARS:
+        for candidate in (path.with_suffix(suffix), path.with_suffix(suffix.upper())):
+            if candidate.is_file():
+                sidecars.append(candidate)
+                break
+    return sidecars
+
+
+@lru_cache(maxsize=256)
+def _file_fingerprint(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _lock_owner() -> dict:
+    return {"pid": os.getpid(), "host": socket.gethostname(), "time": time.time()}
+
+
+def _read_owner(path: Path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        # os.kill(pid, 0) would terminate the process on Windows; rely on age.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale(path: Path, owner, stale_after: float) -> bool:
+    try:
+        age = time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if age > stale_after:
+        return True
+    if owner is None:
+        # Being written right now, or garbage left by a crash mid-write.
+        return age > 10.0
+    return owner.get("host") == socket.gethostname() and not _pid_alive(int(owner.get("pid", -1)))
+
+
+def _break_lock(path: Path, owner) -> None:
+    """Remove a stale lock, unless another process replaced it meanwhile."""
+    grave = path.with_name(f"{path.name}.{uuid.uuid4().hex}.stale")
+    try:
+        os.rename(path, grave)
+    except FileNotFoundError:
+        return
+    if _read_owner(grave) != owner:
+        # Lost a race: we moved a fresh lock. Put it back if the slot is free.
+        try:
+            os.link(grave, path)
+        except OSError:
+            pass
+    grave.unlink(missing_ok=True)
+
+
+@contextmanager
+def cache_lock(path, timeout: float = LOCK_TIMEOUT, stale_after: float = LOCK_STALE_AFTER):
+    """
+    Hold an exclusive cross-process lock while populating a cache entry.
+
+    The lock is a file created with ``O_CREAT | O_EXCL`` that records the
+    owner's pid, host and start time. Other processes poll until it is
+    released. A lock whose owner process died on the same host, or that is
+    older than ``stale_after`` seconds, is broken so a crashed worker cannot
+    block the cache forever.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Lock file path, conventionally ``<entry>.lock``.
+    timeout : float, default 600
+        Seconds to wait before giving up.
+    stale_after : float, default 3600
+        Age in seconds after which any lock is treated as abandoned.
+
+    Raises
+    ------
+    TimeoutError
+        If the lock could not be acquired within ``timeout`` seconds.
+
+    Examples
+    --------
+    >>> target = get_cache_dir() / "entry"
+    >>> with cache_lock(target.with_name("entry.lock")):
+    ...     if not target.exists():
+    ...         with atomic_directory(target) as tmp:
+    ...             ...  # populate tmp
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    owner = _lock_owner()
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            current = _read_owner(path)
+            if _is_stale(path, current, stale_after):
+                _break_lock(path, current)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Timed out after {timeout:.0f} s waiting for cache lock {path} held by {current}"
+                ) from None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(owner, f)
+        break
+    try:
+        yield path
+    finally:
+        if _read_owner(path) == owner:
+            path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_directory(target):
+    """
+    Populate a directory under a temporary name and rename it into place.
+
+    Readers therefore never see a partially written ``target``: it either
+    does not exist or is complete. The temporary directory is removed if the
+    block raises. Combine with :func:`cache_lock` so only one process does
+    the work.
+
+    Parameters
+    ----------
+    target : str or pathlib.Path
+        Final directory path. It must not exist yet.
+
+    Yields
+    ------
+    pathlib.Path
+        The temporary directory to fill.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    tmp.mkdir()
+    try:
+        yield tmp
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,280 @@
+"""
+Cell-cover point lookup
+"""
+import json
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+from .cache import get_cache_dir, cache_lock
+from .layers import get_layer_spec, _layer_fingerprint
+
+__all__ = [
+    "CellCover",
+    "get_cell_cover",
+    "lookup_region",
+]
+
+OUTSIDE = -1
+BOUNDARY = -2
+
+
+class CellCover:
+    """
+    Fixed-resolution cell cover of polygon regions for fast point lookup.
+
+    The bounding box of the regions is divided into square cells of
+    ``resolution`` degrees. Each cell stores the region it lies entirely
+    within, ``-1`` if it touches no region, or ``-2`` if it crosses a region
+    boundary. Looking up a point is then an array index; only points in
+    boundary cells are tested exactly against the polygons. The cover is
+    built with a quadtree, so only boundary cells are refined to the full
+    resolution.
+
+    Use :func:`get_cell_cover` to get a cached cover of a bundled layer.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+        Polygons in longitude/latitude, one per region.
+    labels : array-like
+        Region label of each row of ``regions``.
+    resolution : float, default 0.05
+        Cell size in degrees.
+
+    Examples
+    --------
+    >>> cover = get_cell_cover("provinces_polygon")
+    >>> cover.lookup([104.06, 91.1], [30.67, 29.65])
+    array(['四川省', '西藏自治区'], dtype=object)
+    """
+
+    def __init__(self, regions, labels, resolution: float = 0.05):
+        self.resolution = float(resolution)
+        self.labels = np.asarray(labels, dtype=object)
+        self._geometries = np.asarray(regions.geometry.values)
+        minx, miny, maxx, maxy = shapely.total_bounds(self._geometries)
+        self.origin = (np.floor(minx / resolution) * resolution, np.floor(miny / resolution) * resolution)
+        nx = int(np.ceil((maxx - self.origin[0]) / resolution)) + 1
+        ny = int(np.ceil((maxy - self.origin[1]) / resolution)) + 1
+        self.grid = np.full((ny, nx), OUTSIDE, dtype=np.int32)
+        self._tree = None
+        self._build()
+
+    def _boxes(self, i0, j0, size):
+        res = self.resolution
+        x0 = self.origin[0] + i0 * res
+        y0 = self.origin[1] + j0 * res
+        return shapely.box(x0, y0, x0 + size * res, y0 + size * res)
+
+    def _build(self):
+        ny, nx = self.grid.shape
+        # Coarsest blocks of about two degrees, halved down to single cells.
+        size = 1 << max(int(np.log2(max(2.0 / self.resolution, 1))), 0)
+        for region, geometry in enumerate(self._geometries):
+            shapely.prepare(geometry)
+            minx, miny, maxx, maxy = geometry.bounds
+            i_lo = int((minx - self.origin[0]) // self.resolution) // size * size
+            j_lo = int((miny - self.origin[1]) // self.resolution) // size * size
+            i_hi = int((maxx - self.origin[0]) // self.resolution)
+            j_hi = int((maxy - self.origin[1]) // self.resolution)
+            jj, ii = np.meshgrid(np.arange(j_lo, j_hi + 1, size), np.arange(i_lo, i_hi + 1, size), indexing="ij")
+            i0, j0 = ii.ravel(), jj.ravel()
+            block = size
+            while len(i0):
+                boxes = self._boxes(i0, j0, block)
+                inside = shapely.contains_properly(geometry, boxes)
+                crossing = ~inside & shapely.intersects(geometry, boxes)
+                for i, j in zip(i0[inside], j0[inside]):
+                    self.grid[j:j + block, i:i + block] = region
+                i0, j0 = i0[crossing], j0[crossing]
+                if block == 1:
+                    self.grid[j0, i0] = BOUNDARY
+                    break
+                block //= 2
+                i0 = np.concatenate([i0, i0 + block, i0, i0 + block])
+                j0 = np.concatenate([j0, j0, j0 + block, j0 + block])
+                keep = (i0 < nx) & (j0 < ny)
+                i0, j0 = i0[keep], j0[keep]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the cell grid."""
+        return int(self.grid.nbytes)
+
+    def __repr__(self) -> str:
+        boundary = (self.grid == BOUNDARY).mean()
+        return (
+            f"<CellCover: {len(self.labels)} regions, {self.grid.shape[1]}x{self.grid.shape[0]} cells "
+            f"of {self.resolution} deg, {boundary:.1%} boundary>"
+        )
+
+    def lookup_index(self, lon, lat) -> np.ndarray:
+        """
+        Return the row of the region containing each point, or ``-1``.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Point coordinates in degrees.
+
+        Returns
+        -------
+        numpy.ndarray of int
+        """
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        i = np.floor((lon - self.origin[0]) / self.resolution)
+        j = np.floor((lat - self.origin[1]) / self.resolution)
+        ny, nx = self.grid.shape
+        valid = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        result = np.full(len(lon), OUTSIDE, dtype=np.int64)
+        result[valid] = self.grid[j[valid].astype(np.int64), i[valid].astype(np.int64)]
+        boundary = np.flatnonzero(result == BOUNDARY)
+        if len(boundary):
+            result[boundary] = OUTSIDE
+            if self._tree is None:
+                shapely.prepare(self._geometries)
+                self._tree = shapely.STRtree(self._geometries)
+            points = shapely.points(lon[boundary], lat[boundary])
+            # Bounding-box candidates, then exact tests against the prepared
+            # polygons.
+            point_idx, region_idx = self._tree.query(points)
+            hit = shapely.intersects(self._geometries[region_idx], points[point_idx])
+            point_idx, region_idx = point_idx[hit], region_idx[hit]
+            # A point on a shared border gets the lowest region row.
+            order = np.lexsort((region_idx, point_idx))[::-1]
+            result[boundary[point_idx[order]]] = region_idx[order]
+        return result
+
+    def lookup(self, lon, lat) -> np.ndarray:
+        """
+        Return the label of the region containing each point, or ``None``.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Point coordinates in degrees.
+
+        Returns
+        -------
+        numpy.ndarray of object
+        """
+        index = self.lookup_index(lon, lat)
+        labels = np.empty(len(index), dtype=object)
+        found = index >= 0
+        labels[found] = self.labels[index[found]]
+        return labels
+
+    def save(self, path):
+        """Save the cell grid and labels to an ``.npz`` file."""
+        np.savez_compressed(
+            path,
+            grid=self.grid,
+            origin=np.asarray(self.origin),
+            resolution=np.asarray(self.resolution),
+            labels=np.asarray(json.dumps([_jsonable(v) for v in self.labels], ensure_ascii=False)),
+        )
+
+    @classmethod
+    def load(cls, path, regions) -> "CellCover":
+        """Load a cover written by :meth:`save`; ``regions`` serve the exact tests."""
+        with np.load(path) as data:
+            cover = cls.__new__(cls)
+            cover.grid = data["grid"]
+            cover.origin = tuple(float(v) for v in data["origin"])
+            cover.resolution = float(data["resolution"])
+            cover.labels = np.asarray(json.loads(str(data["labels"])), dtype=object)
+        cover._geometries = np.asarray(regions.geometry.values)
+        cover._tree = None
+        return cover
+
+
+def _jsonable(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+@lru_cache(maxsize=8)
+def _regions(layer: str, region_column, fingerprint: str):
+    from .overlay import _prepare_regions
+    return _prepare_regions(layer, region_column)[0]
+
+
+@lru_cache(maxsize=8)
+def _load_cell_cover(layer: str, resolution: float, region_column, fingerprint: str) -> CellCover:
+    regions = _regions(layer, region_column, fingerprint)
+    directory = get_cache_dir() / "cell_cover"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{layer.replace('/', '__')}-{region_column or 'default'}-{resolution:g}-{fingerprint[:16]}.npz"
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                cover = CellCover(regions, regions["region"].to_numpy(), resolution=resolution)
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    cover.save(tmp)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return cover
+    return CellCover.load(path, regions)
+
+
+def get_cell_cover(layer: str = "provinces_polygon", resolution: float = 0.05, region_column=None) -> CellCover:
+    """
+    Get the cell cover of a bundled polygon layer.
+
+    Covers are built once, stored in the cache directory (see
+    :func:`get_cache_dir`) keyed by the layer's content hash, and kept in
+    memory.
+
+    Parameters
+    ----------
+    layer : str, default "provinces_polygon"
+        Catalogue name of a polygon layer, e.g. ``"tp_basins"``.
+    resolution : float, default 0.05
+        Cell size in degrees. Finer cells leave fewer points for the exact
+        test at the cost of a larger grid.
+    region_column : str, optional
+        Column labelling the regions; features with equal labels are merged.
+        Defaults to the layer's name field (``NAME``, ``BasinName``).
+
+    Returns
+    -------
+    CellCover
+    """
+    name = get_layer_spec(layer).name
+    if get_layer_spec(name).geometry != "polygon":
+        raise ValueError(f"{name!r} is not a polygon layer")
+    return _load_cell_cover(name, float(resolution), region_column, _layer_fingerprint(name))
+
+
+def lookup_region(lon, lat, layer: str = "provinces_polygon", resolution: float = 0.05, region_column=None):
+    """
+    Return the region of a polygon layer containing each point.
+
+    A vectorised lookup in the layer's :class:`CellCover`: most points are
+    resolved by indexing the cell grid, and only points in cells crossing a
+    region boundary are tested exactly.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        Point coordinates in degrees.
+    layer, resolution, region_column
+        See :func:`get_cell_cover`.
+
+    Returns
+    -------
+    numpy.ndarray of object
+        Region labels, ``None`` for points outside every region.
+
+    Examples
+    --------
+    >>> lookup_region(lon, lat)  # provinces
+    >>> lookup_region(lon, lat, layer="tp_basins")
+    """
+    return get_cell_cover(layer, resolution, region_column).lookup(lon, lat)
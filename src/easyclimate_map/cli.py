@@ -0,0 +1,209 @@
+"""
+Command-line interface
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+__all__ = [
+    "main",
+]
+
+EXPORT_FORMATS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "geojson": ".geojson",
+    "gpkg": ".gpkg",
+    "fgb": ".fgb",
+    "shp": ".shp",
+}
+
+_DRIVERS = {
+    "geojson": "GeoJSON",
+    "gpkg": "GPKG",
+    "fgb": "FlatGeobuf",
+    "shp": "ESRI Shapefile",
+}
+
+
+def _warm_layer(name: str, grid_size=None) -> tuple:
+    """Populate the persisted caches of one layer in the cache directory."""
+    from .layers import get_layer, get_layer_spec
+    from .spatial_index import get_spatial_index
+
+    spec = get_layer_spec(name)
+    start = time.perf_counter()
+    n_features = len(get_layer(spec.name))
+    get_spatial_index(spec.name)
+    if spec.geometry == "line":
+        from .line_sampling import densify_lines
+        densify_lines(spec.name)
+    elif spec.geometry == "point" and spec.name_fields:
+        from .nearest_centre import get_centre_lookup
+        get_centre_lookup(spec.name)
+    elif spec.geometry == "polygon" and spec.name_fields:
+        from .cell_cover import get_cell_cover
+        get_cell_cover(spec.name)
+    if grid_size is not None:
+        get_layer(spec.name, grid_size=grid_size)
+    return name, n_features, time.perf_counter() - start
+
+
+def _warm_derived(name: str) -> tuple:
+    from .derived import load_derived_product
+
+    start = time.perf_counter()
+    n_rows = len(load_derived_product(name))
+    return name, n_rows, time.perf_counter() - start
+
+
+def _run_parallel(func, names, jobs: int) -> list:
+    if jobs == 1:
+        return [func(name) for name in names]
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for future in as_completed([pool.submit(func, name) for name in names]):
+            results.append(future.result())
+    return sorted(results, key=lambda r: names.index(r[0]))
+
+
+def _cmd_warm(args, console) -> int:
+    from rich.table import Table
+    from .derived import list_derived_products
+    from .layers import list_layers
+
+    layers = args.layers or list_layers()
+    start = time.perf_counter()
+    table = Table(title="Cache warm-up")
+    table.add_column("item")
+    table.add_column("rows", justify="right")
+    table.add_column("seconds", justify="right")
+    warm_layer = partial(_warm_layer, grid_size=args.grid_size)
+    for name, n, seconds in _run_parallel(warm_layer, layers, args.jobs):
+        table.add_row(name, str(n), f"{seconds:.3f}")
+    if not args.layers:
+        for name, n, seconds in _run_parallel(_warm_derived, list_derived_products(), args.jobs):
+            table.add_row(f"derived: {name}", str(n), f"{seconds:.3f}")
+    console.print(table)
+    console.print(f"warmed in {time.perf_counter() - start:.3f} s")
+    return 0
+
+
+def _cmd_export(args, console) -> int:
+    from .layers import get_layer, get_layer_spec
+
+    spec = get_layer_spec(args.layer)
+    output = Path(args.output) if args.output else Path(spec.name + EXPORT_FORMATS[args.format])
+    start = time.perf_counter()
+    gdf = get_layer(spec.name, compact=args.compact)
+    loaded = time.perf_counter()
+    try:
+        if args.format == "parquet":
+            gdf.to_parquet(output)
+        elif args.format == "feather":
+            gdf.to_feather(output)
+        else:
+            gdf.to_file(output, driver=_DRIVERS[args.format])
+    except ImportError as exc:
+        console.print(f"[red]cannot write {args.format}: {exc}[/red]")
+        console.print("install pyarrow for parquet/feather, or choose e.g. --format gpkg")
+        return 1
+    done = time.perf_counter()
+    console.print(
+        f"exported {spec.name} ({len(gdf)} features) to {output} "
+        f"[load {loaded - start:.3f} s, write {done - loaded:.3f} s]"
+    )
+    return 0
+
+
+def _cmd_info(args, console) -> int:
+    from rich.table import Table
+    from .cache import get_cache_dir
+    from .layers import BUNDLED_LAYERS, get_layer
+    from .tool import extract_archive_once, is_extracted
+    from .version import __version__
+
+    cache_dir = get_cache_dir()
+    size = sum(f.stat().st_size for f in cache_dir.rglob("*") if f.is_file())
+    console.print(f"easyclimate-map {__version__}")
+    console.print(f"cache directory: {cache_dir} ({size / 1e6:.1f} MB)")
+
+    table = Table(title="Bundled layers")
+    table.add_column("layer")
+    table.add_column("geometry")
+    table.add_column("archive MB", justify="right")
+    table.add_column("cached")
+    if args.timings:
+        table.add_column("load seconds", justify="right")
+    for name, spec in BUNDLED_LAYERS.items():
+        row = [name, spec.geometry, f"{spec.path.stat().st_size / 1e6:.2f}"]
+        row.append("yes" if is_extracted(spec.path) else "no")
+        if args.timings:
+            start = time.perf_counter()
+            extract_archive_once(spec.path)
+            get_layer(name)
+            row.append(f"{time.perf_counter() - start:.3f}")
+        table.add_row(*row)
+    console.print(table)
+    return 0
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="easyclimate-map",
+        description="Warm caches, export layers and inspect the data bundled with easyclimate-map.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser(
+        "warm",
+        help="decode all layers and build their persisted indexes "
+        "(spatial index, line samples, centre lookups, cell covers) in the cache directory",
+    )
+    warm.add_argument("--layers", nargs="+", metavar="LAYER", help="layers to warm (default: all)")
+    warm.add_argument("-j", "--jobs", type=int, default=4, help="parallel worker processes (default: 4)")
+    warm.add_argument(
+        "--grid-size", type=float, metavar="DEGREES",
+        help="also cache the layers snapped to this precision grid, see get_layer(grid_size=)",
+    )
+    warm.set_defaults(func=_cmd_warm)
+
+    export = sub.add_parser("export", help="export a layer to a fast file format")
+    export.add_argument("--layer", required=True, help="catalogue name, e.g. river3 or provinces_polygon")
+    export.add_argument(
+        "--format", choices=sorted(EXPORT_FORMATS), default="gpkg",
+        help="output format (default: gpkg; parquet and feather need pyarrow)",
+    )
+    export.add_argument("-o", "--output", help="output path (default: <layer>.<ext>)")
+    export.add_argument("--compact", action="store_true", help="use compact attribute dtypes")
+    export.set_defaults(func=_cmd_export)
+
+    info = sub.add_parser("info", help="show layers and cache status")
+    info.add_argument("--timings", action="store_true", help="also time loading every layer")
+    info.set_defaults(func=_cmd_info)
+    return parser
+
+
+def main(argv=None) -> int:
+    """
+    Entry point of the ``easyclimate-map`` console script.
+
+    Examples
+    --------
+    .. code-block:: console
+
+        $ easyclimate-map warm -j 8
+        $ easyclimate-map export --layer river3 --format gpkg
+        $ easyclimate-map info --timings
+    """
+    from rich.console import Console
+
+    args = _build_parser().parse_args(argv)
+    return args.func(args, Console())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
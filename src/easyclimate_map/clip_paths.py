@@ -0,0 +1,218 @@
+"""
+Clip paths for masking plots to a region
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+import shapely
+
+from .cache import get_cache_dir, cache_lock
+from .version import __version__
+
+__all__ = [
+    "get_clip_path",
+    "clip_artists",
+]
+
+# matplotlib Path codes.
+_MOVETO, _LINETO, _CLOSEPOLY = 1, 2, 79
+
+_paths = {}
+_paths_lock = threading.Lock()
+_MAX_PATHS = 64
+
+
+def _projection_key(projection) -> str:
+    if projection is None:
+        return "lonlat"
+    to_wkt = getattr(projection, "to_wkt", None)
+    key = to_wkt() if to_wkt is not None else getattr(projection, "proj4_init", repr(projection))
+    # Cartopy projections also carry their valid domain.
+    return f"{key}|{getattr(projection, 'bounds', None)}"
+
+
+def _region_key(region, source: str) -> str:
+    if isinstance(region, shapely.Geometry):
+        return "wkb:" + hashlib.blake2b(shapely.to_wkb(region), digest_size=16).hexdigest()
+    return f"{source}:{region}"
+
+
+def _project(geometry, projection):
+    if projection is None:
+        return geometry
+    import cartopy.crs as ccrs
+
+    return projection.project_geometry(geometry, src_crs=ccrs.PlateCarree())
+
+
+def _path_arrays(geometry) -> tuple:
+    """Vertices and codes of a polygonal geometry as a compound path."""
+    polygons = shapely.get_parts(shapely.normalize(geometry))
+    polygons = polygons[shapely.get_type_id(polygons) == shapely.GeometryType.POLYGON]
+    rings = shapely.get_rings(polygons)
+    rings = rings[shapely.get_num_coordinates(rings) >= 4]
+    vertices, ring = shapely.get_coordinates(rings, return_index=True)
+    codes = np.full(len(vertices), _LINETO, dtype=np.uint8)
+    if len(vertices):
+        starts = np.flatnonzero(np.r_[True, ring[1:] != ring[:-1]])
+        codes[starts] = _MOVETO
+        codes[np.r_[starts[1:] - 1, len(vertices) - 1]] = _CLOSEPOLY
+    return vertices, codes
+
+
+def _build(region, source: str, projection, extent, pixels: int) -> tuple:
+    from .regions import get_region_geometry
+
+    geometry = _project(get_region_geometry(region, source=source), projection)
+    if extent is not None:
+        x0, x1, y0, y1 = extent
+        # Edges the clip introduces stay just outside the visible area.
+        pad_x, pad_y = 0.02 * abs(x1 - x0), 0.02 * abs(y1 - y0)
+        geometry = shapely.clip_by_rect(geometry, min(x0, x1) - pad_x, min(y0, y1) - pad_y,
+                                        max(x0, x1) + pad_x, max(y0, y1) + pad_y)
+        span = max(abs(x1 - x0), abs(y1 - y0))
+    else:
+        minx, miny, maxx, maxy = geometry.bounds
+        span = max(maxx - minx, maxy - miny)
+    # Vertices closer than a fraction of a display pixel are invisible.
+    geometry = shapely.make_valid(shapely.simplify(geometry, span / pixels / 2))
+    return _path_arrays(geometry)
+
+
+def _load_path_arrays(region, source: str, projection, extent, pixels: int) -> tuple:
+    from .regions import _region_source_fingerprints
+
+    key = json.dumps([
+        _region_key(region, source), _projection_key(projection),
+        None if extent is None else [float(v) for v in extent], pixels, __version__,
+        _region_source_fingerprints(),
+    ], sort_keys=True, ensure_ascii=False)
+    with _paths_lock:
+        if key in _paths:
+            return _paths[key]
+
+    directory = get_cache_dir() / "clip_paths"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.npz"
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                vertices, codes = _build(region, source, projection, extent, pixels)
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    np.savez(tmp, vertices=vertices, codes=codes)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+    with np.load(path) as data:
+        arrays = (data["vertices"], data["codes"])
+    with _paths_lock:
+        if len(_paths) >= _MAX_PATHS:
+            _paths.pop(next(iter(_paths)))
+        _paths[key] = arrays
+    return arrays
+
+
+def get_clip_path(region="China", projection=None, extent=None, source: str = "auto", pixels: int = 2000):
+    """
+    Get a matplotlib clip path of a region.
+
+    The region outline is projected, cropped to the map extent and
+    simplified to the display resolution, so clipping a plot of the whole
+    country costs a few thousand vertices instead of the full-resolution
+    boundary. Paths are cached in memory and in the cache directory (see
+    :func:`get_cache_dir`) by region, projection, extent and resolution.
+
+    Parameters
+    ----------
+    region : str, int or shapely geometry, default "China"
+        ``"China"``, a province name or code, a Tibetan Plateau basin name,
+        or a polygon in longitude/latitude (see :func:`get_region_geometry`).
+    projection : cartopy.crs.Projection, optional
+        Projection of the axes. By default the path is in longitude/latitude,
+        for plain matplotlib axes or :class:`cartopy.crs.PlateCarree`.
+    extent : tuple of float, optional
+        ``(x0, x1, y0, y1)`` of the map in projection coordinates, as
+        returned by ``GeoAxes.get_extent()``. Parts of the region outside
+        it are dropped.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+        See :func:`get_region_geometry`.
+    pixels : int, default 2000
+        Display resolution: the path is simplified to half of
+        ``1 / pixels`` of the extent (or region) size.
+
+    Returns
+    -------
+    matplotlib.path.Path
+
+    See Also
+    --------
+    :func:`clip_artists` : Clip plotted artists in one call.
+    """
+    from matplotlib.path import Path
+
+    vertices, codes = _load_path_arrays(
+        region, source, projection, None if extent is None else tuple(extent), int(pixels)
+    )
+    return Path(vertices, codes, readonly=True)
+
+
+def _clip_targets(artist) -> list:
+    # Since matplotlib 3.8 a ContourSet is itself a collection; before, its
+    # polygons are in ``collections``.
+    if hasattr(artist, "set_clip_path"):
+        return [artist]
+    return list(getattr(artist, "collections", []))
+
+
+def clip_artists(artists, region="China", ax=None, source: str = "auto", pixels: int = 2000):
+    """
+    Clip plotted artists to a region ("maskout").
+
+    The clip path is taken from :func:`get_clip_path` in the projection and
+    current extent of the axes, so set the map extent before calling this.
+
+    Parameters
+    ----------
+    artists : artist or list of artists
+        Results of ``contourf``, ``contour``, ``pcolormesh``, ``imshow``
+        and the like.
+    region : str, int or shapely geometry, default "China"
+        See :func:`get_clip_path`.
+    ax : matplotlib.axes.Axes or cartopy.mpl.geoaxes.GeoAxes, optional
+        Axes of the artists. Defaults to the axes of the first artist.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+    pixels : int, default 2000
+
+    Returns
+    -------
+    matplotlib.path.Path
+        The clip path applied.
+
+    Examples
+    --------
+    >>> ax = plt.axes(projection=ccrs.LambertConformal(central_longitude=105))
+    >>> ax.set_extent([78, 128, 15, 55], crs=ccrs.PlateCarree())
+    >>> cf = ax.contourf(lon, lat, t2m, transform=ccrs.PlateCarree())
+    >>> clip_artists(cf, "China")
+    """
+    if not isinstance(artists, (list, tuple)):
+        artists = [artists]
+    if ax is None:
+        ax = next((a.axes for a in artists if getattr(a, "axes", None) is not None), None)
+        if ax is None:
+            raise ValueError("ax is required for artists not attached to axes")
+    projection = getattr(ax, "projection", None)
+    if hasattr(ax, "get_extent"):
+        extent = ax.get_extent()
+    else:
+        extent = (*ax.get_xlim(), *ax.get_ylim())
+    path = get_clip_path(region, projection=projection, extent=extent, source=source, pixels=pixels)
+    for artist in artists:
+        for target in _clip_targets(artist):
+            target.set_clip_path(path, transform=ax.transData)
+    return path
@@ -0,0 +1,249 @@
+"""
+Compact in-memory layers
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
+from pandas import DataFrame
+
+__all__ = [
+    "compact_geodataframe",
+    "CompactLayer",
+    "memory_report",
+]
+
+# Columns whose share of distinct values is below this become categoricals.
+CATEGORY_RATIO = 0.5
+
+
+def _compact_strings(series: pd.Series, string_dtype: str) -> pd.Series:
+    n_unique = series.nunique(dropna=True)
+    if len(series) and n_unique / len(series) < CATEGORY_RATIO:
+        return series.astype("category")
+    if string_dtype == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return series
+        return series.astype("string[pyarrow]")
+    return series
+
+
+def _is_empty(series: pd.Series) -> bool:
+    if series.isna().all():
+        return True
+    return series.dtype.kind in "iuf" and not series.fillna(0).any()
+
+
+def compact_geodataframe(
+    gdf: GeoDataFrame,
+    drop_empty: bool = True,
+    string_dtype: str = "arrow",
+    float32: bool = False,
+) -> GeoDataFrame:
+    """
+    Return a copy of ``gdf`` using memory-efficient attribute dtypes.
+
+    - String columns with many repeated values (names, codes) become
+      ``category``; the remaining ones use Arrow-backed strings when
+      ``pyarrow`` is installed.
+    - Integer columns are downcast to the narrowest dtype holding their
+      values, which is lossless.
+    - Columns that are entirely missing, or numeric and entirely zero (e.g.
+      ``AREA``/``PERIMETER`` of point layers), are dropped.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+    drop_empty : bool, default True
+        Drop empty attribute columns as described above.
+    string_dtype : {"arrow", "object"}, default "arrow"
+        Storage for string columns that are not made categorical.
+    float32 : bool, default False
+        Also downcast floating point attributes to ``float32``. This is lossy
+        beyond about seven significant digits.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+
+    See Also
+    --------
+    :class:`CompactLayer` : Additionally store coordinates as ``float32``.
+    :func:`memory_report` : Measure the effect.
+    """
+    geometry = gdf.geometry.name
+    columns = {}
+    for name in gdf.columns:
+        if name == geometry:
+            continue
+        series = gdf[name]
+        if drop_empty and _is_empty(series):
+            continue
+        kind = series.dtype.kind
+        if kind in "iu":
+            series = pd.to_numeric(series, downcast="unsigned" if series.min() >= 0 else "integer")
+        elif kind == "f" and float32:
+            series = series.astype(np.float32)
+        elif kind in "OSU" or pd.api.types.is_string_dtype(series.dtype):
+            series = _compact_strings(series, string_dtype)
+        columns[name] = series
+    out = GeoDataFrame(columns, index=gdf.index, geometry=gdf.geometry, crs=gdf.crs)
+    return out[[c for c in gdf.columns if c in out.columns]]
+
+
+class CompactLayer:
+    """
+    A layer with compact attributes and ``float32`` coordinate storage.
+
+    Geometries are held as flat coordinate and offset arrays
+    (:func:`shapely.to_ragged_array`) instead of one shapely object per
+    feature, which removes the per-object overhead and halves coordinate
+    memory. Use :meth:`to_geodataframe` to materialise shapely geometries when
+    geometry operations are needed.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        Layer to compact. Attributes are compacted with
+        :func:`compact_geodataframe`.
+    coords_dtype : numpy dtype, default ``numpy.float32``
+        Storage dtype of the coordinates. ``float32`` keeps about 1 m
+        precision in longitude/latitude.
+    **kwargs
+        Passed to :func:`compact_geodataframe`.
+
+    Examples
+    --------
+    >>> layer = CompactLayer(get_zh_CN_river3(type="polygon"))
+    >>> memory_report(layer)
+    >>> gdf = layer.to_geodataframe()
+    """
+
+    def __init__(self, gdf: GeoDataFrame, coords_dtype=np.float32, **kwargs):
+        compacted = compact_geodataframe(gdf, **kwargs)
+        self.crs = gdf.crs
+        self.attributes = DataFrame(compacted.drop(columns=compacted.geometry.name))
+        self.geometry_name = compacted.geometry.name
+        geoms = np.asarray(gdf.geometry.values)
+        geom_type, coords, offsets = shapely.to_ragged_array(geoms)
+        self.geometry_type = geom_type
+        self.coords = coords.astype(coords_dtype)
+        self.offsets = tuple(_narrow_offsets(o) for o in offsets)
+        # Mixed single/multi layers are stored as multi-part; remember which
+        # features were single-part so they round-trip unchanged.
+        self._single = None
+        if geom_type in (shapely.GeometryType.MULTIPOINT, shapely.GeometryType.MULTILINESTRING,
+                         shapely.GeometryType.MULTIPOLYGON):
+            single = shapely.get_type_id(geoms) == int(geom_type) - 3
+            if single.any():
+                self._single = single
+
+    def __len__(self) -> int:
+        return len(self.attributes)
+
+    def __repr__(self) -> str:
+        return (
+            f"<CompactLayer: {len(self)} features, {self.geometry_type.name}, "
+            f"{len(self.coords)} {self.coords.dtype} coordinates>"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Total bytes held by attributes, coordinates and offsets."""
+        return int(
+            self.attributes.memory_usage(deep=True).sum()
+            + self.coords.nbytes
+            + sum(o.nbytes for o in self.offsets)
+            + (self._single.nbytes if self._single is not None else 0)
+        )
+
+    def to_geodataframe(self) -> GeoDataFrame:
+        """Rebuild a regular GeoDataFrame with ``float64`` shapely geometries."""
+        geoms = shapely.from_ragged_array(
+            self.geometry_type,
+            self.coords.astype(np.float64),
+            tuple(o.astype(np.int64) for o in self.offsets),
+        )
+        if self._single is not None:
+            geoms[self._single] = shapely.get_geometry(geoms[self._single], 0)
+        gdf = self.attributes.copy()
+        gdf[self.geometry_name] = geoms
+        return GeoDataFrame(gdf, geometry=self.geometry_name, crs=self.crs)
+
+
+def _narrow_offsets(offsets: np.ndarray) -> np.ndarray:
+    if len(offsets) == 0 or offsets.max() < np.iinfo(np.int32).max:
+        return offsets.astype(np.int32)
+    return offsets
+
+
+def _geometry_bytes(geoms: np.ndarray) -> tuple:
+    """Return ``(coordinate_bytes, object_bytes)`` of an array of shapely geometries."""
+    valid = geoms[~shapely.is_missing(geoms)]
+    dims = np.where(shapely.has_z(valid), 3, 2)
+    coordinate_bytes = int((shapely.get_num_coordinates(valid) * dims * 8).sum())
+    # Python wrapper plus GEOS geometry headers for every part and ring.
+    n_parts = shapely.get_num_geometries(valid).sum()
+    n_rings = shapely.get_num_interior_rings(shapely.get_parts(valid)).sum() if len(valid) else 0
+    wrapper = sys.getsizeof(valid[0]) if len(valid) else 0
+    object_bytes = int(len(valid) * wrapper + (len(valid) + n_parts + n_rings) * 64)
+    return coordinate_bytes, object_bytes
+
+
+def memory_report(layer) -> DataFrame:
+    """
+    Report the memory used by each attribute column and by the geometries.
+
+    Parameters
+    ----------
+    layer : geopandas.GeoDataFrame or CompactLayer
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per attribute column plus ``geometry`` rows (coordinates and
+        per-object overhead) and a ``total`` row, with columns ``dtype``,
+        ``bytes`` and ``bytes_per_feature``. Geometry object overhead of
+        shapely/GEOS objects is an estimate; everything else is exact.
+
+    Examples
+    --------
+    >>> full = get_zh_CN_river3(type="polygon")
+    >>> memory_report(full)
+    >>> memory_report(get_zh_CN_river3(type="polygon", compact="float32"))
+    """
+    rows = []
+    if isinstance(layer, CompactLayer):
+        n = len(layer)
+        usage = layer.attributes.memory_usage(deep=True)
+        rows.append(("index", str(layer.attributes.index.dtype), int(usage["Index"])))
+        for name in layer.attributes.columns:
+            rows.append((name, str(layer.attributes[name].dtype), int(usage[name])))
+        rows.append(("geometry: coordinates", str(layer.coords.dtype), int(layer.coords.nbytes)))
+        rows.append((
+            "geometry: offsets",
+            str(layer.offsets[0].dtype) if layer.offsets else "",
+            int(sum(o.nbytes for o in layer.offsets)),
+        ))
+    else:
+        n = len(layer)
+        geometry = layer.geometry.name
+        usage = layer.memory_usage(deep=True)
+        rows.append(("index", str(layer.index.dtype), int(usage["Index"])))
+        for name in layer.columns:
+            if name == geometry:
+                continue
+            rows.append((name, str(layer[name].dtype), int(usage[name])))
+        coordinate_bytes, object_bytes = _geometry_bytes(np.asarray(layer.geometry.values))
+        rows.append(("geometry: coordinates", "float64", coordinate_bytes))
+        rows.append(("geometry: objects", "object", object_bytes + int(usage[geometry])))
+
+    report = DataFrame(rows, columns=["column", "dtype", "bytes"]).set_index("column")
+    report.loc["total"] = ["", int(report["bytes"].sum())]
+    report["bytes"] = report["bytes"].astype("int64")
+    report["bytes_per_feature"] = report["bytes"] / max(n, 1)
+    return report
@@ -0,0 +1,205 @@
+"""
+User dataset registry
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .layers import BUNDLED_LAYERS, LAYER_ALIASES, USER_LAYERS, LayerSpec, get_layer
+from .tool import list_archive_members, extract_archive_once
+
+__all__ = [
+    "register_dataset",
+    "unregister_dataset",
+    "list_datasets",
+    "load_dataset",
+]
+
+logger = logging.getLogger("easyclimate_map")
+
+# Dataset name -> names of its layers in USER_LAYERS.
+_DATASETS = {}
+
+_GEOMETRY_FAMILIES = {
+    "Point": "point",
+    "MultiPoint": "point",
+    "LineString": "line",
+    "MultiLineString": "line",
+    "Polygon": "polygon",
+    "MultiPolygon": "polygon",
+}
+
+
+def _geometry_family(shp: Path) -> str:
+    import pyogrio
+
+    geometry_type = pyogrio.read_info(shp)["geometry_type"] or ""
+    return _GEOMETRY_FAMILIES.get(geometry_type.replace(" Z", "").replace(" M", ""), "unknown")
+
+
+def register_dataset(
+    name: str,
+    path,
+    members=None,
+    encoding=None,
+    name_fields=(),
+    code_fields=(),
+    overwrite: bool = False,
+) -> list:
+    """
+    Register shapefiles from a 7z/zip archive or directory under a name.
+
+    Registered layers behave like bundled ones: :func:`get_layer` reads them
+    through the same extraction cache (archives are decompressed once per
+    content hash), ``bbox=`` uses a persisted :func:`get_spatial_index`,
+    ``names=``/``codes=`` use :func:`get_attribute_index`, and they can be
+    passed by name to :func:`overlay_statistics`, :func:`get_cell_cover` and
+    other functions that take a catalogue name.
+
+    Parameters
+    ----------
+    name : str
+        Dataset name. A dataset with one shapefile is registered as ``name``;
+        with several, each is registered as ``"name/<stem>"``.
+    path : str or pathlib.Path
+        A ``.7z`` or ``.zip`` archive, a directory, or a ``.shp`` file.
+    members : str or list of str, optional
+        Shapefiles to register (relative path, file name or stem, see
+        :func:`list_archive_members`). Defaults to all.
+    encoding : str, optional
+        Attribute encoding, when the shapefiles lack a ``.cpg`` file.
+    name_fields, code_fields : tuple of str, optional
+        Attribute columns to index for ``names=`` and ``codes=`` selection.
+    overwrite : bool, default False
+        Replace an existing dataset of the same name.
+
+    Returns
+    -------
+    list of str
+        Names of the registered layers.
+
+    Raises
+    ------
+    ValueError
+        If the name is taken, or a requested member does not exist.
+
+    Examples
+    --------
+    >>> register_dataset("catchments", "catchments.zip", name_fields=("NAME",))
+    ['catchments/basins', 'catchments/subbasins']
+    >>> layers = load_dataset("catchments")
+    >>> sub = get_layer("catchments/subbasins", bbox=(100, 30, 105, 35))
+    """
+    if name in BUNDLED_LAYERS or name in LAYER_ALIASES:
+        raise ValueError(f"{name!r} is the name of a bundled layer")
+    if name in _DATASETS:
+        if not overwrite:
+            raise ValueError(f"Dataset {name!r} is already registered; pass overwrite=True to replace it")
+        unregister_dataset(name)
+
+    path = Path(path).expanduser().resolve()
+    if not path.exists():
+        raise FileNotFoundError(path)
+    available = list_archive_members(path)
+    if members is not None:
+        wanted = [members] if isinstance(members, str) else list(members)
+        selected = []
+        for member in wanted:
+            matches = [m for m in available if member in (m, Path(m).name, Path(m).stem)]
+            if not matches:
+                raise ValueError(f"No shapefile {member!r} in {path.name}; available: {available}")
+            selected.append(matches[0])
+        available = selected
+    if not available:
+        raise ValueError(f"No .shp file found in {path.name}")
+
+    root = path if path.is_dir() or path.suffix.lower() == ".shp" else extract_archive_once(path)
+    registered = []
+    for member in available:
+        layer = name if len(available) == 1 else f"{name}/{Path(member).stem}"
+        if path.is_dir():
+            # Directories are read in place; fingerprints then track the .shp
+            # and its sidecar files.
+            spec_path, spec_member, shp = path / member, None, path / member
+        elif path.suffix.lower() == ".shp":
+            spec_path, spec_member, shp = path, None, path
+        else:
+            spec_path, spec_member, shp = path, member, root / member
+        USER_LAYERS[layer] = LayerSpec(
+            name=layer,
+            path=spec_path,
+            encoding=encoding,
+            geometry=_geometry_family(shp),
+            name_fields=tuple(name_fields),
+            code_fields=tuple(code_fields),
+            member=spec_member,
+        )
+        registered.append(layer)
+    _DATASETS[name] = registered
+    logger.debug("registered dataset %s: %s", name, registered)
+    return list(registered)
+
+
+def unregister_dataset(name: str):
+    """
+    Remove a dataset added with :func:`register_dataset`.
+
+    Parameters
+    ----------
+    name : str
+    """
+    try:
+        layers = _DATASETS.pop(name)
+    except KeyError:
+        raise KeyError(f"No dataset named {name!r}") from None
+    for layer in layers:
+        USER_LAYERS.pop(layer, None)
+
+
+def list_datasets() -> dict:
+    """
+    List registered datasets.
+
+    Returns
+    -------
+    dict of str to list of str
+        Dataset names mapped to their layer names.
+    """
+    return {name: list(layers) for name, layers in _DATASETS.items()}
+
+
+def load_dataset(name: str, max_workers=None, **kwargs):
+    """
+    Load a registered dataset or a single registered layer.
+
+    Layers of a multi-layer dataset are read in parallel threads.
+
+    Parameters
+    ----------
+    name : str
+        Dataset name, or a layer name such as ``"catchments/basins"``.
+    max_workers : int, optional
+        Number of threads.
+    **kwargs
+        Passed to :func:`get_layer` for every layer, e.g. ``bbox``.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame or dict of str to geopandas.GeoDataFrame
+        A GeoDataFrame for a single-layer dataset or a layer name, otherwise
+        a dict keyed by layer name.
+    """
+    if name in USER_LAYERS and name not in _DATASETS:
+        return get_layer(name, **kwargs)
+    try:
+        layers = _DATASETS[name]
+    except KeyError:
+        raise KeyError(f"No dataset named {name!r}; registered datasets are {list(_DATASETS)}") from None
+    if len(layers) == 1:
+        return get_layer(layers[0], **kwargs)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        loaded = dict(zip(layers, pool.map(lambda layer: get_layer(layer, **kwargs), layers)))
+    logger.debug("loaded dataset %s (%d layers) in %.3f s", name, len(layers), time.perf_counter() - start)
+    return loaded
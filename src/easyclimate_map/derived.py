@@ -0,0 +1,287 @@
+"""
+Derived data products
+"""
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from pandas import DataFrame
+
+from .cache import get_cache_dir, file_fingerprint, cache_lock
+from .layers import get_layer_spec, script_folder_path
+
+__all__ = [
+    "list_derived_products",
+    "load_derived_product",
+    "build_derived_products",
+    "check_derived_products",
+]
+
+derived_path = script_folder_path / "derived_data"
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass(frozen=True)
+class DerivedProduct:
+    """A table or layer computed from bundled layers."""
+    name: str
+    filename: str
+    sources: tuple
+    builder: Callable
+
+
+DERIVED_PRODUCTS = {}
+
+
+def register_derived_product(name: str, filename: str, sources):
+    """
+    Register the decorated function as the builder of a derived product.
+
+    Parameters
+    ----------
+    name : str
+        Product name used by :func:`load_derived_product`.
+    filename : str
+        File name of the shipped product; the suffix selects the format.
+    sources : sequence of str
+        Catalogue names of the bundled layers the product is computed from.
+    """
+    def decorator(builder):
+        DERIVED_PRODUCTS[name] = DerivedProduct(name, filename, tuple(sources), builder)
+        return builder
+    return decorator
+
+
+def _ensure_registered():
+    # Products register themselves when their module is imported.
+    from . import hierarchy  # noqa: F401
+    from . import derived_layers  # noqa: F401
+
+
+def list_derived_products() -> list:
+    """
+    List the names of all derived products.
+
+    Returns
+    -------
+    list of str
+    """
+    _ensure_registered()
+    return list(DERIVED_PRODUCTS)
+
+
+def _get_product(name: str) -> DerivedProduct:
+    _ensure_registered()
+    try:
+        return DERIVED_PRODUCTS[name]
+    except KeyError:
+        raise KeyError(
+            f"Unknown derived product {name!r}; available products are {list(DERIVED_PRODUCTS)}"
+        ) from None
+
+
+def _source_fingerprints(product: DerivedProduct) -> dict:
+    return {layer: file_fingerprint(get_layer_spec(layer).path) for layer in product.sources}
+
+
+def _write(data, path: Path):
+    """Write ``data`` next to ``path`` and atomically move it into place."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        if path.suffix == ".csv":
+            data.to_csv(tmp, index=False, encoding="utf-8")
+        elif path.suffix == ".7z":
+            _write_7z_shapefile(data, tmp, path.stem)
+        else:
+            raise ValueError(f"Unsupported derived product format {path.suffix!r}")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _write_7z_shapefile(gdf, archive: Path, stem: str):
+    """Write ``gdf`` as a shapefile inside a 7z archive, like the bundled layers."""
+    import tempfile
+    import py7zr
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        gdf.to_file(Path(tmpdir) / f"{stem}.shp", driver="ESRI Shapefile", encoding="utf-8")
+        with py7zr.SevenZipFile(archive, "w") as f:
+            for member in sorted(Path(tmpdir).iterdir()):
+                f.write(member, member.name)
+
+
+def _read(path: Path):
+    if path.suffix == ".csv":
+        import pandas as pd
+        return pd.read_csv(path, encoding="utf-8")
+    if path.suffix == ".7z":
+        from .tool import read_shapefile_from_7z
+        return read_shapefile_from_7z(path, encoding="utf-8")
+    raise ValueError(f"Unsupported derived product format {path.suffix!r}")
+
+
+def _equal(left, right) -> bool:
+    from pandas.testing import assert_frame_equal
+    from geopandas import GeoDataFrame
+
+    if isinstance(left, GeoDataFrame) or isinstance(right, GeoDataFrame):
+        if not (isinstance(left, GeoDataFrame) and isinstance(right, GeoDataFrame)):
+            return False
+        if len(left) != len(right) or not _geometry_equal(left.geometry.values, right.geometry.values):
+            return False
+        left = DataFrame(left.drop(columns=left.geometry.name))
+        right = DataFrame(right.drop(columns=right.geometry.name))
+    try:
+        assert_frame_equal(
+            left.reset_index(drop=True), right.reset_index(drop=True),
+            check_dtype=False, check_exact=False, rtol=1e-6,
+        )
+    except AssertionError:
+        return False
+    return True
+
+
+def _geometry_equal(left, right, rtol: float = 1e-9) -> bool:
+    """Compare geometries up to vertex order, ring orientation and round-off."""
+    import numpy as np
+    import shapely
+
+    left = shapely.normalize(np.asarray(left))
+    right = shapely.normalize(np.asarray(right))
+    same = shapely.equals_exact(left, right, tolerance=1e-9)
+    if same.all():
+        return True
+    # A different GEOS version may node a union slightly differently.
+    left, right = left[~same], right[~same]
+    if not (shapely.get_dimensions(left) == 2).all():
+        return False
+    difference = shapely.area(shapely.symmetric_difference(left, right))
+    return bool((difference <= rtol * np.maximum(shapely.area(left), 1e-12)).all())
+
+
+def _read_manifest(directory: Path) -> dict:
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _locate(product: DerivedProduct, fingerprints: dict) -> Path:
+    """Return the shipped file if it is current, else the cache file to use."""
+    shipped = derived_path / product.filename
+    entry = _read_manifest(derived_path).get(product.name, {})
+    if shipped.exists() and entry.get("sources") == fingerprints:
+        return shipped
+    key = _fingerprint_key(fingerprints)
+    directory = get_cache_dir() / "derived"
+    directory.mkdir(parents=True, exist_ok=True)
+    stem, suffix = os.path.splitext(product.filename)
+    return directory / f"{stem}-{key[:16]}{suffix}"
+
+
+def _fingerprint_key(fingerprints: dict) -> str:
+    return hashlib.sha256(json.dumps(fingerprints, sort_keys=True).encode()).hexdigest()
+
+
+def load_derived_product(name: str) -> DataFrame:
+    """
+    Load a derived product, regenerating it if the bundled data changed.
+
+    The copy shipped with the package is used as long as the fingerprints of
+    its source layers match those recorded at build time. Otherwise the
+    product is rebuilt once into the cache directory (see
+    :func:`get_cache_dir`) and reused from there; concurrent processes wait
+    for a single rebuild (see :func:`cache_lock`).
+
+    Parameters
+    ----------
+    name : str
+        Product name, see :func:`list_derived_products`.
+
+    Returns
+    -------
+    pandas.DataFrame or geopandas.GeoDataFrame
+    """
+    product = _get_product(name)
+    fingerprints = _source_fingerprints(product)
+    return _load(product.name, json.dumps(fingerprints, sort_keys=True))
+
+
+@lru_cache(maxsize=None)
+def _load(name: str, fingerprints: str):
+    product = _get_product(name)
+    path = _locate(product, json.loads(fingerprints))
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                _write(product.builder(), path)
+    return _read(path)
+
+
+def build_derived_products(outdir=None, names=None) -> dict:
+    """
+    Build derived products from the bundled data and write their manifest.
+
+    This is run at build time (``scripts/build_derived_data.py``) so that the
+    products ship with the package.
+
+    Parameters
+    ----------
+    outdir : str or pathlib.Path, optional
+        Output directory. Defaults to the package's ``derived_data`` directory.
+    names : list of str, optional
+        Products to build. Defaults to all.
+
+    Returns
+    -------
+    dict
+        The manifest written to ``outdir``.
+    """
+    outdir = Path(outdir) if outdir is not None else derived_path
+    outdir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(outdir)
+    for name in names or list_derived_products():
+        product = _get_product(name)
+        _write(product.builder(), outdir / product.filename)
+        manifest[name] = {"file": product.filename, "sources": _source_fingerprints(product)}
+    with open(outdir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+
+def check_derived_products(names=None) -> list:
+    """
+    Regenerate derived products and compare them with the shipped copies.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        Products to check. Defaults to all.
+
+    Returns
+    -------
+    list of str
+        Names of products that are missing, stale or differ from a fresh build.
+        An empty list means everything shipped is consistent.
+    """
+    manifest = _read_manifest(derived_path)
+    problems = []
+    for name in names or list_derived_products():
+        product = _get_product(name)
+        shipped = derived_path / product.filename
+        entry = manifest.get(name, {})
+        if not shipped.exists() or entry.get("sources") != _source_fingerprints(product):
+            problems.append(name)
+            continue
+        if not _equal(_read(shipped), product.builder()):
+            problems.append(name)
+    return problems
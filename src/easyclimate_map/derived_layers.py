@@ -0,0 +1,101 @@
+"""
+Derived layers
+"""
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame
+
+from .derived import register_derived_product, load_derived_product
+from .layers import get_layer, _as_lonlat
+
+__all__ = [
+    "get_derived_layer",
+]
+
+
+@register_derived_product(
+    "tibetan_plateau_outline",
+    "tibetan_plateau_outline.7z",
+    sources=("tp_basins",),
+)
+def _build_tibetan_plateau_outline() -> GeoDataFrame:
+    basins = _as_lonlat(get_layer("tp_basins"))[["geometry"]]
+    outline = basins.dissolve().reset_index(drop=True)
+    # Shapefiles need an attribute column, otherwise readers invent ``FID``.
+    outline.insert(0, "NAME", "Tibetan Plateau")
+    return outline
+
+
+@register_derived_product(
+    "nation_outline",
+    "nation_outline.7z",
+    sources=("nation_polygon",),
+)
+def _build_nation_outline() -> GeoDataFrame:
+    nation = _as_lonlat(get_layer("nation_polygon"))[["geometry"]]
+    outline = nation.dissolve().reset_index(drop=True)
+    outline.insert(0, "NAME", "China")
+    return outline
+
+
+@register_derived_product(
+    "province_outlines",
+    "province_outlines.7z",
+    sources=("provinces_polygon",),
+)
+def _build_province_outlines() -> GeoDataFrame:
+    provinces = _as_lonlat(get_layer("provinces_polygon"))
+    provinces = provinces[provinces["NAME"].notna()][["NAME", "ADCODE99", "geometry"]]
+    provinces = provinces.dissolve(by=["NAME", "ADCODE99"], as_index=False)
+    return provinces.sort_values("ADCODE99").reset_index(drop=True)
+
+
+def _exterior_lines(gdf: GeoDataFrame) -> GeoDataFrame:
+    """Replace polygons by their exterior rings, like :func:`extract_outer_boundary`."""
+    geoms = np.asarray(gdf.geometry.values)
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    rings = shapely.get_exterior_ring(parts)
+    lines = np.array([
+        rings[index == i][0] if (index == i).sum() == 1 else shapely.multilinestrings(rings[index == i])
+        for i in range(len(geoms))
+    ], dtype=object)
+    out = gdf.copy()
+    out[gdf.geometry.name] = lines
+    return out
+
+
+def get_derived_layer(name: str, type: str = "polygon") -> GeoDataFrame:
+    """
+    Get a layer precomputed from the bundled data.
+
+    Dissolving thousands of polygons is done once at build time and the
+    result ships with the package (see :func:`load_derived_product`), so this
+    only reads a small file.
+
+    Parameters
+    ----------
+    name : {"tibetan_plateau_outline", "nation_outline", "province_outlines"}
+        Derived layer name.
+    type : {"polygon", "line"}, default "polygon"
+        ``"polygon"`` returns the dissolved polygons; ``"line"`` returns
+        their exterior rings without interior holes, as
+        :func:`extract_outer_boundary` does.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        In longitude/latitude (EPSG:4326).
+
+    See Also
+    --------
+    :func:`get_Tibetan_Plateau_boundary`, :func:`get_zh_CN_nation_outline`,
+    :func:`get_zh_CN_province_outlines`
+    """
+    if type not in ("line", "polygon"):
+        raise ValueError("type must be either 'line' or 'polygon'")
+    gdf = load_derived_product(name)
+    if not isinstance(gdf, GeoDataFrame):
+        raise KeyError(f"Derived product {name!r} is a table, not a layer")
+    if gdf.crs is None:
+        gdf = gdf.set_crs(4326)
+    return _exterior_lines(gdf) if type == "line" else gdf.copy()
@@ -0,0 +1,189 @@
+"""
+Distance-to-feature fields
+"""
+import numpy as np
+import shapely
+
+from .layers import _resolve_layer
+
+__all__ = [
+    "distance_to_feature",
+]
+
+
+def _local_aeqd(gdf):
+    """Azimuthal equidistant projection centred on the layer extent."""
+    from pyproj import CRS, Transformer
+
+    minx, miny, maxx, maxy = gdf.total_bounds
+    crs = CRS.from_proj4(
+        f"+proj=aeqd +lat_0={(miny + maxy) / 2} +lon_0={(minx + maxx) / 2} +datum=WGS84 +units=m"
+    )
+    forward = Transformer.from_crs(4326, crs, always_xy=True)
+    inverse = Transformer.from_crs(crs, 4326, always_xy=True)
+    return forward, inverse
+
+
+def _transform_coords(transformer):
+    def func(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return func
+
+
+def _explode_segments(geoms):
+    """
+    Split geometries into two-point segments (points are kept as they are).
+
+    Returns the segment geometries and, for each one, the position of the
+    geometry it came from. Indexing segments instead of whole features keeps
+    the STRtree envelopes tight, which makes nearest queries against long
+    rivers and borders orders of magnitude faster.
+    """
+    parts, owner = shapely.get_parts(geoms, return_index=True)
+    type_id = shapely.get_type_id(parts)
+    is_point = type_id == 0
+    is_polygon = type_id == 3
+    # Polygons are split into their rings, so that no segment joins the end
+    # of one ring to the start of the next.
+    rings, ring_part = shapely.get_rings(parts[is_polygon], return_index=True)
+    lines = np.concatenate([parts[~is_point & ~is_polygon], rings])
+    line_owner = np.concatenate([owner[~is_point & ~is_polygon], owner[is_polygon][ring_part]])
+    coords, line_idx = shapely.get_coordinates(lines, return_index=True)
+    same = line_idx[1:] == line_idx[:-1]
+    segments = shapely.linestrings(np.stack([coords[:-1][same], coords[1:][same]], axis=1))
+    segment_owner = line_owner[line_idx[:-1][same]]
+    return (
+        np.concatenate([segments, parts[is_point]]),
+        np.concatenate([segment_owner, owner[is_point]]),
+    )
+
+
+def distance_to_feature(
+    lat,
+    lon,
+    layer,
+    boundary: bool = True,
+    id_column=None,
+    chunk_size: int = 200_000,
+):
+    """
+    Compute the geodesic distance from every grid cell to the nearest feature of a layer.
+
+    The features are projected once to an azimuthal equidistant projection
+    centred on the layer, split into segments, indexed in a
+    :class:`shapely.STRtree` and queried for
+    the nearest feature of every grid point in vectorised chunks. The distance
+    of each point to the nearest location on that feature is then measured on
+    the WGS84 ellipsoid, so the returned values are geodesic rather than
+    planar degrees.
+
+    Parameters
+    ----------
+    lat, lon : array-like
+        1-D latitude and longitude coordinates of the grid in degrees.
+        Longitudes may be given in either -180..180 or 0..360 convention.
+    layer : str or geopandas.GeoDataFrame
+        A catalogue name such as ``"river1_line"`` or ``"nation_polygon"``
+        (see :func:`list_layers`), or a GeoDataFrame, e.g. the result of
+        :func:`get_zh_CN_river1`.
+    boundary : bool, default True
+        For polygon layers, measure the distance to the polygon boundary
+        (e.g. the coastline and land border of ``"nation_polygon"``) instead
+        of returning zero inside the polygons.
+    id_column : str, optional
+        Column whose value identifies the nearest feature. By default the
+        index label of the feature in ``layer`` is returned.
+    chunk_size : int, default 200000
+        Number of grid points processed at once, bounding peak memory on
+        large grids such as 0.05° national domains.
+
+    Returns
+    -------
+    xarray.Dataset
+        Dataset on the ``(lat, lon)`` grid with variables ``distance``
+        (kilometres) and ``nearest`` (identifier of the nearest feature).
+
+    Notes
+    -----
+    The nearest feature is selected in the local equidistant projection and
+    its distance then measured geodesically. Far from the layer centre the
+    projection distorts distances by a few percent, which can only change
+    which of two almost equally distant features is reported.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> lat = np.arange(15, 55, 0.05)
+    >>> lon = np.arange(70, 140, 0.05)
+    >>> ds = distance_to_feature(lat, lon, "river1_line")
+    >>> ds.distance.plot()
+    """
+    import xarray as xr
+    from pyproj import Geod
+
+    lat_name = getattr(lat, "name", None) or "lat"
+    lon_name = getattr(lon, "name", None) or "lon"
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.ndim != 1 or lon.ndim != 1:
+        raise ValueError("lat and lon must be 1-D coordinate arrays")
+
+    gdf = _resolve_layer(layer)
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    geoms = np.asarray(gdf.geometry.values)
+    is_polygon = np.isin(shapely.get_type_id(geoms), [3, 6])
+    ids = gdf[id_column].to_numpy() if id_column is not None else gdf.index.to_numpy()
+
+    forward, inverse = _local_aeqd(gdf)
+    geoms = shapely.transform(geoms, _transform_coords(forward))
+    projected, owner = _explode_segments(geoms)
+    tree = shapely.STRtree(projected)
+    # Points inside a polygon are at distance zero from it.
+    polygon_idx = np.flatnonzero(is_polygon) if not boundary else np.array([], dtype=np.intp)
+    polygon_tree = shapely.STRtree(geoms[polygon_idx]) if len(polygon_idx) else None
+    geod = Geod(ellps="WGS84")
+
+    lon2d, lat2d = np.meshgrid((lon + 180.0) % 360.0 - 180.0, lat)
+    lon_flat, lat_flat = lon2d.ravel(), lat2d.ravel()
+    distance = np.empty(lon_flat.size, dtype=np.float64)
+    nearest = np.empty(lon_flat.size, dtype=np.intp)
+
+    for start in range(0, lon_flat.size, chunk_size):
+        stop = min(start + chunk_size, lon_flat.size)
+        x, y = forward.transform(lon_flat[start:stop], lat_flat[start:stop])
+        points = shapely.points(x, y)
+        point_idx, tree_idx = tree.query_nearest(points, all_matches=False)
+        order = np.argsort(point_idx)
+        tree_idx = tree_idx[order]
+
+        # Closest location on each nearest feature, back in lon/lat.
+        lines = shapely.shortest_line(points, projected[tree_idx])
+        ends = shapely.get_coordinates(lines).reshape(-1, 2, 2)[:, 1]
+        end_lon, end_lat = inverse.transform(ends[:, 0], ends[:, 1])
+        _, _, dist = geod.inv(lon_flat[start:stop], lat_flat[start:stop], end_lon, end_lat)
+
+        distance[start:stop] = dist / 1000.0
+        nearest[start:stop] = owner[tree_idx]
+
+        if polygon_tree is not None:
+            inside, polygon = polygon_tree.query(points, predicate="intersects")
+            inside, first = np.unique(inside, return_index=True)
+            distance[start + inside] = 0.0
+            nearest[start + inside] = polygon_idx[polygon[first]]
+
+    shape = (lat.size, lon.size)
+    coords = {lat_name: lat, lon_name: lon}
+    dims = (lat_name, lon_name)
+    return xr.Dataset(
+        {
+            "distance": xr.DataArray(
+                distance.reshape(shape), coords=coords, dims=dims,
+                attrs={"long_name": "geodesic distance to nearest feature", "units": "km"},
+            ),
+            "nearest": xr.DataArray(
+                ids[nearest].reshape(shape), coords=coords, dims=dims,
+                attrs={"long_name": "identifier of nearest feature"},
+            ),
+        }
+    )
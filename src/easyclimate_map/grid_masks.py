@@ -0,0 +1,390 @@
+"""
+Region masks on curvilinear and projected grids
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import numpy as np
+import shapely
+
+from .cache import get_cache_dir, cache_lock
+from .layers import get_layer_spec, _layer_fingerprint
+from .version import __version__
+
+__all__ = [
+    "grid_mask",
+    "grid_region_index",
+    "clip_dataset",
+]
+
+logger = logging.getLogger("easyclimate_map")
+
+# Grid coordinates may deviate from a regular lattice by this fraction of a
+# cell (e.g. float32 XLAT/XLONG) and still be rasterised.
+_REGULAR_TOLERANCE = 1e-2
+
+# Polygon edges are split to this length (degrees) before projection, so
+# long straight edges follow the projected curve.
+_SEGMENT_DEGREES = 0.1
+
+
+def _to_crs(projection):
+    from pyproj import CRS
+
+    if hasattr(projection, "to_wkt"):
+        return CRS.from_wkt(projection.to_wkt())
+    return CRS.from_user_input(projection)
+
+
+def _grid_coordinates(lon, lat, projection) -> tuple:
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if lon.ndim == 1 and lat.ndim == 1:
+        lon, lat = np.meshgrid(lon, lat)
+    if lon.shape != lat.shape or lon.ndim != 2:
+        raise ValueError("lon and lat must be 2-D arrays of the same shape, or 1-D coordinates")
+    if projection is None:
+        return lon, lat, None
+    from pyproj import Transformer
+
+    transformer = Transformer.from_crs(4326, _to_crs(projection), always_xy=True)
+    x, y = transformer.transform(lon, lat)
+    return np.asarray(x), np.asarray(y), transformer
+
+
+def _lattice(x: np.ndarray, y: np.ndarray):
+    """``(x0, dx, y0, dy)`` if grid points are ``(x0 + i dx, y0 + j dy)``, else None."""
+    ny, nx = x.shape
+    if nx < 2 or ny < 2:
+        return None
+    dx = (x[:, -1] - x[:, 0]).mean() / (nx - 1)
+    dy = (y[-1, :] - y[0, :]).mean() / (ny - 1)
+    if dx == 0 or dy == 0 or not np.isfinite(dx + dy):
+        return None
+    x0 = (x - np.arange(nx) * dx).mean()
+    y0 = (y - np.arange(ny)[:, None] * dy).mean()
+    error_x = np.abs(x - (x0 + np.arange(nx) * dx)).max() / abs(dx)
+    error_y = np.abs(y - (y0 + np.arange(ny)[:, None] * dy)).max() / abs(dy)
+    if max(error_x, error_y) > _REGULAR_TOLERANCE:
+        return None
+    return x0, dx, y0, dy
+
+
+def _scanline(geometry, shape: tuple) -> tuple:
+    """
+    Rasterise a polygon given in fractional grid indices.
+
+    For every grid row the crossings of the polygon edges with the row are
+    found, sorted, and the cells between alternate crossings filled
+    (even-odd rule, so holes need no special treatment). Returns the filled
+    window of rows and its first row.
+    """
+    ny, nx = shape
+    rings = shapely.get_rings(shapely.get_parts(geometry))
+    coords, ring = shapely.get_coordinates(rings, return_index=True)
+    same = ring[1:] == ring[:-1]
+    (ax, ay), (bx, by) = coords[:-1][same].T, coords[1:][same].T
+    # Row j is crossed by edges with min(ay, by) <= j < max(ay, by); the
+    # half-open rule counts a vertex on a row exactly once.
+    j0 = np.clip(np.ceil(np.minimum(ay, by)), 0, ny).astype(np.int64)
+    j1 = np.clip(np.ceil(np.maximum(ay, by)), 0, ny).astype(np.int64)
+    n = np.maximum(j1 - j0, 0)
+    if not n.sum():
+        return np.zeros((0, nx), dtype=bool), 0
+    edge = np.repeat(np.arange(len(n)), n)
+    row = j0[edge] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    t = (row - ay[edge]) / (by[edge] - ay[edge])
+    cross = ax[edge] + t * (bx[edge] - ax[edge])
+    order = np.lexsort((cross, row))
+    row, cross = row[order], cross[order]
+    # Cells with centres in [start, stop) of each crossing pair are inside.
+    start = np.clip(np.ceil(cross[0::2]), 0, nx).astype(np.int64)
+    stop = np.clip(np.ceil(cross[1::2]), 0, nx).astype(np.int64)
+    first = int(row.min())
+    window = np.zeros((int(row.max()) - first + 1, nx + 1), dtype=np.int32)
+    np.add.at(window, (row[0::2] - first, start), 1)
+    np.add.at(window, (row[0::2] - first, stop), -1)
+    return np.cumsum(window, axis=1)[:, :nx] > 0, first
+
+
+def _rasterise(geometries, labels_index, lon, lat, projection) -> np.ndarray:
+    """Index of the geometry covering each grid point, or -1."""
+    x, y, transformer = _grid_coordinates(lon, lat, projection)
+    result = np.full(x.shape, -1, dtype=np.int32)
+
+    def native(geometry):
+        if transformer is None:
+            return geometry
+        geometry = shapely.segmentize(geometry, _SEGMENT_DEGREES)
+        return shapely.transform(
+            geometry, lambda c: np.column_stack(transformer.transform(c[:, 0], c[:, 1]))
+        )
+
+    lattice = _lattice(x, y)
+    if lattice is None:
+        logger.debug("grid is not regular in its coordinates; testing points individually")
+    for index, geometry in zip(labels_index, geometries):
+        geometry = native(geometry)
+        if lattice is None:
+            minx, miny, maxx, maxy = geometry.bounds
+            near = np.flatnonzero(((x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)).ravel())
+            shapely.prepare(geometry)
+            inside = near[shapely.contains_xy(geometry, x.ravel()[near], y.ravel()[near])]
+            result.ravel()[inside] = index
+            continue
+        x0, dx, y0, dy = lattice
+        # In fractional grid indices cell centres fall on integers.
+        in_index = shapely.transform(geometry, lambda c: np.column_stack([(c[:, 0] - x0) / dx, (c[:, 1] - y0) / dy]))
+        window, first = _scanline(in_index, x.shape)
+        result[first:first + len(window)][window] = index
+    return result
+
+
+def _grid_key(lon, lat, projection, *params) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (lon, lat):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    if projection is not None:
+        digest.update(_to_crs(projection).to_wkt().encode())
+    digest.update(json.dumps(params, ensure_ascii=False, default=str).encode())
+    digest.update(__version__.encode())
+    return digest.hexdigest()
+
+
+def _cached(key: str, build) -> tuple:
+    directory = get_cache_dir() / "grid_masks"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{key}.npz"
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                index, labels = build()
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    np.savez_compressed(tmp, index=index, labels=np.asarray(json.dumps(labels, ensure_ascii=False)))
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return index, labels
+    with np.load(path) as data:
+        return data["index"], json.loads(str(data["labels"]))
+
+
+def grid_mask(lon, lat, region="China", projection=None, source: str = "auto", cache: bool = True) -> np.ndarray:
+    """
+    Mask the points of a 2-D grid lying in a region.
+
+    With ``projection``, the region is transformed into the grid's native
+    projection, where model grids such as WRF's Lambert conformal grids are
+    regular, and rasterised row by row from its edge crossings instead of
+    testing every point. Grids that are not regular in their coordinates
+    fall back to a vectorised point-in-polygon test. Masks are cached in the
+    cache directory (see :func:`get_cache_dir`) by a hash of the grid
+    coordinates, projection and region.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        2-D longitude/latitude of the grid points (e.g. WRF ``XLONG`` and
+        ``XLAT``), or 1-D coordinates of a rectilinear grid.
+    region : str, int or shapely geometry, default "China"
+        See :func:`get_region_geometry`.
+    projection : pyproj.CRS, str or cartopy.crs.CRS, optional
+        Native projection of the grid, e.g. ``"+proj=lcc +lat_1=30 +lat_2=60
+        +lat_0=35 +lon_0=110 +R=6370000"``. Without it the grid is
+        rasterised in longitude/latitude.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+        See :func:`get_region_geometry`.
+    cache : bool, default True
+        Read and write the disk cache.
+
+    Returns
+    -------
+    numpy.ndarray of bool
+        ``True`` for grid points inside the region, shaped like ``lon``.
+
+    Examples
+    --------
+    >>> mask = grid_mask(ds.XLONG[0], ds.XLAT[0], "Sichuan", projection=wrf_lcc)
+    >>> ds.T2.where(mask)
+    """
+    from .regions import get_region_geometry, _region_source_fingerprints
+
+    def build():
+        geometry = get_region_geometry(region, source=source)
+        return _rasterise([geometry], [0], lon, lat, projection), ["region"]
+
+    if not cache:
+        index, _ = build()
+    else:
+        region_key = (
+            "wkb:" + hashlib.blake2b(shapely.to_wkb(region), digest_size=16).hexdigest()
+            if isinstance(region, shapely.Geometry) else f"{source}:{region}"
+        )
+        fingerprints = _region_source_fingerprints()
+        index, _ = _cached(_grid_key(lon, lat, projection, "mask", region_key, fingerprints), build)
+    return index >= 0
+
+
+def grid_region_index(
+    lon,
+    lat,
+    layer="provinces_polygon",
+    region_column=None,
+    projection=None,
+    cache: bool = True,
+) -> tuple:
+    """
+    Label the points of a 2-D grid with the region of a polygon layer.
+
+    Each region is rasterised in the grid's native projection as in
+    :func:`grid_mask`. Results for catalogue layers are cached by grid and
+    layer.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        2-D longitude/latitude of the grid points, or 1-D coordinates.
+    layer : str or geopandas.GeoDataFrame, default "provinces_polygon"
+        Polygon layer, e.g. ``"tp_basins"``. Features sharing a
+        ``region_column`` value form one region.
+    region_column : str, optional
+        Column labelling the regions. Defaults to the layer's name field or
+        the row position.
+    projection : pyproj.CRS, str or cartopy.crs.CRS, optional
+        Native projection of the grid.
+    cache : bool, default True
+
+    Returns
+    -------
+    index : numpy.ndarray of int32
+        Position of the region in ``labels`` for each grid point, ``-1``
+        outside all regions.
+    labels : numpy.ndarray of object
+        Region labels.
+
+    Examples
+    --------
+    >>> index, labels = grid_region_index(ds.XLONG[0], ds.XLAT[0], projection=wrf_lcc)
+    >>> ds.T2.groupby(xr.DataArray(index, dims=("south_north", "west_east"))).mean()
+    """
+    from .overlay import _prepare_regions
+
+    def build():
+        regions, _ = _prepare_regions(layer, region_column)
+        labels = [value.item() if isinstance(value, np.generic) else value for value in regions["region"]]
+        geometries = np.asarray(regions.geometry.values)
+        return _rasterise(geometries, range(len(geometries)), lon, lat, projection), labels
+
+    if not cache or not isinstance(layer, str):
+        index, labels = build()
+    else:
+        name = get_layer_spec(layer).name
+        key = _grid_key(lon, lat, projection, "index", name, region_column, _layer_fingerprint(name))
+        index, labels = _cached(key, build)
+    return index, np.asarray(labels, dtype=object)
+
+
+_LON_NAMES = ("lon", "longitude", "XLONG", "xlong", "nav_lon")
+_LAT_NAMES = ("lat", "latitude", "XLAT", "xlat", "nav_lat")
+
+
+def _coordinate_name(ds, given, candidates) -> str:
+    if given is not None:
+        return given
+    for name in candidates:
+        if name in ds.coords or name in getattr(ds, "data_vars", {}):
+            return name
+    raise ValueError(f"No coordinate named any of {candidates}; pass the name explicitly")
+
+
+def _span(values: np.ndarray, lo: float, hi: float):
+    """Slice or index array of ``values`` within ``[lo, hi]``, or None if empty."""
+    inside = np.flatnonzero((values >= lo) & (values <= hi))
+    if not len(inside):
+        return None
+    if inside[-1] - inside[0] + 1 == len(inside):
+        return slice(int(inside[0]), int(inside[-1]) + 1)
+    return inside
+
+
+def clip_dataset(ds, region, lon=None, lat=None, source: str = "auto", projection=None, drop: bool = True):
+    """
+    Clip an xarray Dataset or DataArray to a region, lazily.
+
+    For 1-D coordinates the data are first cropped to the region's bounding
+    box (padded by one grid cell) with positional indexing, which works for
+    0-360 longitudes and descending latitudes alike, and only then masked
+    with the cached :func:`grid_mask` of the cropped grid. With dask-backed
+    data nothing is computed: the crop selects only the chunks overlapping
+    the box and the mask is applied with :meth:`xarray.Dataset.where`, so
+    memory and I/O scale with the region rather than the domain. 2-D
+    (curvilinear) coordinates are masked on the full grid, then cropped to
+    the rows and columns containing the region.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset or xarray.DataArray
+    region : str, int or shapely geometry
+        See :func:`get_region_geometry`.
+    lon, lat : str, optional
+        Names of the longitude and latitude coordinates. By default the
+        first of ``lon``, ``longitude``, ``XLONG``, ... present.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+    projection : pyproj.CRS, str or cartopy.crs.CRS, optional
+        Native projection of a curvilinear grid, see :func:`grid_mask`.
+    drop : bool, default True
+        Crop to the region's extent. With ``False`` only the mask is applied
+        and the grid keeps its shape.
+
+    Returns
+    -------
+    xarray.Dataset or xarray.DataArray
+        ``ds`` with points outside the region set to NaN.
+
+    Examples
+    --------
+    >>> ds = xr.open_mfdataset("era5_t2m_*.nc", chunks={"time": 120})
+    >>> sichuan = clip_dataset(ds, "Sichuan")
+    >>> basin = clip_dataset(ds.t2m, "Yangtze", source="basins").mean(("latitude", "longitude"))
+    """
+    import xarray as xr
+
+    from .regions import get_region_geometry
+
+    lon = _coordinate_name(ds, lon, _LON_NAMES)
+    lat = _coordinate_name(ds, lat, _LAT_NAMES)
+    geometry = get_region_geometry(region, source=source)
+
+    if ds[lon].ndim == 2:
+        mask = grid_mask(ds[lon].values, ds[lat].values, region, projection=projection, source=source)
+        dims = ds[lon].dims
+        if drop:
+            rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+            if not len(rows):
+                raise ValueError(f"Region {region!r} does not overlap the grid")
+            window = {dims[0]: slice(int(rows[0]), int(rows[-1]) + 1), dims[1]: slice(int(cols[0]), int(cols[-1]) + 1)}
+            ds = ds.isel(window)
+            mask = mask[window[dims[0]], window[dims[1]]]
+        return ds.where(xr.DataArray(mask, dims=dims))
+
+    # Longitudes in [-180, 180), whatever the convention of the data.
+    lon_values = (np.asarray(ds[lon].values, dtype=np.float64) + 180.0) % 360.0 - 180.0
+    lat_values = np.asarray(ds[lat].values, dtype=np.float64)
+    if drop:
+        minx, miny, maxx, maxy = geometry.bounds
+        pad_x = np.abs(np.diff(lon_values)).min() if len(lon_values) > 1 else 0.0
+        pad_y = np.abs(np.diff(lat_values)).min() if len(lat_values) > 1 else 0.0
+        lon_index = _span(lon_values, minx - pad_x, maxx + pad_x)
+        lat_index = _span(lat_values, miny - pad_y, maxy + pad_y)
+        if lon_index is None or lat_index is None:
+            raise ValueError(f"Region {region!r} does not overlap the grid")
+        ds = ds.isel({lon: lon_index, lat: lat_index})
+        lon_values, lat_values = lon_values[lon_index], lat_values[lat_index]
+    mask = grid_mask(lon_values, lat_values, region, source=source)
+    return ds.where(xr.DataArray(mask, dims=(ds[lat].dims[0], ds[lon].dims[0])))
@@ -0,0 +1,190 @@
+"""
+Administrative hierarchy
+"""
+from functools import lru_cache
+
+import pandas as pd
+from pandas import DataFrame
+
+from .attribute_index import normalize_name
+from .derived import register_derived_product, load_derived_product
+from .layers import CHINA_ALBERS, get_layer, _as_lonlat
+
+__all__ = [
+    "get_administrative_hierarchy",
+    "get_basin_province_overlap",
+    "lookup_province",
+]
+
+
+@register_derived_product(
+    "administrative_hierarchy",
+    "administrative_hierarchy.csv",
+    sources=("administration_1st", "administration_2nd", "provinces_polygon"),
+)
+def _build_administrative_hierarchy() -> DataFrame:
+    import geopandas as gpd
+
+    provinces = _as_lonlat(get_layer("provinces_polygon"))
+    provinces = provinces[provinces["NAME"].notna()][["NAME", "ADCODE99", "geometry"]]
+    provinces = provinces.rename(columns={"NAME": "province", "ADCODE99": "province_code"})
+
+    centres = []
+    for level, layer in ((1, "administration_1st"), (2, "administration_2nd")):
+        gdf = _as_lonlat(get_layer(layer))[["NAME", "PINYIN", "ADCODE99", "geometry"]]
+        gdf.insert(0, "level", level)
+        centres.append(gdf)
+    centres = gpd.GeoDataFrame(pd.concat(centres, ignore_index=True), crs=4326)
+    centres = centres.rename(columns={"NAME": "name", "PINYIN": "pinyin", "ADCODE99": "code"})
+
+    joined = gpd.sjoin(centres, provinces, how="left", predicate="within")
+    joined = joined[~joined.index.duplicated()]
+    # Coastal and island centres can fall just outside the 1:4M polygons.
+    missing = joined["province"].isna()
+    if missing.any():
+        nearest = gpd.sjoin_nearest(
+            centres[missing].to_crs(CHINA_ALBERS), provinces.to_crs(CHINA_ALBERS), how="left"
+        )
+        nearest = nearest[~nearest.index.duplicated()]
+        joined.loc[missing, ["province", "province_code"]] = nearest[["province", "province_code"]]
+
+    table = DataFrame(joined.drop(columns=["geometry", "index_right"]))
+    table["province_code"] = table["province_code"].astype("int64")
+    return table.reset_index(drop=True)
+
+
+@register_derived_product(
+    "basin_province_overlap",
+    "basin_province_overlap.csv",
+    sources=("tp_basins", "provinces_polygon"),
+)
+def _build_basin_province_overlap() -> DataFrame:
+    import geopandas as gpd
+
+    basins = _as_lonlat(get_layer("tp_basins"))[["BasinName", "geometry"]].to_crs(CHINA_ALBERS)
+    basins = basins.dissolve(by="BasinName", as_index=False)
+    provinces = _as_lonlat(get_layer("provinces_polygon"))
+    provinces = provinces[provinces["NAME"].notna()][["NAME", "ADCODE99", "geometry"]]
+    provinces = provinces.to_crs(CHINA_ALBERS).dissolve(by=["NAME", "ADCODE99"], as_index=False)
+
+    basins["basin_area"] = basins.area
+    provinces["province_area"] = provinces.area
+    overlap = gpd.overlay(basins, provinces, how="intersection", keep_geom_type=True)
+    overlap["area_km2"] = overlap.area / 1e6
+    overlap = overlap[overlap["area_km2"] > 0]
+
+    table = DataFrame({
+        "basin": overlap["BasinName"],
+        "province": overlap["NAME"],
+        "province_code": overlap["ADCODE99"].astype("int64"),
+        "area_km2": overlap["area_km2"],
+        "basin_fraction": overlap.area / overlap["basin_area"],
+        "province_fraction": overlap.area / overlap["province_area"],
+    })
+    return table.sort_values(["basin", "area_km2"], ascending=[True, False]).reset_index(drop=True)
+
+
+def get_administrative_hierarchy() -> DataFrame:
+    """
+    Get the precomputed table linking administrative centres to their province.
+
+    The table is computed at build time by joining the centres of
+    :func:`get_zh_CN_1st_administration` and :func:`get_zh_CN_2nd_administration`
+    with the polygons of ``get_zh_CN_provinces(type="polygon")`` and shipped
+    with the package, so no geometry work is done at runtime. It is rebuilt
+    automatically (once, into the cache directory) if the bundled data changes.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per centre with columns ``level`` (1 or 2), ``name``,
+        ``pinyin``, ``code`` (``ADCODE99``), ``province`` and ``province_code``.
+
+    Examples
+    --------
+    >>> hierarchy = get_administrative_hierarchy()
+    >>> hierarchy.groupby("province").size()
+    """
+    return load_derived_product("administrative_hierarchy").copy()
+
+
+def get_basin_province_overlap() -> DataFrame:
+    """
+    Get the precomputed overlap between Tibetan Plateau basins and provinces.
+
+    Overlap areas are measured in an Albers equal-area projection at build
+    time and shipped with the package.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per intersecting ``(basin, province)`` pair with columns
+        ``basin``, ``province``, ``province_code``, ``area_km2``,
+        ``basin_fraction`` (share of the basin inside the province) and
+        ``province_fraction`` (share of the province inside the basin).
+
+    Examples
+    --------
+    >>> overlap = get_basin_province_overlap()
+    >>> overlap[overlap.basin == "Yangtze"]
+    """
+    return load_derived_product("basin_province_overlap").copy()
+
+
+@lru_cache(maxsize=1)
+def _province_lookup() -> dict:
+    table = load_derived_product("administrative_hierarchy")
+    lookup = {}
+    # Prefecture-level rows first so provincial capitals (level 1) win on clashes.
+    for row in table.sort_values("level", ascending=False).itertuples(index=False):
+        value = (row.province, int(row.province_code))
+        lookup[int(row.code)] = value
+        for name in (row.name, row.pinyin):
+            key = normalize_name(name)
+            if key:
+                lookup[key] = value
+    return lookup
+
+
+def lookup_province(centres, return_code: bool = False):
+    """
+    Look up the province of administrative centres by name or code.
+
+    Parameters
+    ----------
+    centres : str, int or list
+        Centre names (Chinese or pinyin, e.g. ``"绵阳"``/``"Mianyang"``) or
+        ``ADCODE99`` codes. A list returns a list.
+    return_code : bool, default False
+        Return the province code (``ADCODE99``) instead of its name.
+
+    Returns
+    -------
+    str, int or list
+        Province name(s) or code(s).
+
+    Raises
+    ------
+    KeyError
+        If a centre is unknown.
+
+    Examples
+    --------
+    >>> lookup_province("Mianyang")
+    '四川省'
+    >>> lookup_province([510701, "拉萨"], return_code=True)
+    [510000, 540000]
+    """
+    lookup = _province_lookup()
+
+    def one(centre):
+        key = int(centre) if isinstance(centre, int) or str(centre).isdigit() else normalize_name(centre)
+        try:
+            province, code = lookup[key]
+        except KeyError:
+            raise KeyError(f"Unknown administrative centre {centre!r}") from None
+        return code if return_code else province
+
+    if isinstance(centres, (str, int)):
+        return one(centres)
+    return [one(centre) for centre in centres]
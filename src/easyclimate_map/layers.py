@@ -0,0 +1,258 @@
+"""
+Bundled layer catalogue
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from geopandas import GeoDataFrame
+from .tool import read_shapefile_from_archive
+
+__all__ = [
+    "LayerSpec",
+    "list_layers",
+    "get_layer_spec",
+    "get_layer",
+]
+
+script_path = Path(__file__).resolve()
+script_folder_path = script_path.parent
+shpdata_path = script_folder_path / "shpdata"
+
+
+@dataclass(frozen=True)
+class LayerSpec:
+    """
+    Description of a layer bundled with ``easyclimate-map`` or registered
+    with :func:`register_dataset`.
+
+    Attributes
+    ----------
+    name : str
+        Catalogue name of the layer, e.g. ``"river3_line"``.
+    path : pathlib.Path
+        Path to the 7z/zip archive or ``.shp`` file holding the shapefile.
+    encoding : str or None
+        Attribute encoding of the shapefile.
+    geometry : {"line", "polygon", "point"}
+        Geometry family of the features.
+    name_fields : tuple of str
+        Attribute columns holding feature names, indexed for ``names=``
+        selection (see :func:`get_attribute_index`).
+    code_fields : tuple of str
+        Attribute columns holding administrative codes, indexed for
+        ``codes=`` selection.
+    member : str or None
+        Shapefile inside the archive, see :func:`read_shapefile_from_archive`.
+    """
+    name: str
+    path: Path
+    encoding: Optional[str]
+    geometry: str
+    name_fields: tuple = ()
+    code_fields: tuple = ()
+    member: Optional[str] = None
+
+
+# Albers equal-area conic for China, used wherever areas or lengths are measured.
+CHINA_ALBERS = "+proj=aea +lat_0=0 +lon_0=105 +lat_1=25 +lat_2=47 +datum=WGS84 +units=m +no_defs"
+
+_ZH_CN = shpdata_path / "zh_CN"
+
+BUNDLED_LAYERS = {
+    spec.name: spec
+    for spec in [
+        LayerSpec("nation_line", _ZH_CN / "nation" / "bou1_4l.7z", "gb2312", "line"),
+        LayerSpec("nation_polygon", _ZH_CN / "nation" / "bou1_4p.7z", "gb2312", "polygon"),
+        LayerSpec("provinces_line", _ZH_CN / "provinces" / "bou2_4l.7z", "gb2312", "line"),
+        LayerSpec(
+            "provinces_polygon", _ZH_CN / "provinces" / "bou2_4p.7z", "gb2312", "polygon",
+            name_fields=("NAME",), code_fields=("ADCODE99", "ADCODE93"),
+        ),
+        LayerSpec("river1_line", _ZH_CN / "river1" / "hyd1_4l.7z", "gb2312", "line", name_fields=("NAME",)),
+        LayerSpec("river1_polygon", _ZH_CN / "river1" / "hyd1_4p.7z", "gb2312", "polygon", name_fields=("NAME",)),
+        LayerSpec("river3_line", _ZH_CN / "river3" / "hyd2_4l.7z", "gb2312", "line", name_fields=("NAME",)),
+        LayerSpec("river3_polygon", _ZH_CN / "river3" / "hyd2_4p.7z", "gb2312", "polygon", name_fields=("NAME",)),
+        LayerSpec(
+            "administration_1st", _ZH_CN / "administration_1st" / "res1_4m.7z", "gb2312", "point",
+            name_fields=("NAME", "PINYIN"), code_fields=("ADCODE99", "ADCODE93"),
+        ),
+        LayerSpec(
+            "administration_2nd", _ZH_CN / "administration_2nd" / "res2_4m.7z", "gb2312", "point",
+            name_fields=("NAME", "PINYIN"), code_fields=("ADCODE99", "ADCODE93"),
+        ),
+        LayerSpec(
+            "tp_basins", shpdata_path / "tibetan_plateau" / "TP_basins.7z", None, "polygon",
+            name_fields=("BasinName",),
+        ),
+    ]
+}
+
+# Short names follow the default ``type="line"`` of the getters.
+LAYER_ALIASES = {
+    "nation": "nation_line",
+    "provinces": "provinces_line",
+    "river1": "river1_line",
+    "river3": "river3_line",
+}
+
+# Layers added at runtime with register_dataset(), keyed by name.
+USER_LAYERS = {}
+
+
+def list_layers() -> list:
+    """
+    List the names of all bundled layers.
+
+    Returns
+    -------
+    list of str
+        Catalogue names accepted by :func:`get_layer`.
+    """
+    return list(BUNDLED_LAYERS)
+
+
+def get_layer_spec(name: str) -> LayerSpec:
+    """
+    Look up the :class:`LayerSpec` of a bundled or registered layer.
+
+    Parameters
+    ----------
+    name : str
+        Catalogue name (see :func:`list_layers`) or one of the short aliases
+        ``"nation"``, ``"provinces"``, ``"river1"``, ``"river3"`` which resolve
+        to the line layers, matching the getter defaults, or the name of a
+        layer added with :func:`register_dataset`.
+
+    Returns
+    -------
+    LayerSpec
+
+    Raises
+    ------
+    KeyError
+        If no layer of that name is bundled or registered.
+    """
+    key = LAYER_ALIASES.get(name, name)
+    try:
+        return BUNDLED_LAYERS[key]
+    except KeyError:
+        pass
+    try:
+        return USER_LAYERS[key]
+    except KeyError:
+        raise KeyError(
+            f"Unknown layer {name!r}; available layers are {list_layers()}"
+        ) from None
+
+
+def get_layer(name: str, names=None, codes=None, compact=False, grid_size=None, **kwargs) -> GeoDataFrame:
+    """
+    Read a bundled layer by its catalogue name.
+
+    Parameters
+    ----------
+    name : str
+        Catalogue name or alias, see :func:`get_layer_spec`.
+    names : str or list of str, optional
+        Only read the features with these names, see :meth:`AttributeIndex.lookup`.
+    codes : int, str or list, optional
+        Only read the features with these administrative codes.
+    compact : bool or "float32", default False
+        Opt-in compact in-memory representation: ``True`` uses categorical
+        and Arrow string dtypes, the narrowest integer dtypes and drops empty
+        columns (see :func:`compact_geodataframe`); ``"float32"``
+        additionally stores the coordinates as ``float32`` and returns a
+        :class:`CompactLayer`. See :func:`memory_report`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid (e.g. ``1e-6`` degrees),
+        see :func:`snap_to_grid`. The whole layer is snapped once and cached
+        in the cache directory, so later overlays and exports run on the
+        cleaner geometries at no extra cost.
+    **kwargs : dict, optional
+        Additional keyword arguments passed to :func:`read_shapefile_from_archive`,
+        e.g. ``columns``. ``bbox=(minx, miny, maxx, maxy)`` selects features
+        whose bounds intersect it using the layer's persisted spatial index
+        (see :func:`get_spatial_index`); the index then holds feature ids.
+        ``fids=`` may be combined with ``names``, ``codes`` and ``bbox``,
+        which then select among those feature ids.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame or CompactLayer
+        The same data as returned by the corresponding ``get_*`` function.
+
+    Examples
+    --------
+    >>> river3 = get_layer("river3_polygon")
+    >>> nation = get_layer("nation", bbox=(100, 20, 110, 30))
+    >>> sichuan = get_layer("provinces_polygon", names="Sichuan")
+    """
+    spec = get_layer_spec(name)
+    if spec.encoding is not None:
+        kwargs.setdefault("encoding", spec.encoding)
+    bbox = kwargs.pop("bbox", None)
+    fids = kwargs.pop("fids", None)
+    if fids is not None:
+        fids = np.asarray(fids, dtype=np.int64)
+    if fids is None and names is None and codes is None and bbox is None:
+        gdf = read_shapefile_from_archive(spec.path, member=spec.member, **kwargs)
+    else:
+        if names is not None or codes is not None:
+            from .attribute_index import get_attribute_index
+            selected = get_attribute_index(spec.name).lookup(names=names, codes=codes)
+            fids = selected if fids is None else np.intersect1d(fids, selected)
+        if bbox is not None:
+            # The packed index answers bbox queries without scanning the file.
+            from .spatial_index import get_spatial_index
+            in_bbox = get_spatial_index(spec.name).query_bbox(bbox)
+            fids = in_bbox if fids is None else np.intersect1d(fids, in_bbox)
+        gdf = read_shapefile_from_archive(spec.path, member=spec.member, fids=fids, **kwargs)
+        gdf.index = fids
+
+    if grid_size is not None:
+        from .precision import _snap_layer
+        gdf = _snap_layer(gdf, spec.name, grid_size, fids, kwargs)
+    if compact == "float32":
+        from .compact import CompactLayer
+        return CompactLayer(gdf)
+    if compact:
+        from .compact import compact_geodataframe
+        return compact_geodataframe(gdf)
+    return gdf
+
+
+def _layer_fingerprint(name: str) -> str:
+    """
+    Content hash of a layer's file and its catalogue entry.
+
+    Caches derived from a layer are keyed on it, so they are rebuilt when the
+    file changes or a dataset is re-registered under the same name.
+    """
+    import hashlib
+    import json
+    from .cache import file_fingerprint
+
+    spec = get_layer_spec(name)
+    key = json.dumps([
+        file_fingerprint(spec.path), spec.member, spec.encoding, spec.geometry,
+        list(spec.name_fields), list(spec.code_fields),
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _as_lonlat(gdf: GeoDataFrame) -> GeoDataFrame:
+    """Return ``gdf`` in EPSG:4326, assuming lon/lat when no CRS is recorded."""
+    if gdf.crs is None:
+        return gdf.set_crs(4326)
+    if gdf.crs.to_epsg() != 4326:
+        return gdf.to_crs(4326)
+    return gdf
+
+
+def _resolve_layer(layer) -> GeoDataFrame:
+    """Accept either a catalogue name or a GeoDataFrame and return lon/lat data."""
+    if isinstance(layer, str):
+        layer = get_layer(layer)
+    return _as_lonlat(layer)
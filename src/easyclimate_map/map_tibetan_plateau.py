@@ -3,17 +3,19 @@ Tibetan Plateau (Qinghai-Xizang Plateau)
 """
 from pathlib import Path
 from geopandas import GeoDataFrame
-from .tool import read_shapefile_from_7z
+from .layers import get_layer
+from .derived_layers import get_derived_layer
 from rich import print
 
 __all__ = [
     "get_Tibetan_Plateau_basins",
+    "get_Tibetan_Plateau_boundary",
 ]
 
 script_path = Path(__file__).resolve()
 script_folder_path = script_path.parent
 
-def get_Tibetan_Plateau_basins() -> GeoDataFrame:
+def get_Tibetan_Plateau_basins(names=None, compact=False, grid_size=None) -> GeoDataFrame:
     """
     Get Tibetan Plateau basins data in polygon format.
     
@@ -22,6 +24,16 @@ def get_Tibetan_Plateau_basins() -> GeoDataFrame:
         - Zhang, G. (2019). Dataset of river basins map over the TP（2016）. National Tibetan Plateau / Third Pole Environment Data Center. https://doi.org/10.11888/BaseGeography.tpe.249465.file. https://cstr.cn/18406.11.BaseGeography.tpe.249465.file.
         - Zhang, G.Q., Yao, T.D., Xie, H.J., Kang, S.C., &Lei, Y.B. (2013). Increased mass over the Tibetan Plateau: From lakes or glaciers? Geophysical Research Letters, 40(10), 2125-2130. https://doi.org/10.1002/grl.50462
 
+    Parameters
+    ----------
+    names : str or list of str, optional
+        Only return the basins with these ``BasinName`` values, e.g.
+        ``["Yangtze", "Yellow"]`` (case-insensitive).
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
+
     Returns
     -------
     geopandas.GeoDataFrame
@@ -39,5 +51,31 @@ def get_Tibetan_Plateau_basins() -> GeoDataFrame:
         "https://doi.org/10.11888/BaseGeography.tpe.249465.file"
     )
 
-    path = script_folder_path / "shpdata"/ "tibetan_plateau" / "TP_basins.7z"
-    return read_shapefile_from_7z(path)
+    return get_layer("tp_basins", names=names, compact=compact, grid_size=grid_size)
+
+
+def get_Tibetan_Plateau_boundary(type="line") -> GeoDataFrame:
+    """
+    Get the outer boundary of the Tibetan Plateau.
+
+    This is ``extract_outer_boundary(get_Tibetan_Plateau_basins())``,
+    precomputed at build time and shipped with the package, so no union of
+    the basins is computed at runtime.
+
+    Parameters
+    ----------
+    type : {"line", "polygon"}, default "line"
+        ``"line"`` returns the exterior boundary; ``"polygon"`` returns the
+        dissolved plateau polygon.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A single feature in EPSG:4326.
+
+    See Also
+    --------
+    :func:`extract_outer_boundary`, :func:`get_derived_layer`
+    """
+    return get_derived_layer("tibetan_plateau_outline", type=type)
+
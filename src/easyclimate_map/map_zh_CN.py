@@ -6,7 +6,8 @@ import geopandas as gpd
 from typing import Literal
 from pathlib import Path
 from geopandas import GeoDataFrame
-from .tool import read_shapefile_from_7z
+from .layers import get_layer
+from .derived_layers import get_derived_layer
 
 __all__ = [
     "get_zh_CN_nation",
@@ -14,7 +15,9 @@ __all__ = [
     "get_zh_CN_river1",
     "get_zh_CN_river3",
     "get_zh_CN_1st_administration",
-    "get_zh_CN_2nd_administration"
+    "get_zh_CN_2nd_administration",
+    "get_zh_CN_nation_outline",
+    "get_zh_CN_province_outlines",
 ]
 
 script_path = Path(__file__).resolve()
@@ -22,6 +25,8 @@ script_folder_path = script_path.parent
 
 def get_zh_CN_nation(
     type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
 ) -> GeoDataFrame:
     """
     Get China national boundary data in either line or polygon format.
@@ -35,6 +40,10 @@ def get_zh_CN_nation(
         Geometry type to return:
         - "line": Boundary lines (coastlines and land borders)
         - "polygon": Polygonal representation of China's territory
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
     
     Returns
     -------
@@ -53,18 +62,17 @@ def get_zh_CN_nation(
 
         ./dynamic_docs/zh_CN/plot_zh_CN_nation.py
     """
-    if type == "line":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "nation" / "bou1_4l.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    elif type == "polygon":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "nation" / "bou1_4p.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    else:
+    if type not in ("line", "polygon"):
         raise ValueError("type must be either 'line' or 'polygon'")
+    return get_layer(f"nation_{type}", compact=compact, grid_size=grid_size)
     
 
 def get_zh_CN_provinces(
     type: Literal["line", "polygon"] = "line",
+    names=None,
+    codes=None,
+    compact=False,
+    grid_size=None,
 ) -> GeoDataFrame:
     """
     Get China provincial-level administrative boundary data.
@@ -81,6 +89,17 @@ def get_zh_CN_provinces(
         Geometry type to return:
         - "line": Provincial boundary lines
         - "polygon": Polygonal representation of provincial territories
+    names : str or list of str, optional
+        Only return the provinces with these names. Chinese names with or
+        without suffix (``"四川省"``, ``"四川"``) and pinyin (``"Sichuan"``)
+        are accepted. Requires ``type="polygon"``.
+    codes : int, str or list, optional
+        Only return the provinces with these administrative codes
+        (``ADCODE99``/``ADCODE93``, e.g. ``510000``). Requires ``type="polygon"``.
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
     
     Returns
     -------
@@ -99,18 +118,17 @@ def get_zh_CN_provinces(
 
         ./dynamic_docs/zh_CN/plot_zh_CN_provinces.py
     """
-    if type == "line":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "provinces" / "bou2_4l.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    elif type == "polygon":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "provinces" / "bou2_4p.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    else:
+    if type not in ("line", "polygon"):
         raise ValueError("type must be either 'line' or 'polygon'")
+    if type == "line" and (names is not None or codes is not None):
+        raise ValueError("names and codes selection requires type='polygon'")
+    return get_layer(f"provinces_{type}", names=names, codes=codes, compact=compact, grid_size=grid_size)
     
 
 def get_zh_CN_river1(
     type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
 ) -> GeoDataFrame:
     """
     Get major river systems in China (Level 1 rivers).
@@ -126,6 +144,10 @@ def get_zh_CN_river1(
         Geometry type to return:
         - "line": River centerlines and watercourse boundaries
         - "polygon": Water body areas (lakes, reservoirs, wide rivers)
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
     
     Returns
     -------
@@ -138,18 +160,15 @@ def get_zh_CN_river1(
 
         ./dynamic_docs/zh_CN/plot_zh_CN_river1.py
     """
-    if type == "line":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "river1" / "hyd1_4l.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    elif type == "polygon":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "river1" / "hyd1_4p.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    else:
+    if type not in ("line", "polygon"):
         raise ValueError("type must be either 'line' or 'polygon'")
+    return get_layer(f"river1_{type}", compact=compact, grid_size=grid_size)
     
 
 def get_zh_CN_river3(
     type: Literal["line", "polygon"] = "line",
+    compact=False,
+    grid_size=None,
 ) -> GeoDataFrame:
     """
     Get tertiary river systems in China (Level 3 rivers).
@@ -165,6 +184,10 @@ def get_zh_CN_river3(
         Geometry type to return:
         - "line": Stream centerlines and minor watercourses
         - "polygon": Small water body areas
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
     
     Returns
     -------
@@ -182,17 +205,12 @@ def get_zh_CN_river3(
 
         ./dynamic_docs/zh_CN/plot_zh_CN_river3.py
     """
-    if type == "line":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "river3" / "hyd2_4l.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    elif type == "polygon":
-        path = script_folder_path / "shpdata"/ "zh_CN" / "river3" / "hyd2_4p.7z"
-        return read_shapefile_from_7z(path, encoding="gb2312")
-    else:
+    if type not in ("line", "polygon"):
         raise ValueError("type must be either 'line' or 'polygon'")
+    return get_layer(f"river3_{type}", compact=compact, grid_size=grid_size)
     
 
-def get_zh_CN_1st_administration() -> GeoDataFrame:
+def get_zh_CN_1st_administration(names=None, codes=None, compact=False, grid_size=None) -> GeoDataFrame:
     """
     Get first-level administrative center locations in China.
     
@@ -202,6 +220,19 @@ def get_zh_CN_1st_administration() -> GeoDataFrame:
     - Municipal government seats
     - Autonomous region capitals
     
+    Parameters
+    ----------
+    names : str or list of str, optional
+        Only return the centres with these Chinese (``"成都"``) or pinyin
+        (``"Chengdu"``) names.
+    codes : int, str or list, optional
+        Only return the centres with these administrative codes
+        (``ADCODE99``/``ADCODE93``, e.g. ``510101``).
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
+    
     Returns
     -------
     geopandas.GeoDataFrame
@@ -213,11 +244,10 @@ def get_zh_CN_1st_administration() -> GeoDataFrame:
     - Typically includes 34 administrative centers (31 provincial-level + 3 special)
     - Coordinates represent government seat locations
     """
-    path = script_folder_path / "shpdata"/ "zh_CN" / "administration_1st" / "res1_4m.7z"
-    return read_shapefile_from_7z(path, encoding="gb2312")
+    return get_layer("administration_1st", names=names, codes=codes, compact=compact, grid_size=grid_size)
 
 
-def get_zh_CN_2nd_administration() -> GeoDataFrame:
+def get_zh_CN_2nd_administration(names=None, codes=None, compact=False, grid_size=None) -> GeoDataFrame:
     """
     Get second-level administrative center locations in China.
     
@@ -227,6 +257,19 @@ def get_zh_CN_2nd_administration() -> GeoDataFrame:
     - Autonomous prefecture capitals
     - League administrative centers
     
+    Parameters
+    ----------
+    names : str or list of str, optional
+        Only return the centres with these Chinese (``"绵阳"``) or pinyin
+        (``"Mianyang"``) names.
+    codes : int, str or list, optional
+        Only return the centres with these administrative codes
+        (``ADCODE99``/``ADCODE93``, e.g. ``510701``).
+    compact : bool or "float32", default False
+        Compact in-memory representation, see :func:`get_layer`.
+    grid_size : float, optional
+        Snap coordinates to this precision grid, see :func:`get_layer`.
+    
     Returns
     -------
     geopandas.GeoDataFrame
@@ -238,5 +281,57 @@ def get_zh_CN_2nd_administration() -> GeoDataFrame:
     - Covers approximately 333 prefecture-level divisions in China
     - Includes both urban and rural administrative centers
     """
-    path = script_folder_path / "shpdata"/ "zh_CN" / "administration_2nd" / "res2_4m.7z"
-    return read_shapefile_from_7z(path, encoding="gb2312")
\ No newline at end of file
+    return get_layer("administration_2nd", names=names, codes=codes, compact=compact, grid_size=grid_size)
+
+
+def get_zh_CN_nation_outline(type: Literal["line", "polygon"] = "polygon") -> GeoDataFrame:
+    """
+    Get the dissolved outline of China.
+
+    The polygons of ``get_zh_CN_nation(type="polygon")`` merged into a single
+    feature, precomputed at build time and shipped with the package.
+
+    Parameters
+    ----------
+    type : {"line", "polygon"}, default "polygon"
+        ``"polygon"`` returns the dissolved multipolygon; ``"line"`` returns
+        its exterior rings.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A single feature in EPSG:4326.
+
+    See Also
+    --------
+    :func:`get_derived_layer`
+    """
+    return get_derived_layer("nation_outline", type=type)
+
+
+def get_zh_CN_province_outlines(type: Literal["line", "polygon"] = "polygon") -> GeoDataFrame:
+    """
+    Get one dissolved outline per provincial-level division.
+
+    ``get_zh_CN_provinces(type="polygon")`` stores islands as separate
+    features; here all parts of a province are merged into one feature,
+    precomputed at build time and shipped with the package.
+
+    Parameters
+    ----------
+    type : {"line", "polygon"}, default "polygon"
+        ``"polygon"`` returns the dissolved polygons; ``"line"`` returns
+        their exterior rings.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        One feature per province, with columns ``NAME`` and ``ADCODE99``,
+        in EPSG:4326.
+
+    See Also
+    --------
+    :func:`get_derived_layer`
+    """
+    return get_derived_layer("province_outlines", type=type)
+
@@ -0,0 +1,262 @@
+"""
+Memoization of geometry operations
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from .cache import get_cache_dir
+from .version import __version__
+
+__all__ = [
+    "enable_memoization",
+    "disable_memoization",
+    "clear_memoization",
+    "memoization_info",
+    "gdf_fingerprint",
+]
+
+logger = logging.getLogger("easyclimate_map")
+
+MEMOIZE_ENV = "EASYCLIMATE_MAP_MEMOIZE"
+
+_settings = {
+    "enabled": os.environ.get(MEMOIZE_ENV, "").lower() in ("1", "true", "yes"),
+    "memory_bytes": 256 * 2**20,
+    "disk": True,
+    "disk_bytes": 2 * 2**30,
+}
+_memory = OrderedDict()  # key -> (value, nbytes)
+_memory_size = 0
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def gdf_fingerprint(gdf, *params) -> str:
+    """
+    Return a content hash of a GeoDataFrame and call parameters.
+
+    The hash covers the geometries (as WKB), the CRS, the index and attribute
+    values, so equal content gives equal keys regardless of object identity.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+    *params
+        Extra values to mix in, e.g. function arguments. Their ``repr`` is
+        hashed.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    geometry = gdf.geometry.name
+    wkb = shapely.to_wkb(np.asarray(gdf.geometry.values), byte_order=1)
+    digest.update(np.fromiter((len(w) if w is not None else -1 for w in wkb), dtype=np.int64).tobytes())
+    digest.update(b"".join(w for w in wkb if w is not None))
+    digest.update((gdf.crs.to_wkt() if gdf.crs is not None else "").encode())
+    attributes = gdf.drop(columns=geometry)
+    digest.update(repr(list(attributes.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(attributes, index=True).to_numpy().tobytes())
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def enable_memoization(memory_bytes: int = 256 * 2**20, disk: bool = True, disk_bytes: int = 2 * 2**30):
+    """
+    Memoize the geometry functions of :mod:`easyclimate_map.tool`.
+
+    Results of :func:`extract_outer_boundary` and
+    :func:`transfer_boundary_to_polygon` are then keyed by
+    :func:`gdf_fingerprint` of the input and its parameters, and kept in an
+    in-memory LRU tier and, optionally, an on-disk tier in the cache
+    directory (see :func:`get_cache_dir`). Both tiers evict least recently
+    used entries beyond their size limits. Memoization can also be enabled
+    by setting the environment variable ``EASYCLIMATE_MAP_MEMOIZE=1``.
+
+    Parameters
+    ----------
+    memory_bytes : int, default 256 MiB
+        Size limit of the in-memory tier.
+    disk : bool, default True
+        Also persist results on disk, shared between processes.
+    disk_bytes : int, default 2 GiB
+        Size limit of the on-disk tier.
+
+    Examples
+    --------
+    >>> enable_memoization()
+    >>> basins = get_Tibetan_Plateau_basins()
+    >>> extract_outer_boundary(basins)  # computed
+    >>> extract_outer_boundary(basins)  # returned from memory
+    """
+    _settings.update(enabled=True, memory_bytes=int(memory_bytes), disk=bool(disk), disk_bytes=int(disk_bytes))
+    with _lock:
+        _evict_memory()
+
+
+def disable_memoization():
+    """Stop memoizing; cached results are kept until :func:`clear_memoization`."""
+    _settings["enabled"] = False
+
+
+def clear_memoization(disk: bool = False):
+    """
+    Drop memoized results.
+
+    Parameters
+    ----------
+    disk : bool, default False
+        Also delete the on-disk tier.
+    """
+    global _memory_size
+    with _lock:
+        _memory.clear()
+        _memory_size = 0
+    if disk:
+        for path in _disk_dir().glob("*.pkl"):
+            path.unlink(missing_ok=True)
+
+
+def memoization_info() -> dict:
+    """
+    Return memoization settings, tier sizes and hit/miss counts.
+
+    Returns
+    -------
+    dict
+    """
+    files = list(_disk_dir().glob("*.pkl")) if _settings["disk"] else []
+    return {
+        **_settings,
+        **_stats,
+        "memory_entries": len(_memory),
+        "memory_used": _memory_size,
+        "disk_entries": len(files),
+        "disk_used": sum(f.stat().st_size for f in files),
+    }
+
+
+def _disk_dir():
+    path = get_cache_dir() / "memo"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _nbytes(value) -> int:
+    try:
+        return int(value.memory_usage(deep=True).sum()) + int(
+            shapely.get_num_coordinates(np.asarray(value.geometry.values)).sum() * 16
+        )
+    except AttributeError:
+        return len(pickle.dumps(value))
+
+
+def _evict_memory():
+    global _memory_size
+    while _memory and _memory_size > _settings["memory_bytes"]:
+        _, (_, nbytes) = _memory.popitem(last=False)
+        _memory_size -= nbytes
+
+
+def _remember(key: str, value):
+    global _memory_size
+    nbytes = _nbytes(value)
+    if nbytes > _settings["memory_bytes"]:
+        return
+    with _lock:
+        if key in _memory:
+            return
+        _memory[key] = (value, nbytes)
+        _memory_size += nbytes
+        _evict_memory()
+
+
+def _disk_load(key: str):
+    path = _disk_dir() / f"{key}.pkl"
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(path)  # mark as recently used
+    return value
+
+
+def _disk_store(key: str, value):
+    directory = _disk_dir()
+    path = directory / f"{key}.pkl"
+    tmp = directory / f".{key}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _evict_disk(directory)
+
+
+def _evict_disk(directory):
+    entries = []
+    for path in directory.glob("*.pkl"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= _settings["disk_bytes"]:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def memoized(func):
+    """Memoize ``func(gdf, *args, **kwargs)`` when memoization is enabled."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(gdf, *args, **kwargs):
+        if not _settings["enabled"]:
+            return func(gdf, *args, **kwargs)
+        # Bind the arguments so that positional and keyword spellings of the
+        # same call, with or without defaults, share a key; the version keeps
+        # results of older releases of the function from being reused.
+        bound = signature.bind(gdf, *args, **kwargs)
+        bound.apply_defaults()
+        params = list(bound.arguments.items())[1:]
+        key = gdf_fingerprint(gdf, __version__, func.__module__, func.__qualname__, params)
+        with _lock:
+            entry = _memory.get(key)
+            if entry is not None:
+                _memory.move_to_end(key)
+        if entry is not None:
+            _stats["memory_hits"] += 1
+            return entry[0].copy()
+        value = _disk_load(key) if _settings["disk"] else None
+        if value is not None:
+            _stats["disk_hits"] += 1
+        else:
+            _stats["misses"] += 1
+            value = func(gdf, *args, **kwargs)
+            if _settings["disk"]:
+                try:
+                    _disk_store(key, value)
+                except OSError as error:
+                    logger.debug("could not persist memoized %s: %s", func.__name__, error)
+        _remember(key, value)
+        return value.copy()
+    return wrapper
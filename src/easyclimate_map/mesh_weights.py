@@ -0,0 +1,312 @@
+"""
+Region weights for unstructured meshes
+"""
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+import shapely
+from geopandas import GeoSeries
+
+from .cache import get_cache_dir, cache_lock
+from .layers import CHINA_ALBERS, get_layer_spec, _layer_fingerprint
+
+__all__ = [
+    "RegionWeights",
+    "mesh_cells",
+    "get_mesh_weights",
+]
+
+
+class RegionWeights:
+    """
+    Sparse cell x region overlap fractions of a mesh.
+
+    Entry ``(i, j)`` is the fraction of the area of mesh cell ``i`` lying in
+    region ``j``; cells entirely inside a region have weight 1, cells
+    outside all regions have no entries. The matrix is kept as COO arrays;
+    :meth:`to_scipy` converts it when SciPy is installed.
+
+    Parameters
+    ----------
+    cell, region : numpy.ndarray of int
+        Row (cell) and column (region) of each nonzero entry.
+    fraction : numpy.ndarray of float
+        Overlap fractions.
+    n_cells : int
+        Number of mesh cells.
+    labels : array-like
+        Region labels, one per column.
+
+    Examples
+    --------
+    >>> cells = mesh_cells(ds.vlon, ds.vlat, ds.vertex_of_cell.T, start_index=1)
+    >>> weights = get_mesh_weights(cells, "provinces_polygon")
+    >>> weights.aggregate(ds.tas.values)  # area-weighted province means
+    """
+
+    def __init__(self, cell, region, fraction, n_cells: int, labels):
+        self.cell = np.asarray(cell, dtype=np.int64)
+        self.region = np.asarray(region, dtype=np.int64)
+        self.fraction = np.asarray(fraction, dtype=np.float64)
+        self.n_cells = int(n_cells)
+        self.labels = np.asarray(labels, dtype=object)
+
+    @property
+    def shape(self) -> tuple:
+        return (self.n_cells, len(self.labels))
+
+    def __repr__(self) -> str:
+        return f"<RegionWeights: {self.n_cells} cells x {len(self.labels)} regions, {len(self.fraction)} nonzero>"
+
+    def to_scipy(self):
+        """Return the weights as a ``scipy.sparse.csr_matrix``."""
+        from scipy.sparse import coo_matrix
+
+        return coo_matrix((self.fraction, (self.cell, self.region)), shape=self.shape).tocsr()
+
+    def membership(self, min_fraction: float = 0.5) -> np.ndarray:
+        """
+        Return the region row each cell mostly lies in, or ``-1``.
+
+        Parameters
+        ----------
+        min_fraction : float, default 0.5
+            Cells whose largest overlap is below this belong to no region.
+
+        Returns
+        -------
+        numpy.ndarray of int
+        """
+        result = np.full(self.n_cells, -1, dtype=np.int64)
+        order = np.lexsort((self.fraction, self.cell))
+        # The last entry of each cell has its largest fraction.
+        last = np.r_[self.cell[order][1:] != self.cell[order][:-1], True]
+        best = order[last]
+        keep = self.fraction[best] >= min_fraction
+        result[self.cell[best][keep]] = self.region[best][keep]
+        return result
+
+    def aggregate(self, values, cell_area=None) -> np.ndarray:
+        """
+        Average cell values over each region, weighted by overlap.
+
+        Parameters
+        ----------
+        values : array-like
+            Cell values with the cell dimension last, e.g. ``(time, cell)``.
+            NaN values are ignored.
+        cell_area : array-like, optional
+            Cell areas, to weight cells of different size.
+
+        Returns
+        -------
+        numpy.ndarray
+            Region means with shape ``values.shape[:-1] + (n_regions,)``.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        weights = self.fraction if cell_area is None else self.fraction * np.asarray(cell_area)[self.cell]
+        sampled = values[..., self.cell]
+        valid = ~np.isnan(sampled)
+        shape = values.shape[:-1] + (len(self.labels),)
+        total = np.zeros(shape)
+        norm = np.zeros(shape)
+        np.add.at(total.T, self.region, np.where(valid, sampled * weights, 0.0).T)
+        np.add.at(norm.T, self.region, (valid * weights).T)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return total / norm
+
+    def save(self, path):
+        """Save the weights to an ``.npz`` file."""
+        np.savez_compressed(
+            path,
+            cell=self.cell,
+            region=self.region,
+            fraction=self.fraction,
+            n_cells=np.asarray(self.n_cells),
+            labels=np.asarray(json.dumps([_jsonable(v) for v in self.labels], ensure_ascii=False)),
+        )
+
+    @classmethod
+    def load(cls, path) -> "RegionWeights":
+        """Load weights written by :meth:`save`."""
+        with np.load(path) as data:
+            return cls(
+                data["cell"], data["region"], data["fraction"], int(data["n_cells"]),
+                json.loads(str(data["labels"])),
+            )
+
+
+def _jsonable(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def mesh_cells(lon, lat, connectivity, fill_value=None, start_index: int = 0) -> np.ndarray:
+    """
+    Build mesh cell polygons from vertex coordinates and connectivity.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        Vertex coordinates in degrees, shape ``(n_vertices,)``.
+    connectivity : array-like of int
+        Vertices of each cell, shape ``(n_cells, max_vertices)`` (e.g. the
+        transpose of ICON's ``vertex_of_cell`` or MPAS's
+        ``verticesOnCell``). Rows of cells with fewer vertices are padded
+        with ``fill_value``.
+    fill_value : int, optional
+        Padding value in ``connectivity``. Values outside the vertex range
+        are treated as padding too.
+    start_index : int, default 0
+        Index of the first vertex, 1 for Fortran-style connectivity.
+
+    Returns
+    -------
+    numpy.ndarray of shapely.Polygon
+        One polygon per cell. Longitudes of each cell are unwrapped around
+        its first vertex, so cells crossing the antimeridian stay compact.
+    """
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    conn = np.asarray(connectivity, dtype=np.int64) - start_index
+    if conn.ndim != 2:
+        raise ValueError("connectivity must have shape (n_cells, max_vertices)")
+    valid = (conn >= 0) & (conn < len(lon))
+    if fill_value is not None:
+        valid &= np.asarray(connectivity) != fill_value
+    counts = valid.sum(axis=1)
+    if (counts < 3).any():
+        raise ValueError("every cell needs at least 3 vertices")
+    vertices = conn[valid]
+    x, y = lon[vertices], lat[vertices]
+    first = np.repeat(x[np.cumsum(counts) - counts], counts)
+    x = first + (x - first + 180.0) % 360.0 - 180.0
+    # Close every ring by repeating its first vertex.
+    ring = np.repeat(np.arange(len(counts)), counts + 1)
+    position = np.cumsum(counts + 1) - (counts + 1)
+    take = np.arange(len(ring)) - np.repeat(position, counts + 1)
+    take = np.where(take == np.repeat(counts, counts + 1), 0, take) + np.repeat(np.cumsum(counts) - counts, counts + 1)
+    rings = shapely.linearrings(np.column_stack([x[take], y[take]]), indices=ring)
+    return shapely.polygons(rings)
+
+
+def _mesh_fingerprint(cells: np.ndarray) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(shapely.get_num_coordinates(cells).astype(np.int64).tobytes())
+    digest.update(np.ascontiguousarray(shapely.get_coordinates(cells)).tobytes())
+    return digest.hexdigest()
+
+
+def _clip_pairs(cells: np.ndarray, regions: np.ndarray, cell_idx: np.ndarray, region_idx: np.ndarray) -> np.ndarray:
+    """Intersect cells with regions, against tile-sized pieces of each region."""
+    bounds = shapely.bounds(cells[cell_idx])
+    margin = np.nanmax(bounds[:, 2:] - bounds[:, :2])
+    # Tiles a few cells wide, padded by the largest cell so every cell fits in
+    # the tile of its lower-left corner.
+    tile = max(8 * margin, 0.5)
+    key_x = np.floor(bounds[:, 0] / tile).astype(np.int64)
+    key_y = np.floor(bounds[:, 1] / tile).astype(np.int64)
+    keys = np.column_stack([region_idx, key_x, key_y])
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    boxes = shapely.box(
+        unique[:, 1] * tile, unique[:, 2] * tile,
+        (unique[:, 1] + 1) * tile + margin, (unique[:, 2] + 1) * tile + margin,
+    )
+    pieces = shapely.intersection(regions[unique[:, 0]], boxes)
+    return shapely.intersection(cells[cell_idx], pieces[inverse.ravel()])
+
+
+def _compute_weights(cells: np.ndarray, regions) -> RegionWeights:
+    region_geoms = np.asarray(regions.geometry.values)
+    shapely.prepare(region_geoms)
+    tree = shapely.STRtree(cells)
+    # Every intersecting (region, cell) pair in one indexed, vectorised pass.
+    region_idx, cell_idx = tree.query(region_geoms, predicate="intersects")
+    fraction = np.ones(len(cell_idx))
+    inside = shapely.contains_properly(region_geoms[region_idx], cells[cell_idx])
+    crossing = np.flatnonzero(~inside)
+    if len(crossing):
+        # Only cells straddling a boundary are clipped, and areas of the
+        # pieces are measured in an equal-area projection.
+        pieces = _clip_pairs(cells, region_geoms, cell_idx[crossing], region_idx[crossing])
+        projected = GeoSeries(np.concatenate([pieces, cells[cell_idx[crossing]]]), crs=4326).to_crs(CHINA_ALBERS)
+        area = projected.area.to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction[crossing] = np.clip(area[:len(crossing)] / area[len(crossing):], 0.0, 1.0)
+    keep = fraction > 0
+    order = np.lexsort((region_idx[keep], cell_idx[keep]))
+    return RegionWeights(
+        cell_idx[keep][order], region_idx[keep][order], fraction[keep][order],
+        len(cells), regions["region"].to_numpy(),
+    )
+
+
+def get_mesh_weights(cells, regions="provinces_polygon", region_column=None, cache: bool = True) -> RegionWeights:
+    """
+    Compute overlap fractions of mesh cells with polygon regions.
+
+    Candidate cell/region pairs come from a spatial index of the cells
+    queried with all regions at once; cells entirely inside a region get
+    weight 1 without clipping, and only cells crossing a region boundary
+    are intersected and measured in an equal-area projection. This scales
+    to meshes of millions of cells (ICON, MPAS, FESOM).
+
+    Weights for catalogue layers are stored in the cache directory (see
+    :func:`get_cache_dir`), keyed by the layer's content hash and a hash of
+    the cell coordinates, so a mesh is processed once.
+
+    Parameters
+    ----------
+    cells : array-like of shapely.Polygon, geopandas.GeoSeries or tuple
+        Cell polygons in longitude/latitude, or a ``(lon, lat,
+        connectivity)`` tuple passed to :func:`mesh_cells`.
+    regions : str or geopandas.GeoDataFrame, default "provinces_polygon"
+        Polygon layer, e.g. ``"nation_polygon"`` or ``"tp_basins"``.
+        Features sharing a ``region_column`` value form one region.
+    region_column : str, optional
+        Column labelling the regions. Defaults to the layer's name field
+        (``NAME``, ``BasinName``) or to the row position.
+    cache : bool, default True
+        Read and write the disk cache.
+
+    Returns
+    -------
+    RegionWeights
+    """
+    from .cell_cover import _regions
+    from .overlay import _prepare_regions
+
+    if isinstance(cells, tuple):
+        cells = mesh_cells(*cells)
+    if isinstance(cells, GeoSeries):
+        cells = cells.set_crs(4326) if cells.crs is None else cells.to_crs(4326)
+    cells = np.asarray(cells)
+
+    if not isinstance(regions, str):
+        return _compute_weights(cells, _prepare_regions(regions, region_column)[0])
+    name = get_layer_spec(regions).name
+    fingerprint = _layer_fingerprint(name)
+    prepared = _regions(name, region_column, fingerprint)
+    if not cache:
+        return _compute_weights(cells, prepared)
+
+    directory = get_cache_dir() / "mesh_weights"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / (
+        f"{name.replace('/', '__')}-{region_column or 'default'}-{fingerprint[:16]}-{_mesh_fingerprint(cells)}.npz"
+    )
+    if path.exists():
+        return RegionWeights.load(path)
+    with cache_lock(path.with_name(path.name + ".lock")):
+        if path.exists():
+            return RegionWeights.load(path)
+        weights = _compute_weights(cells, prepared)
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+        try:
+            weights.save(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+    return weights
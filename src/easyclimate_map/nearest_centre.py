@@ -0,0 +1,247 @@
+"""
+Nearest administrative centre lookup
+"""
+import json
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+from .cache import get_cache_dir, cache_lock
+from .layers import get_layer_spec, _layer_fingerprint, _resolve_layer
+
+__all__ = [
+    "CentreLookup",
+    "get_centre_lookup",
+    "nearest_centre",
+]
+
+# Mean Earth radius (IUGG), used for great-circle distances.
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _unit_vectors(lon, lat) -> np.ndarray:
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+class CentreLookup:
+    """
+    Nearest-centre queries against a point layer on the sphere.
+
+    Points are stored as 3-D unit vectors, where the straight-line (chord)
+    distance orders points exactly like the great-circle distance. Queries
+    use a :class:`scipy.spatial.cKDTree` of the vectors when SciPy is
+    installed, and otherwise a chunked brute-force search, which is fast
+    enough for the few hundred administrative centres.
+
+    Use :func:`get_centre_lookup` to get a cached lookup of a bundled layer.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        Centre coordinates in degrees.
+    names, codes : array-like
+        Name and code of each centre.
+
+    Examples
+    --------
+    >>> lookup = get_centre_lookup("administration_2nd")
+    >>> result = lookup.query(station_lon, station_lat, k=3)
+    >>> result["name"][:, 0], result["distance_km"][:, 0]
+    """
+
+    def __init__(self, lon, lat, names, codes):
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.names = np.asarray(names, dtype=object)
+        self.codes = np.asarray(codes)
+        self._vectors = _unit_vectors(self.lon, self.lat)
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            self._tree = None
+        else:
+            self._tree = cKDTree(self._vectors)
+
+    def __len__(self) -> int:
+        return len(self.lon)
+
+    def __repr__(self) -> str:
+        backend = "kd-tree" if self._tree is not None else "brute force"
+        return f"<CentreLookup: {len(self)} centres, {backend}>"
+
+    def _nearest(self, vectors: np.ndarray, k: int) -> tuple:
+        if self._tree is not None:
+            chord, index = self._tree.query(vectors, k=k)
+            return chord.reshape(len(vectors), k), index.reshape(len(vectors), k)
+        # Largest dot product = smallest chord.
+        dot = vectors @ self._vectors.T
+        if k < dot.shape[1]:
+            index = np.argpartition(-dot, k - 1, axis=1)[:, :k]
+        else:
+            index = np.broadcast_to(np.arange(dot.shape[1]), dot.shape).copy()
+        best = np.take_along_axis(dot, index, axis=1)
+        order = np.argsort(-best, axis=1)
+        index = np.take_along_axis(index, order, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        return np.sqrt(np.maximum(2.0 - 2.0 * best, 0.0)), index
+
+    def query(self, lon, lat, k: int = 1, chunk_size: int = 500_000) -> dict:
+        """
+        Find the ``k`` nearest centres of each point.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Point coordinates in degrees, of any matching shape.
+        k : int, default 1
+            Number of neighbours, ordered from nearest.
+        chunk_size : int, default 500000
+            Points processed at once, bounding peak memory.
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            ``"index"`` (row of the centre), ``"name"``, ``"code"`` and
+            ``"distance_km"`` (great-circle distance on a sphere of radius
+            :data:`EARTH_RADIUS_KM`). Arrays have the shape of ``lon`` for
+            ``k=1``, with an extra last axis of size ``k`` otherwise.
+        """
+        if not 1 <= k <= len(self):
+            raise ValueError(f"k must be between 1 and the number of centres ({len(self)})")
+        lon, lat = np.broadcast_arrays(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+        shape = lon.shape
+        lon, lat = lon.ravel(), lat.ravel()
+        chord = np.empty((len(lon), k))
+        index = np.empty((len(lon), k), dtype=np.int64)
+        for start in range(0, len(lon), chunk_size):
+            stop = min(start + chunk_size, len(lon))
+            chord[start:stop], index[start:stop] = self._nearest(_unit_vectors(lon[start:stop], lat[start:stop]), k)
+        distance = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+        out_shape = shape if k == 1 else shape + (k,)
+        return {
+            "index": index.reshape(out_shape),
+            "name": self.names[index].reshape(out_shape),
+            "code": self.codes[index].reshape(out_shape),
+            "distance_km": distance.reshape(out_shape),
+        }
+
+    def save(self, path):
+        """Save the centres to an ``.npz`` file."""
+        np.savez(
+            path,
+            lon=self.lon,
+            lat=self.lat,
+            codes=self.codes,
+            names=np.asarray(json.dumps([_jsonable(v) for v in self.names], ensure_ascii=False)),
+        )
+
+    @classmethod
+    def load(cls, path) -> "CentreLookup":
+        """Load centres written by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["lon"], data["lat"], json.loads(str(data["names"])), data["codes"])
+
+
+def _jsonable(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _from_layer(gdf, name_column, code_column) -> CentreLookup:
+    geoms = np.asarray(gdf.geometry.values)
+    valid = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    gdf, geoms = gdf[valid], geoms[valid]
+    # Multi-point or polygon features are represented by their centroid.
+    points = shapely.centroid(geoms)
+    names = gdf[name_column].to_numpy() if name_column is not None else gdf.index.to_numpy()
+    codes = gdf[code_column].to_numpy() if code_column is not None else np.arange(len(gdf))
+    return CentreLookup(shapely.get_x(points), shapely.get_y(points), names, codes)
+
+
+@lru_cache(maxsize=8)
+def _load_centre_lookup(name: str, fingerprint: str) -> CentreLookup:
+    spec = get_layer_spec(name)
+    name_column = spec.name_fields[0] if spec.name_fields else None
+    code_column = spec.code_fields[0] if spec.code_fields else None
+    directory = get_cache_dir() / "centres"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name.replace('/', '__')}-{fingerprint[:16]}.npz"
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                lookup = _from_layer(_resolve_layer(name), name_column, code_column)
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    lookup.save(tmp)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return lookup
+    return CentreLookup.load(path)
+
+
+def get_centre_lookup(layer="administration_2nd", name_column=None, code_column=None) -> CentreLookup:
+    """
+    Get the nearest-centre lookup of a point layer.
+
+    Lookups of catalogue layers are built once, with the centre coordinates,
+    names and codes stored in the cache directory (see
+    :func:`get_cache_dir`) keyed by the layer's content hash, and kept in
+    memory.
+
+    Parameters
+    ----------
+    layer : str or geopandas.GeoDataFrame, default "administration_2nd"
+        ``"administration_1st"`` (provincial capitals),
+        ``"administration_2nd"`` (prefecture centres), another point layer,
+        or a GeoDataFrame.
+    name_column, code_column : str, optional
+        Columns returned as ``name`` and ``code``. For catalogue layers they
+        default to the layer's name and code fields (``NAME``,
+        ``ADCODE99``); giving them skips the cache.
+
+    Returns
+    -------
+    CentreLookup
+    """
+    if isinstance(layer, str) and name_column is None and code_column is None:
+        spec = get_layer_spec(layer)
+        return _load_centre_lookup(spec.name, _layer_fingerprint(spec.name))
+    if isinstance(layer, str):
+        spec = get_layer_spec(layer)
+        name_column = name_column or (spec.name_fields[0] if spec.name_fields else None)
+        code_column = code_column or (spec.code_fields[0] if spec.code_fields else None)
+    return _from_layer(_resolve_layer(layer), name_column, code_column)
+
+
+def nearest_centre(lon, lat, layer="administration_2nd", k: int = 1, chunk_size: int = 500_000) -> dict:
+    """
+    Find the nearest administrative centres of points.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        Point coordinates in degrees.
+    layer : str or geopandas.GeoDataFrame, default "administration_2nd"
+        See :func:`get_centre_lookup`.
+    k : int, default 1
+        Number of neighbours.
+    chunk_size : int, default 500000
+        Points processed at once.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        See :meth:`CentreLookup.query`.
+
+    Examples
+    --------
+    >>> result = nearest_centre(lon2d, lat2d, layer="administration_1st")
+    >>> result["name"], result["distance_km"]
+    """
+    return get_centre_lookup(layer).query(lon, lat, k=k, chunk_size=chunk_size)
@@ -0,0 +1,188 @@
+"""
+Overlay statistics
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
+from pandas import DataFrame
+
+from .layers import CHINA_ALBERS, get_layer_spec, _resolve_layer
+from .spatial_index import PackedRTree, get_spatial_index
+
+__all__ = [
+    "overlay_statistics",
+]
+
+_STATISTICS = {"point": "count", "line": "length_km", "polygon": "area_km2"}
+
+
+def _geometry_kind(gdf: GeoDataFrame) -> str:
+    dims = shapely.get_dimensions(np.asarray(gdf.geometry.values))
+    dims = dims[dims >= 0]
+    if len(dims) == 0:
+        raise ValueError("layer has no geometries")
+    return ("point", "line", "polygon")[int(dims.max())]
+
+
+def _prepare_regions(regions, region_column) -> tuple:
+    if isinstance(regions, str):
+        spec = get_layer_spec(regions)
+        if region_column is None and spec.name_fields:
+            region_column = spec.name_fields[0]
+    gdf = _resolve_layer(regions)
+    if _geometry_kind(gdf) != "polygon":
+        raise ValueError("regions must be polygons")
+    if region_column is None:
+        gdf = gdf[["geometry"]].assign(region=np.arange(len(gdf)))
+    else:
+        gdf = gdf[gdf[region_column].notna()][[region_column, "geometry"]]
+        gdf = gdf.rename(columns={region_column: "region"})
+    # Islands and enclaves are separate features; one geometry per region.
+    return gdf.dissolve(by="region", as_index=False), region_column
+
+
+def _prepare_layers(layers) -> dict:
+    """Return ``{name: (lon/lat layer, spatial index in lon/lat)}``."""
+    if isinstance(layers, (str, GeoDataFrame)):
+        layers = [layers]
+    if not isinstance(layers, dict):
+        layers = {
+            (get_layer_spec(layer).name if isinstance(layer, str) else f"layer{i}"): layer
+            for i, layer in enumerate(layers)
+        }
+    prepared = {}
+    for name, layer in layers.items():
+        gdf = _resolve_layer(layer)
+        # Bundled layers reuse their persisted index.
+        if isinstance(layer, str):
+            index = get_spatial_index(layer)
+        else:
+            index = PackedRTree.from_geometries(gdf.geometry.values)
+        prepared[name] = (gdf, index)
+    return prepared
+
+
+class _Measure:
+    """Length, area or count of geometries in the chosen metric."""
+
+    def __init__(self, kind: str, metric: str):
+        self.kind = kind
+        self.metric = metric
+        if metric == "geodesic":
+            from pyproj import Geod
+            self.geod = Geod(ellps="WGS84")
+
+    def __call__(self, geoms: np.ndarray) -> np.ndarray:
+        if self.kind == "point":
+            return shapely.get_num_geometries(geoms).astype(float)
+        if self.metric == "albers":
+            values = shapely.length(geoms) if self.kind == "line" else shapely.area(geoms)
+            return np.asarray(values) / (1e3 if self.kind == "line" else 1e6)
+        if self.kind == "line":
+            return np.array([self.geod.geometry_length(g) for g in geoms]) / 1e3
+        return np.array([abs(self.geod.geometry_area_perimeter(g)[0]) for g in geoms]) / 1e6
+
+
+def _region_statistic(region, bbox, features, index, full_measure, measure, kind) -> tuple:
+    candidates = index.query_bbox(bbox)
+    shapely.prepare(region)
+    candidates = candidates[shapely.intersects(region, features[candidates])]
+    if len(candidates) == 0:
+        return 0.0, 0
+    inside = shapely.contains_properly(region, features[candidates])
+    value = full_measure[candidates[inside]].sum()
+    crossing = candidates[~inside]
+    if len(crossing):
+        # Only features straddling the boundary are clipped.
+        clipped = shapely.intersection(features[crossing], region)
+        if kind != "point":
+            clipped = shapely.get_parts(clipped)
+            clipped = clipped[shapely.get_dimensions(clipped) == ("point", "line", "polygon").index(kind)]
+        value += measure(clipped).sum() if len(clipped) else 0.0
+    return float(value), int(len(candidates))
+
+
+def overlay_statistics(
+    regions,
+    layers,
+    region_column=None,
+    metric: str = "albers",
+    n_jobs=None,
+) -> DataFrame:
+    """
+    Measure line length, polygon area or point counts of layers inside regions.
+
+    Candidate region/feature pairs are found with a packed spatial index
+    (see :func:`get_spatial_index`), features lying entirely inside a region
+    contribute their precomputed measure, and only features crossing the
+    region boundary are clipped. Regions are processed in parallel threads.
+
+    Parameters
+    ----------
+    regions : str or geopandas.GeoDataFrame
+        Polygon regions, either a catalogue name (e.g. ``"provinces_polygon"``,
+        ``"tp_basins"``) or a GeoDataFrame. Features sharing a
+        ``region_column`` value are merged into one region.
+    layers : str, geopandas.GeoDataFrame, list or dict
+        Layers to measure, e.g. ``["river3_line", "river3_polygon"]``. A dict
+        maps output layer names to catalogue names or GeoDataFrames.
+    region_column : str, optional
+        Column naming the regions. Defaults to the catalogue layer's name
+        field (``NAME``, ``BasinName``) or to the row position.
+    metric : {"albers", "geodesic"}, default "albers"
+        ``"albers"`` measures in an Albers equal-area projection centred on
+        China (exact areas, lengths within about 1 %); ``"geodesic"`` measures
+        on the WGS84 ellipsoid, which is exact but slower.
+    n_jobs : int, optional
+        Number of threads. Defaults to the executor's default.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Tidy table with one row per region and layer and the columns
+        ``region``, ``layer``, ``statistic`` (``"length_km"``, ``"area_km2"``
+        or ``"count"``), ``value`` and ``n_features`` (features intersecting
+        the region).
+
+    Examples
+    --------
+    >>> stats = overlay_statistics("provinces_polygon", ["river3_line", "river3_polygon"])
+    >>> stats.pivot(index="region", columns="statistic", values="value")
+    >>> overlay_statistics("tp_basins", "river1_line", metric="geodesic")
+    """
+    if metric not in ("albers", "geodesic"):
+        raise ValueError("metric must be either 'albers' or 'geodesic'")
+    regions, _ = _prepare_regions(regions, region_column)
+    layers = _prepare_layers(layers)
+    # Indexes are in longitude/latitude, whatever the measuring metric.
+    region_bounds = shapely.bounds(np.asarray(regions.geometry.values))
+    if metric == "albers":
+        regions = regions.to_crs(CHINA_ALBERS)
+    region_geoms = np.asarray(regions.geometry.values)
+
+    frames = []
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for name, (gdf, index) in layers.items():
+            kind = _geometry_kind(gdf)
+            if metric == "albers":
+                gdf = gdf.to_crs(CHINA_ALBERS)
+            features = np.asarray(gdf.geometry.values)
+            valid = ~(shapely.is_missing(features) | shapely.is_empty(features))
+            measure = _Measure(kind, metric)
+            full_measure = np.zeros(len(features))
+            full_measure[valid] = measure(features[valid])
+            results = list(pool.map(
+                lambda args: _region_statistic(args[0], args[1], features, index, full_measure, measure, kind),
+                zip(region_geoms, region_bounds),
+            ))
+            frames.append(DataFrame({
+                "region": regions["region"].to_numpy(),
+                "layer": name,
+                "statistic": _STATISTICS[kind],
+                "value": [value for value, _ in results],
+                "n_features": [count for _, count in results],
+            }))
+    return pd.concat(frames, ignore_index=True)
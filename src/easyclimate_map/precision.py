@@ -0,0 +1,129 @@
+"""
+Coordinate precision snapping
+"""
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame, GeoSeries
+
+from .cache import get_cache_dir, cache_lock
+
+__all__ = [
+    "snap_to_grid",
+]
+
+# read_shapefile_from_archive() arguments that select a subset of rows.
+_ROW_FILTERS = ("where", "sql", "skip_features", "max_features", "mask", "rows")
+
+
+def _snap(geoms: np.ndarray, grid_size: float) -> np.ndarray:
+    # "valid_output" keeps polygons valid: rings that collapse onto each other
+    # are merged rather than left crossing.
+    snapped = shapely.set_precision(geoms, grid_size, mode="valid_output")
+    # Drop the precision model again: GEOS would otherwise run every later
+    # overlay with snap-rounding, which is several times slower than
+    # floating-point overlay on the already snapped coordinates.
+    return shapely.set_precision(snapped, 0, mode="pointwise")
+
+
+def snap_to_grid(data, grid_size: float = 1e-6):
+    """
+    Snap coordinates to a fixed precision grid, preserving valid topology.
+
+    Near-coincident vertices along shared borders become identical and
+    duplicate vertices are removed, so later unions, intersections and
+    dissolves run on smaller geometries without sliver artefacts.
+
+    Parameters
+    ----------
+    data : geopandas.GeoDataFrame, geopandas.GeoSeries or array of geometries
+    grid_size : float, default 1e-6
+        Grid spacing in coordinate units. ``1e-6`` degrees is about 0.1 m,
+        far below the accuracy of the bundled layers.
+
+    Returns
+    -------
+    Same type as ``data``
+        A copy with snapped geometries. Geometries that collapse entirely
+        become empty.
+
+    See Also
+    --------
+    :func:`get_layer` : ``grid_size=`` returns bundled layers snapped once
+        and cached.
+    """
+    if grid_size <= 0:
+        raise ValueError("grid_size must be positive")
+    if isinstance(data, GeoDataFrame):
+        out = data.copy()
+        out[data.geometry.name] = GeoSeries(
+            _snap(np.asarray(data.geometry.values), grid_size), index=data.index, crs=data.crs
+        )
+        return out
+    if isinstance(data, GeoSeries):
+        return GeoSeries(_snap(np.asarray(data.values), grid_size), index=data.index, crs=data.crs, name=data.name)
+    return _snap(np.asarray(data), grid_size)
+
+
+def _save_geometries(path, geoms: np.ndarray, grid_size: float):
+    # In grid units every coordinate is an integer-valued double, whose
+    # zero low mantissa bits compress to a fraction of the raw size.
+    wkb = shapely.to_wkb(shapely.transform(geoms, lambda c: np.round(c / grid_size)))
+    sizes = np.array([len(w) if w is not None else -1 for w in wkb], dtype=np.int64)
+    blob = np.frombuffer(b"".join(w for w in wkb if w is not None), dtype=np.uint8)
+    np.savez_compressed(path, sizes=sizes, blob=blob, grid_size=np.asarray(grid_size))
+
+
+def _load_geometries(path) -> np.ndarray:
+    with np.load(path) as data:
+        sizes, blob, grid_size = data["sizes"], data["blob"].tobytes(), float(data["grid_size"])
+    ends = np.cumsum(np.maximum(sizes, 0))
+    wkb = [blob[end - size:end] if size >= 0 else None for size, end in zip(sizes, ends)]
+    return shapely.transform(shapely.from_wkb(np.array(wkb, dtype=object)), lambda c: c * grid_size)
+
+
+@lru_cache(maxsize=16)
+def _snapped_layer(name: str, grid_size: float, fingerprint: str) -> np.ndarray:
+    """Snapped geometries of a whole layer, by feature id."""
+    from .layers import get_layer_spec
+    from .tool import read_shapefile_from_archive
+
+    spec = get_layer_spec(name)
+    directory = get_cache_dir() / "precision"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name.replace('/', '__')}-{grid_size:g}-{fingerprint[:16]}.npz"
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                gdf = read_shapefile_from_archive(spec.path, member=spec.member, columns=[], encoding=spec.encoding)
+                geoms = _snap(np.asarray(gdf.geometry.values), grid_size)
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    _save_geometries(tmp, geoms, grid_size)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return geoms
+    return _load_geometries(path)
+
+
+def _snap_layer(gdf, name: str, grid_size: float, fids, kwargs: dict):
+    """Give ``gdf`` read from layer ``name`` the cached snapped geometries."""
+    if grid_size <= 0:
+        raise ValueError("grid_size must be positive")
+    if kwargs.get("ignore_geometry"):
+        return gdf
+    if fids is None and any(kwargs.get(key) is not None for key in _ROW_FILTERS):
+        # Rows cannot be matched to feature ids; snap what was read.
+        return snap_to_grid(gdf, grid_size)
+    from .layers import _layer_fingerprint
+
+    geoms = _snapped_layer(name, float(grid_size), _layer_fingerprint(name))
+    out = gdf.copy()
+    out[gdf.geometry.name] = GeoSeries(
+        geoms if fids is None else geoms[np.asarray(fids, dtype=np.int64)], index=gdf.index, crs=gdf.crs
+    )
+    return out
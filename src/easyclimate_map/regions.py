@@ -0,0 +1,254 @@
+"""
+Region-scoped layers
+"""
+import hashlib
+import json
+import os
+import pickle
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from geopandas import GeoDataFrame
+
+from .cache import get_cache_dir, file_fingerprint, cache_lock
+from .layers import get_layer, get_layer_spec, list_layers, _layer_fingerprint
+from .spatial_index import PackedRTree
+from .version import __version__
+
+__all__ = [
+    "get_region_geometry",
+    "clip_to_region",
+    "get_region_bundle",
+]
+
+
+def _region_from_provinces(region):
+    from .attribute_index import get_attribute_index
+    from .derived_layers import get_derived_layer
+
+    outlines = get_derived_layer("province_outlines")
+    index = get_attribute_index("provinces_polygon")
+    if isinstance(region, (int, np.integer)) or str(region).isdigit():
+        fids = index.lookup(codes=region)
+    else:
+        fids = index.lookup(names=region)
+    names = set(get_layer("provinces_polygon", columns=["NAME"], ignore_geometry=True).iloc[fids]["NAME"])
+    return shapely.union_all(outlines[outlines["NAME"].isin(names)].geometry.values)
+
+
+def _region_from_basins(region):
+    basins = get_layer("tp_basins", names=region)
+    return shapely.union_all(basins.to_crs(4326).geometry.values)
+
+
+_NATION_NAMES = {"china", "中国", "中华人民共和国", "nation"}
+
+# Layers that region names resolve through; caches of region-derived results
+# fingerprint all of them.
+_REGION_SOURCE_LAYERS = ("nation_polygon", "provinces_polygon", "tp_basins")
+
+
+def _region_source_fingerprints() -> dict:
+    return {name: file_fingerprint(get_layer_spec(name).path) for name in _REGION_SOURCE_LAYERS}
+
+
+def _region_from_nation(region):
+    from .derived_layers import get_derived_layer
+
+    if str(region).lower() not in _NATION_NAMES:
+        raise KeyError(region)
+    return shapely.union_all(get_derived_layer("nation_outline").geometry.values)
+
+
+@lru_cache(maxsize=64)
+def _resolve_region(region, source: str):
+    resolvers = {"nation": _region_from_nation, "provinces": _region_from_provinces, "basins": _region_from_basins}
+    tried = list(resolvers) if source == "auto" else [source]
+    for name in tried:
+        try:
+            geometry = resolvers[name](region)
+        except KeyError:
+            continue
+        shapely.prepare(geometry)
+        return geometry
+    raise KeyError(
+        f"Unknown region {region!r}; expected \"China\", a province (name or code) or a Tibetan Plateau basin"
+    )
+
+
+def get_region_geometry(region, source: str = "auto"):
+    """
+    Resolve a region name to its polygon.
+
+    Parameters
+    ----------
+    region : str, int, shapely geometry or geopandas.GeoDataFrame
+        ``"China"`` (or ``"中国"``) for the national territory, a province
+        name (``"四川省"``, ``"四川"``, ``"Sichuan"``) or code (``510000``),
+        a Tibetan Plateau basin name (``"Yangtze"``), or a
+        geometry / GeoDataFrame in longitude/latitude, which is returned
+        unioned.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+        Where to look up names. ``"auto"`` tries them in this order.
+
+    Returns
+    -------
+    shapely.Polygon or shapely.MultiPolygon
+        The region in longitude/latitude, with all parts merged. Resolved
+        names are cached.
+
+    Raises
+    ------
+    KeyError
+        If the name is not found.
+
+    Examples
+    --------
+    >>> sichuan = get_region_geometry("Sichuan")
+    >>> yangtze = get_region_geometry("Yangtze", source="basins")
+    """
+    if source not in ("auto", "nation", "provinces", "basins"):
+        raise ValueError("source must be one of 'auto', 'nation', 'provinces' or 'basins'")
+    if isinstance(region, GeoDataFrame):
+        from .layers import _as_lonlat
+        return shapely.union_all(_as_lonlat(region).geometry.values)
+    if isinstance(region, shapely.Geometry):
+        return region
+    return _resolve_region(region, source)
+
+
+def _clip_geometries(geoms: np.ndarray, region) -> np.ndarray:
+    """Clip ``geoms`` to ``region``, keeping only parts of their own dimension."""
+    dims = shapely.get_dimensions(geoms)
+    out = shapely.intersection(geoms, region)
+    empty = shapely.from_wkt("GEOMETRYCOLLECTION EMPTY")
+    mixed = shapely.get_type_id(out) == shapely.GeometryType.GEOMETRYCOLLECTION
+    for i in np.flatnonzero(mixed):
+        parts = shapely.get_parts(out[i])
+        parts = parts[shapely.get_dimensions(parts) == dims[i]]
+        out[i] = shapely.union_all(parts) if len(parts) else empty
+    # Features merely touching the region leave a lower-dimensional remnant
+    # (a shared border line, a touching point); drop those.
+    out[~mixed & (shapely.get_dimensions(out) < dims)] = empty
+    return out
+
+
+def clip_to_region(gdf: GeoDataFrame, region, source: str = "auto") -> GeoDataFrame:
+    """
+    Select and clip the features of a layer intersecting a region.
+
+    A packed spatial index selects candidate features; features entirely inside
+    the region are kept unchanged and only those crossing its boundary are
+    clipped.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        Layer in longitude/latitude.
+    region : str, int, shapely geometry or geopandas.GeoDataFrame
+        See :func:`get_region_geometry`.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        The intersecting features, keeping the original index.
+    """
+    region = get_region_geometry(region, source=source)
+    geoms = np.asarray(gdf.geometry.values)
+    candidates = PackedRTree.from_geometries(geoms).query_bbox(region.bounds)
+    candidates = candidates[shapely.intersects(region, geoms[candidates])]
+    out = gdf.iloc[candidates].copy()
+    geoms = geoms[candidates]
+    crossing = ~shapely.contains_properly(region, geoms)
+    if crossing.any():
+        geoms = geoms.copy()
+        geoms[crossing] = _clip_geometries(geoms[crossing], region)
+        out[gdf.geometry.name] = geoms
+    return out[~shapely.is_empty(geoms)]
+
+
+def _bundle_path(region, source: str, layers: tuple, fingerprints: tuple):
+    fingerprints = dict(zip(layers, fingerprints))
+    fingerprints.update(_region_source_fingerprints())
+    key = json.dumps(
+        [str(region), source, list(layers), fingerprints, __version__], sort_keys=True, ensure_ascii=False
+    )
+    directory = get_cache_dir() / "regions"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.pkl"
+
+
+def _build_bundle(region, source: str, layers: tuple) -> dict:
+    geometry = get_region_geometry(region, source=source)
+
+    def load(layer):
+        # Only features whose bounding box meets the region's are read, as
+        # found by the layer's persisted spatial index.
+        gdf = get_layer(layer, bbox=tuple(geometry.bounds))
+        return clip_to_region(gdf, geometry)
+
+    with ThreadPoolExecutor() as pool:
+        return dict(zip(layers, pool.map(load, layers)))
+
+
+@lru_cache(maxsize=16)
+def _load_bundle(region, source: str, layers: tuple, fingerprints: tuple) -> dict:
+    path = _bundle_path(region, source, layers, fingerprints)
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                bundle = _build_bundle(region, source, layers)
+                tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+                try:
+                    with open(tmp, "wb") as f:
+                        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return bundle
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def get_region_bundle(region, layers=None, source: str = "auto") -> dict:
+    """
+    Get bundled layers clipped to a province or Tibetan Plateau basin.
+
+    Each layer is read with a bounding-box filter, so only features near the
+    region are decoded, then features are selected with a spatial index and
+    clipped to the region (see :func:`clip_to_region`). Bundles are cached in
+    memory and in the cache directory (see :func:`get_cache_dir`).
+
+    Parameters
+    ----------
+    region : str or int
+        Province name or code, or basin name, see :func:`get_region_geometry`.
+    layers : list of str, optional
+        Catalogue names or aliases of the layers to include. Defaults to all
+        bundled layers.
+    source : {"auto", "nation", "provinces", "basins"}, default "auto"
+        Where to look up ``region``.
+
+    Returns
+    -------
+    dict of str to geopandas.GeoDataFrame
+        Clipped layers keyed by catalogue name.
+
+    Examples
+    --------
+    >>> bundle = get_region_bundle("Sichuan", layers=["river1", "river3_polygon", "administration_2nd"])
+    >>> bundle["river3_polygon"].plot()
+    >>> yangtze = get_region_bundle("Yangtze", layers=["river3"], source="basins")
+    """
+    if source not in ("auto", "nation", "provinces", "basins"):
+        raise ValueError("source must be one of 'auto', 'nation', 'provinces' or 'basins'")
+    if isinstance(region, (GeoDataFrame, shapely.Geometry)):
+        raise TypeError("get_region_bundle takes a region name or code; use clip_to_region for geometries")
+    layers = tuple(get_layer_spec(layer).name for layer in (layers or list_layers()))
+    region = int(region) if isinstance(region, np.integer) else region
+    bundle = _load_bundle(region, source, layers, tuple(_layer_fingerprint(layer) for layer in layers))
+    return {name: gdf.copy() for name, gdf in bundle.items()}
@@ -0,0 +1,266 @@
+"""
+Packed spatial index
+"""
+import heapq
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+from .cache import get_cache_dir, file_fingerprint, cache_lock
+
+__all__ = [
+    "PackedRTree",
+    "get_spatial_index",
+]
+
+_HILBERT_ORDER = 16
+
+
+def hilbert_distance(x: np.ndarray, y: np.ndarray, order: int = _HILBERT_ORDER) -> np.ndarray:
+    """Hilbert curve index of integer grid coordinates in ``[0, 2**order)``."""
+    x = x.astype(np.int64).copy()
+    y = y.astype(np.int64).copy()
+    d = np.zeros(len(x), dtype=np.int64)
+    s = 1 << (order - 1)
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve stays continuous.
+        flip = ~ry
+        swap_x = flip & rx
+        x[swap_x] = s - 1 - x[swap_x]
+        y[swap_x] = s - 1 - y[swap_x]
+        x[flip], y[flip] = y[flip], x[flip].copy()
+        s >>= 1
+    return d
+
+
+class PackedRTree:
+    """
+    Static R-tree of bounding boxes packed along a Hilbert curve.
+
+    Items are sorted by the Hilbert index of their box centres and grouped
+    into nodes of ``node_size`` consecutive entries, level by level, which
+    gives a balanced tree with tight nodes. The tree is a handful of flat
+    arrays, so it is saved and loaded with :meth:`save`/:meth:`load` in
+    constant time instead of being rebuilt.
+
+    Parameters
+    ----------
+    bounds : numpy.ndarray of shape (n, 4)
+        ``(minx, miny, maxx, maxy)`` of each item. Items with NaN bounds
+        (missing or empty geometries) are never returned.
+    node_size : int, default 16
+
+    Examples
+    --------
+    >>> tree = PackedRTree.from_geometries(get_zh_CN_river3().geometry)
+    >>> tree.query_bbox((102, 28, 106, 32))
+    >>> tree.nearest_candidates(104.06, 30.67)
+    """
+
+    def __init__(self, bounds, node_size: int = 16):
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        self.node_size = int(node_size)
+        self.n_items = len(bounds)
+        valid = np.flatnonzero(~np.isnan(bounds).any(axis=1))
+        boxes = bounds[valid]
+        if len(boxes):
+            lo = boxes[:, :2].min(axis=0)
+            span = np.maximum(boxes[:, 2:].max(axis=0) - lo, 1e-12)
+            centre = ((boxes[:, :2] + boxes[:, 2:]) / 2 - lo) / span
+            grid = np.clip(centre * ((1 << _HILBERT_ORDER) - 1), 0, (1 << _HILBERT_ORDER) - 1)
+            order = np.argsort(hilbert_distance(grid[:, 0], grid[:, 1]), kind="stable")
+        else:
+            order = np.array([], dtype=np.int64)
+        self.items = valid[order].astype(np.int64)
+        # levels[0] holds item boxes, the last level holds the root.
+        self.levels = [boxes[order]]
+        while len(self.levels[-1]) > 1:
+            self.levels.append(self._parents(self.levels[-1]))
+
+    def _parents(self, boxes: np.ndarray) -> np.ndarray:
+        starts = np.arange(0, len(boxes), self.node_size)
+        return np.column_stack([
+            np.minimum.reduceat(boxes[:, 0], starts),
+            np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts),
+            np.maximum.reduceat(boxes[:, 3], starts),
+        ])
+
+    @classmethod
+    def from_geometries(cls, geometries, node_size: int = 16) -> "PackedRTree":
+        """Build the tree from the bounds of shapely geometries."""
+        return cls(shapely.bounds(np.asarray(geometries)), node_size=node_size)
+
+    def __len__(self) -> int:
+        return self.n_items
+
+    def __repr__(self) -> str:
+        return f"<PackedRTree: {self.n_items} items, {len(self.levels)} levels, node size {self.node_size}>"
+
+    def _children(self, nodes: np.ndarray, n_below: int) -> np.ndarray:
+        starts = nodes * self.node_size
+        counts = np.minimum(starts + self.node_size, n_below) - starts
+        return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    def query_bbox(self, bbox) -> np.ndarray:
+        """
+        Return the sorted ids of items whose box intersects ``bbox``.
+
+        Parameters
+        ----------
+        bbox : tuple of float
+            ``(minx, miny, maxx, maxy)``.
+
+        Returns
+        -------
+        numpy.ndarray of int64
+        """
+        if not len(self.items):
+            return np.array([], dtype=np.int64)
+        minx, miny, maxx, maxy = bbox
+        nodes = np.arange(len(self.levels[-1]))
+        for level in range(len(self.levels) - 1, -1, -1):
+            boxes = self.levels[level][nodes]
+            hit = (boxes[:, 0] <= maxx) & (boxes[:, 2] >= minx) & (boxes[:, 1] <= maxy) & (boxes[:, 3] >= miny)
+            nodes = nodes[hit]
+            if level:
+                nodes = self._children(nodes, len(self.levels[level - 1]))
+        return np.sort(self.items[nodes])
+
+    def nearest_candidates(self, x: float, y: float) -> np.ndarray:
+        """
+        Return the ids of items that may hold the geometry nearest to a point.
+
+        A geometry lies inside its box, so its distance to the point is at
+        most the distance to the farthest box corner. Items whose box is
+        farther than the smallest such bound cannot be nearest; the
+        remaining candidates are returned ordered by box distance, to be
+        checked exactly by the caller.
+
+        Parameters
+        ----------
+        x, y : float
+
+        Returns
+        -------
+        numpy.ndarray of int64
+        """
+        if not len(self.items):
+            return np.array([], dtype=np.int64)
+
+        def distances(boxes):
+            dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+            dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+            fx = np.maximum(np.abs(x - boxes[:, 0]), np.abs(x - boxes[:, 2]))
+            fy = np.maximum(np.abs(y - boxes[:, 1]), np.abs(y - boxes[:, 3]))
+            return np.hypot(dx, dy), np.hypot(fx, fy)
+
+        top = len(self.levels) - 1
+        heap = [(0.0, top, 0)]
+        bound = np.inf
+        found = []
+        while heap:
+            distance, level, node = heapq.heappop(heap)
+            if distance > bound:
+                break
+            if level == 0:
+                found.append((distance, node))
+                continue
+            children = self._children(np.array([node]), len(self.levels[level - 1]))
+            near, far = distances(self.levels[level - 1][children])
+            bound = min(bound, far.min())
+            for d, child in zip(near, children):
+                if d <= bound:
+                    heapq.heappush(heap, (float(d), level - 1, int(child)))
+        return np.array([self.items[node] for distance, node in sorted(found) if distance <= bound], dtype=np.int64)
+
+    def save(self, path):
+        """Save the tree to an ``.npz`` file."""
+        sizes = np.array([len(level) for level in self.levels], dtype=np.int64)
+        np.savez(
+            path,
+            items=self.items,
+            boxes=np.concatenate(self.levels) if self.levels else np.empty((0, 4)),
+            sizes=sizes,
+            meta=np.array([self.node_size, self.n_items], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path) -> "PackedRTree":
+        """Load a tree written by :meth:`save`."""
+        with np.load(path) as data:
+            tree = cls.__new__(cls)
+            tree.node_size, tree.n_items = (int(v) for v in data["meta"])
+            tree.items = data["items"]
+            tree.levels = np.split(data["boxes"], np.cumsum(data["sizes"])[:-1])
+        return tree
+
+
+def _index_path(name: str):
+    from .layers import get_layer_spec
+
+    path = get_layer_spec(name).path
+    directory = get_cache_dir() / "spatial_index"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{name.replace('/', '__')}-{file_fingerprint(path)[:16]}.npz"
+
+
+@lru_cache(maxsize=None)
+def _load_spatial_index(name: str, path) -> PackedRTree:
+    if not path.exists():
+        with cache_lock(path.with_name(path.name + ".lock")):
+            if not path.exists():
+                from .layers import get_layer_spec
+                from .tool import read_shapefile_from_archive
+
+                spec = get_layer_spec(name)
+                gdf = read_shapefile_from_archive(
+                    spec.path, member=spec.member, columns=[], encoding=spec.encoding
+                )
+                tree = PackedRTree.from_geometries(gdf.geometry.values)
+                tmp = path.with_name(f".{path.stem}.{os.getpid()}.{uuid.uuid4().hex}.npz")
+                try:
+                    tree.save(tmp)
+                    os.replace(tmp, path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+                return tree
+    return PackedRTree.load(path)
+
+
+def get_spatial_index(layer: str) -> PackedRTree:
+    """
+    Get the packed spatial index of a bundled layer.
+
+    The index is built once from the feature bounds, stored in the cache
+    directory (see :func:`get_cache_dir`) keyed by the layer's content hash,
+    and loaded from there by later processes. Item ids are feature
+    ids, i.e. row positions of the full layer, as accepted by ``fids=`` in
+    :func:`get_layer`. Coordinates are those of the stored layer
+    (longitude/latitude).
+
+    Parameters
+    ----------
+    layer : str
+        Catalogue name or alias, see :func:`list_layers`.
+
+    Returns
+    -------
+    PackedRTree
+
+    Examples
+    --------
+    >>> index = get_spatial_index("river3_line")
+    >>> fids = index.query_bbox((102, 28, 106, 32))
+    >>> rivers = get_layer("river3_line", fids=fids)
+    """
+    from .layers import get_layer_spec
+
+    name = get_layer_spec(layer).name
+    return _load_spatial_index(name, _index_path(name))
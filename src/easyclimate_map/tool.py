@@ -3,29 +3,44 @@ Utility
 """
 import py7zr
 import geopandas as gpd
-import tempfile
+import logging
 import os
+import time
 
+from functools import lru_cache
+from pathlib import Path
 from geopandas import GeoDataFrame
+from .cache import get_cache_dir, file_fingerprint, cache_lock, atomic_directory
+from .memoize import memoized
+
+logger = logging.getLogger("easyclimate_map")
 
 __all__ = [
     "read_shapefile_from_7z", 
+    "read_shapefile_from_archive",
+    "list_archive_members",
+    "extract_archive_once",
+    "extract_7z_once",
     "extract_outer_boundary",
     "transfer_boundary_to_polygon"
 ]
 
-def read_shapefile_from_7z(filepath: str, **kwargs) -> GeoDataFrame:
+def read_shapefile_from_7z(filepath: str, member=None, **kwargs) -> GeoDataFrame:
     """
-    Read a shapefile directly from a 7z archive without extracting to disk.
+    Read a shapefile from a 7z archive.
     
-    This function extracts a shapefile from a compressed 7z archive into a temporary
-    directory, loads it as a GeoDataFrame using GeoPandas, and returns the result.
-    All keyword arguments are passed through to `gpd.read_file()`.
+    The archive is extracted once into the cache directory by
+    :func:`extract_archive_once`, and the shapefile is then read from there
+    as a GeoDataFrame using GeoPandas. All keyword arguments are passed
+    through to `gpd.read_file()`.
     
     Parameters
     ----------
     filepath : str
         Path to the 7z archive containing the shapefile.
+    member : str, optional
+        Shapefile to read when the archive holds several, see
+        :func:`read_shapefile_from_archive`. Defaults to the first one.
     **kwargs : dict, optional
         Additional keyword arguments to pass to `gpd.read_file()`.
         Common arguments include:
@@ -52,8 +67,10 @@ def read_shapefile_from_7z(filepath: str, **kwargs) -> GeoDataFrame:
     
     Notes
     -----
-    - The function creates a temporary directory that is automatically cleaned up.
-    - Only the first .shp file found in the archive will be read.
+    - The archive is decompressed once into the cache directory (see
+      :func:`get_cache_dir`), keyed by the archive's content hash, and reused
+      by later calls and other processes.
+    - Unless ``member`` is given, the first .shp file found in the archive is read.
     - Shapefile companion files (.shx, .dbf, .prj) must also be present in the archive.
     
     Examples
@@ -66,28 +83,164 @@ def read_shapefile_from_7z(filepath: str, **kwargs) -> GeoDataFrame:
     --------
     geopandas.read_file : For available keyword arguments and reading options.
     """
-    from functools import lru_cache
-    from pathlib import Path
+    return read_shapefile_from_archive(filepath, member=member, **kwargs)
+
+
+def read_shapefile_from_archive(filepath, member=None, **kwargs) -> GeoDataFrame:
+    """
+    Read a shapefile from a 7z or zip archive, a directory or a ``.shp`` file.
+
+    Archives are decompressed once into the cache directory, see
+    :func:`extract_archive_once`.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        Path to a ``.7z`` or ``.zip`` archive, a directory, or a ``.shp`` file.
+    member : str, optional
+        Shapefile to read when there are several, given by its path relative
+        to the archive or directory, its file name or its stem (see
+        :func:`list_archive_members`). Defaults to the first one.
+    **kwargs : dict, optional
+        Additional keyword arguments to pass to `gpd.read_file()`.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no (matching) shapefile.
+
+    Examples
+    --------
+    >>> list_archive_members("catchments.zip")
+    ['basins.shp', 'subbasins.shp']
+    >>> gdf = read_shapefile_from_archive("catchments.zip", member="subbasins")
+    """
+    start = time.perf_counter()
+    shp_file = _find_member(filepath, member)
+    gdf = gpd.read_file(shp_file, **kwargs)
+    logger.debug(
+        "read %s (%d features) in %.3f s",
+        Path(filepath).name if member is None else f"{Path(filepath).name}:{member}",
+        len(gdf), time.perf_counter() - start,
+    )
+    return gdf
 
-    @lru_cache(maxsize=10)
-    def extract_7z_once(filepath: str):
-        """Cache the decompression result to avoid repeated decompression."""
-        tmpdir = tempfile.mkdtemp()
+
+def list_archive_members(filepath) -> list:
+    """
+    List the shapefiles in a 7z or zip archive or a directory.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+
+    Returns
+    -------
+    list of str
+        Paths relative to the archive root, in sorted order.
+    """
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == ".shp":
+        return [filepath.name]
+    root = extract_archive_once(filepath)
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*.shp"))
+
+
+def _find_member(filepath, member=None) -> Path:
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == ".shp":
+        return filepath
+    members = list_archive_members(filepath)
+    if not members:
+        raise FileNotFoundError(f"No .shp file found in {filepath.name}")
+    if member is None:
+        chosen = members[0]
+    else:
+        matches = [m for m in members if member in (m, Path(m).name, Path(m).stem)]
+        if not matches:
+            raise FileNotFoundError(f"No shapefile {member!r} in {filepath.name}; available: {members}")
+        chosen = matches[0]
+    return extract_archive_once(filepath) / chosen
+
+
+def extract_archive_once(filepath) -> Path:
+    """
+    Decompress a 7z or zip archive into the cache directory, once.
+
+    The extraction directory is named after the archive and its content
+    hash, so it survives across processes and is invalidated automatically
+    when the archive changes. Concurrent processes coordinate through
+    :func:`cache_lock`: exactly one decompresses the archive into a temporary
+    directory that is renamed into place when complete, while the others
+    wait and then reuse it. Directories are returned unchanged.
+
+    Parameters
+    ----------
+    filepath : str or pathlib.Path
+        Path to the archive.
+
+    Returns
+    -------
+    pathlib.Path
+        Directory holding the extracted members.
+    """
+    filepath = Path(filepath)
+    if filepath.is_dir():
+        return filepath
+    if filepath.suffix.lower() not in (".7z", ".zip"):
+        raise ValueError(f"Unsupported archive format {filepath.suffix!r}; expected .7z or .zip")
+    return _extract_once(str(filepath.resolve()), file_fingerprint(filepath))
+
+
+def extract_7z_once(filepath) -> Path:
+    """Decompress a 7z archive into the cache directory, once; see :func:`extract_archive_once`."""
+    return extract_archive_once(filepath)
+
+
+def _extraction_dir(filepath, fingerprint: str) -> Path:
+    return get_cache_dir() / "archives" / f"{Path(filepath).stem}-{fingerprint[:16]}"
+
+
+def is_extracted(filepath) -> bool:
+    """Return whether :func:`extract_archive_once` has already extracted ``filepath``."""
+    return _extraction_dir(filepath, file_fingerprint(filepath)).exists()
+
+
+def _extract_all(filepath: str, target: Path):
+    if filepath.lower().endswith(".zip"):
+        import zipfile
+        with zipfile.ZipFile(filepath) as archive:
+            archive.extractall(path=target)
+    else:
         with py7zr.SevenZipFile(filepath, 'r') as archive:
-            archive.extractall(path=tmpdir)
-        return tmpdir
+            archive.extractall(path=target)
 
 
-    tmpdir = extract_7z_once(filepath)
-    shp_files = list(Path(tmpdir).glob("*.shp"))
-    
-    if not shp_files:
-        raise FileNotFoundError("No .shp file found in the 7z archive")
-    
-    return gpd.read_file(shp_files[0], **kwargs)
+@lru_cache(maxsize=None)
+def _extract_once(filepath: str, fingerprint: str) -> Path:
+    target = _extraction_dir(filepath, fingerprint)
+    if target.exists():
+        return target
+    start = time.perf_counter()
+    with cache_lock(target.with_name(target.name + ".lock")):
+        waited = time.perf_counter() - start
+        # Another process may have finished the extraction while we waited.
+        if not target.exists():
+            with atomic_directory(target) as tmp:
+                _extract_all(filepath, tmp)
+            logger.debug(
+                "extracted %s in %.3f s (waited %.3f s for lock)",
+                Path(filepath).name, time.perf_counter() - start - waited, waited,
+            )
+    return target
 
 
-def extract_outer_boundary(gdf, dissolve_by=None) -> GeoDataFrame:
+@memoized
+def extract_outer_boundary(gdf, dissolve_by=None, grid_size=None) -> GeoDataFrame:
     """
     Extract the outer boundary (exterior ring only) from a GeoDataFrame.
     
@@ -101,6 +254,11 @@ def extract_outer_boundary(gdf, dissolve_by=None) -> GeoDataFrame:
     dissolve_by : str or list of str, optional
         Column name(s) to dissolve by. If None (default), dissolves all features 
         into a single geometry.
+    grid_size : float, optional
+        Snap coordinates to this precision grid (e.g. ``1e-6`` degrees)
+        before dissolving, see :func:`snap_to_grid`. Near-coincident
+        vertices along shared borders then merge, which speeds up the
+        dissolve and avoids sliver artefacts.
     
     Returns
     -------
@@ -130,6 +288,9 @@ def extract_outer_boundary(gdf, dissolve_by=None) -> GeoDataFrame:
     - The output CRS is preserved from the input GeoDataFrame
     - If input contains multiple disconnected regions, output will be MultiLineString
     
+    Results can be memoized across calls and processes with
+    :func:`enable_memoization`.
+
     See Also
     --------
     geopandas.GeoDataFrame.dissolve : Dissolve geometries
@@ -143,6 +304,10 @@ def extract_outer_boundary(gdf, dissolve_by=None) -> GeoDataFrame:
     from shapely.geometry import MultiPolygon, MultiLineString, Polygon
     import geopandas as gpd
     
+    if grid_size is not None:
+        from .precision import snap_to_grid
+        gdf = snap_to_grid(gdf, grid_size)
+
     # Dissolve all features
     if dissolve_by is None:
         dissolved = gdf.dissolve()
@@ -181,7 +346,8 @@ def extract_outer_boundary(gdf, dissolve_by=None) -> GeoDataFrame:
     return boundary_gdf
 
 
-def transfer_boundary_to_polygon(boundary_gdf) -> GeoDataFrame:
+@memoized
+def transfer_boundary_to_polygon(boundary_gdf, grid_size=None) -> GeoDataFrame:
     """
     Convert boundary lines (LineString or MultiLineString) to polygon geometries.
     
@@ -193,6 +359,9 @@ def transfer_boundary_to_polygon(boundary_gdf) -> GeoDataFrame:
     boundary_gdf : geopandas.GeoDataFrame
         Input GeoDataFrame containing LineString or MultiLineString geometries
         representing polygon boundaries.
+    grid_size : float, optional
+        Snap the resulting polygons to this precision grid, see
+        :func:`snap_to_grid`.
     
     Returns
     -------
@@ -271,5 +440,8 @@ def transfer_boundary_to_polygon(boundary_gdf) -> GeoDataFrame:
         geometry=polygons,
         crs=boundary_gdf.crs
     )
+    if grid_size is not None:
+        from .precision import snap_to_grid
+        polygon_gdf = snap_to_grid(polygon_gdf, grid_size)
     
     return polygon_gdf
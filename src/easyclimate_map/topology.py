@@ -0,0 +1,335 @@
+"""
+TopoJSON export
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
+
+from .cache import get_cache_dir, file_fingerprint, cache_lock
+from .layers import get_layer_spec, _resolve_layer
+
+__all__ = [
+    "build_topology",
+    "export_topojson",
+]
+
+
+def _as_layers(layers) -> dict:
+    if isinstance(layers, (str, GeoDataFrame)):
+        layers = [layers]
+    if not isinstance(layers, dict):
+        layers = {
+            (get_layer_spec(layer).name if isinstance(layer, str) else f"layer{i}"): layer
+            for i, layer in enumerate(layers)
+        }
+    return layers
+
+
+class _ArcBuilder:
+    """Cut quantized lines and rings at junctions into shared, deduplicated arcs."""
+
+    def __init__(self):
+        self.arcs = []
+        self._index = {}
+
+    @staticmethod
+    def junctions(paths, closed) -> set:
+        """Coordinates where paths meet or diverge, as ``x << 32 | y`` keys."""
+        keys, pairs_lo, pairs_hi, ends = [], [], [], []
+        for path, is_closed in zip(paths, closed):
+            k = (path[:, 0] << 32) | path[:, 1]
+            if is_closed:
+                k = k[:-1]
+                prev, nxt = np.roll(k, 1), np.roll(k, -1)
+            else:
+                prev = np.concatenate([[-1], k[:-1]])
+                nxt = np.concatenate([k[1:], [-1]])
+                ends.extend((k[0], k[-1]))
+            keys.append(k)
+            pairs_lo.append(np.minimum(prev, nxt))
+            pairs_hi.append(np.maximum(prev, nxt))
+        if not keys:
+            return set()
+        table = pd.DataFrame({
+            "key": np.concatenate(keys),
+            "lo": np.concatenate(pairs_lo),
+            "hi": np.concatenate(pairs_hi),
+        }).drop_duplicates()
+        counts = table.groupby("key").size()
+        return set(counts.index[counts.to_numpy() > 1]) | set(ends)
+
+    def add(self, path: np.ndarray) -> int:
+        """Register one arc and return its index, ``~i`` if stored reversed."""
+        forward = path.tobytes()
+        if forward in self._index:
+            return self._index[forward]
+        backward = path[::-1].tobytes()
+        if backward in self._index:
+            return ~self._index[backward]
+        self._index[forward] = len(self.arcs)
+        self.arcs.append(path)
+        return len(self.arcs) - 1
+
+    def cut(self, path: np.ndarray, closed: bool, junctions: set) -> list:
+        keys = (path[:, 0] << 32) | path[:, 1]
+        if closed:
+            ring, ring_keys = path[:-1], keys[:-1]
+            at = np.flatnonzero(np.fromiter((k in junctions for k in ring_keys), bool, len(ring_keys)))
+            if len(at) == 0:
+                # A ring touching nothing: start at its smallest vertex so that
+                # equal rings from different features deduplicate.
+                start = int(np.argmin(ring_keys))
+                ring = np.roll(ring, -start, axis=0)
+                return [self.add(np.vstack([ring, ring[:1]]))]
+            ring = np.roll(ring, -at[0], axis=0)
+            path = np.vstack([ring, ring[:1]])
+            at = np.append(at - at[0], len(ring))
+        else:
+            at = np.flatnonzero(np.fromiter((k in junctions for k in keys), bool, len(keys)))
+            at = np.union1d(at, [0, len(path) - 1])
+        return [self.add(path[a:b + 1]) for a, b in zip(at[:-1], at[1:]) if b > a]
+
+
+def _quantize(coords: np.ndarray, translate, scale) -> np.ndarray:
+    q = np.round((coords - translate) / scale).astype(np.int64)
+    # Drop vertices that collapse onto their predecessor.
+    keep = np.ones(len(q), dtype=bool)
+    keep[1:] = (q[1:] != q[:-1]).any(axis=1)
+    return q[keep]
+
+
+def _simplify_arc(arc: np.ndarray, tolerance: float) -> np.ndarray:
+    if len(arc) <= 2 or tolerance <= 0:
+        return arc
+    closed = (arc[0] == arc[-1]).all()
+    simplified = shapely.get_coordinates(shapely.simplify(shapely.linestrings(arc), tolerance))
+    if closed and len(simplified) < 4:
+        return arc
+    return np.round(simplified).astype(np.int64)
+
+
+def _properties(row, columns) -> dict:
+    out = {}
+    for column in columns:
+        value = row[column]
+        if isinstance(value, np.generic):
+            value = value.item()
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        out[column] = value
+    return out
+
+
+def build_topology(
+    layers,
+    quantization: int = 100_000,
+    zoom=None,
+    tolerance: float = 1.0,
+    properties=None,
+) -> dict:
+    """
+    Encode layers as a quantized TopoJSON topology.
+
+    Polygon rings and lines are cut where features meet, and every shared
+    border is stored once as an arc that features reference by index
+    (negative for reversed use). Coordinates are quantized to integers on a
+    ``quantization x quantization`` grid over the bounding box and
+    delta-encoded, as in the TopoJSON specification.
+
+    Parameters
+    ----------
+    layers : str, geopandas.GeoDataFrame, list or dict
+        Catalogue names (e.g. ``"provinces_polygon"``) or GeoDataFrames in
+        longitude/latitude. A dict maps object names to layers. All layers
+        share one set of arcs.
+    quantization : int, default 100000
+        Number of grid steps across the bounding box of all layers; the
+        precision is the box span divided by ``quantization``. Over China
+        ``1e5`` gives steps of about 6e-4 degrees (50-70 m); ``1e4`` is
+        plenty for national overview maps.
+    zoom : int, optional
+        Simplify arcs for display at this web-map zoom level: vertices that
+        deviate less than ``tolerance`` screen pixels from the line are
+        removed. Shared borders stay shared. No simplification by default.
+    tolerance : float, default 1.0
+        Simplification tolerance in pixels at ``zoom``.
+    properties : list of str, optional
+        Attribute columns to keep. Defaults to all.
+
+    Returns
+    -------
+    dict
+        The topology, ready for :func:`json.dump`.
+
+    See Also
+    --------
+    :func:`export_topojson` : Write and cache the encoded topology.
+    """
+    layers = {name: _resolve_layer(layer) for name, layer in _as_layers(layers).items()}
+    bounds = np.array([shapely.total_bounds(np.asarray(gdf.geometry.values)) for gdf in layers.values()])
+    x0, y0 = np.nanmin(bounds[:, :2], axis=0)
+    x1, y1 = np.nanmax(bounds[:, 2:], axis=0)
+    n = int(quantization)
+    scale = np.array([max(x1 - x0, 1e-12) / (n - 1), max(y1 - y0, 1e-12) / (n - 1)])
+    translate = np.array([x0, y0])
+
+    # Quantize every ring and line; polygons get clockwise exteriors.
+    shapes = {}
+    paths, closed = [], []
+    for name, gdf in layers.items():
+        shapes[name] = []
+        for geom in shapely.normalize(np.asarray(gdf.geometry.values)):
+            if geom is None or geom.is_empty:
+                shapes[name].append(None)
+                continue
+            kind = shapely.get_type_id(geom)
+            parts = shapely.get_parts(geom)
+            encoded = []
+            for part in parts:
+                if kind in (shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON):
+                    rings = [part.exterior, *part.interiors]
+                    quantized = [_quantize(np.asarray(r.coords), translate, scale) for r in rings]
+                    quantized = [q for q in quantized if len(q) >= 4]
+                    if quantized:
+                        encoded.append([len(paths) + i for i in range(len(quantized))])
+                        paths.extend(quantized)
+                        closed.extend([True] * len(quantized))
+                elif kind in (shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING):
+                    q = _quantize(np.asarray(part.coords), translate, scale)
+                    if len(q) >= 2:
+                        encoded.append(len(paths))
+                        paths.append(q)
+                        closed.append(bool((q[0] == q[-1]).all()) and len(q) >= 4)
+                else:
+                    encoded.append(np.round((np.asarray(part.coords)[0] - translate) / scale).astype(int).tolist())
+            shapes[name].append((kind, encoded))
+
+    builder = _ArcBuilder()
+    junctions = builder.junctions(paths, closed)
+    path_arcs = [builder.cut(path, is_closed, junctions) for path, is_closed in zip(paths, closed)]
+
+    arcs = builder.arcs
+    if zoom is not None:
+        # Screen pixels at this zoom, converted to quantized units.
+        degrees = tolerance * 360.0 / (256 * 2 ** int(zoom))
+        arcs = [_simplify_arc(arc, degrees / scale.min()) for arc in arcs]
+
+    objects = {}
+    for name, gdf in layers.items():
+        columns = [c for c in gdf.columns if c != gdf.geometry.name]
+        if properties is not None:
+            columns = [c for c in columns if c in properties]
+        geometries = []
+        for (_, row), shape in zip(gdf.iterrows(), shapes[name]):
+            item = {"type": None}
+            if shape is not None and shape[1]:
+                kind, encoded = shape
+                if kind == shapely.GeometryType.POLYGON:
+                    item = {"type": "Polygon", "arcs": [path_arcs[i] for i in encoded[0]]}
+                elif kind == shapely.GeometryType.MULTIPOLYGON:
+                    item = {"type": "MultiPolygon", "arcs": [[path_arcs[i] for i in p] for p in encoded]}
+                elif kind == shapely.GeometryType.LINESTRING:
+                    item = {"type": "LineString", "arcs": path_arcs[encoded[0]]}
+                elif kind == shapely.GeometryType.MULTILINESTRING:
+                    item = {"type": "MultiLineString", "arcs": [path_arcs[i] for i in encoded]}
+                elif kind == shapely.GeometryType.POINT:
+                    item = {"type": "Point", "coordinates": encoded[0]}
+                else:
+                    item = {"type": "MultiPoint", "coordinates": encoded}
+            props = _properties(row, columns)
+            if props:
+                item["properties"] = props
+            geometries.append(item)
+        objects[name] = {"type": "GeometryCollection", "geometries": geometries}
+
+    def delta(arc):
+        arc = np.asarray(arc, dtype=np.int64)
+        return np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist()
+
+    return {
+        "type": "Topology",
+        "bbox": [float(x0), float(y0), float(x1), float(y1)],
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": objects,
+        "arcs": [delta(arc) for arc in arcs],
+    }
+
+
+def export_topojson(
+    layers,
+    path=None,
+    quantization: int = 100_000,
+    zoom=None,
+    tolerance: float = 1.0,
+    properties=None,
+) -> Path:
+    """
+    Write layers as compact TopoJSON, caching the output per parameter set.
+
+    When every layer is given by catalogue name, the encoded file is cached
+    in the cache directory (see :func:`get_cache_dir`), keyed by the layers'
+    content hashes and the encoding parameters, so repeated exports are a
+    file copy.
+
+    Parameters
+    ----------
+    layers : str, geopandas.GeoDataFrame, list or dict
+        See :func:`build_topology`.
+    path : str or pathlib.Path, optional
+        Output file. Without it, the path of the cached file is returned.
+    quantization, zoom, tolerance, properties
+        See :func:`build_topology`.
+
+    Returns
+    -------
+    pathlib.Path
+        The written TopoJSON file.
+
+    Examples
+    --------
+    >>> export_topojson("provinces_polygon", "provinces.topojson", quantization=10_000, zoom=5)
+    >>> export_topojson({"provinces": "provinces_polygon", "basins": "tp_basins"}, "china.topojson")
+    """
+    layers = _as_layers(layers)
+    params = dict(quantization=int(quantization), zoom=zoom, tolerance=float(tolerance), properties=properties)
+
+    def write(target: Path):
+        topology = build_topology(layers, **params)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(topology, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, target)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    if not all(isinstance(layer, str) for layer in layers.values()):
+        if path is None:
+            raise ValueError("path is required when exporting GeoDataFrames")
+        write(Path(path))
+        return Path(path)
+
+    key = json.dumps({
+        "layers": {name: [get_layer_spec(layer).name, file_fingerprint(get_layer_spec(layer).path)]
+                   for name, layer in layers.items()},
+        **params,
+    }, sort_keys=True)
+    directory = get_cache_dir() / "topojson"
+    directory.mkdir(parents=True, exist_ok=True)
+    cached = directory / f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.topojson"
+    if not cached.exists():
+        with cache_lock(cached.with_name(cached.name + ".lock")):
+            if not cached.exists():
+                write(cached)
+    if path is None:
+        return cached
+    shutil.copyfile(cached, path)
+    return Path(path)
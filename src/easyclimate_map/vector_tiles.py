@@ -0,0 +1,596 @@
+"""
+Vector tiles
+"""
+import gzip
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas import GeoDataFrame
+
+from .layers import list_layers, _resolve_layer
+
+__all__ = [
+    "encode_vector_tile",
+    "generate_vector_tiles",
+    "MBTilesReader",
+    "make_tile_handler",
+    "serve_vector_tiles",
+]
+
+# Web Mercator is undefined at the poles; clamp latitudes as every tile client does.
+MAX_LATITUDE = 85.0511287798
+
+_CMD_MOVE_TO = 1
+_CMD_LINE_TO = 2
+_CMD_CLOSE_PATH = 7
+
+_GEOM_POINT = 1
+_GEOM_LINESTRING = 2
+_GEOM_POLYGON = 3
+
+
+# ---------------------------------------------------------------------------
+# Minimal protobuf writer for the Mapbox Vector Tile 2.1 schema
+# ---------------------------------------------------------------------------
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _key(field, 0) + _varint(value)
+
+
+def _bytes_field(field: int, data: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _packed_field(field: int, values) -> bytes:
+    return _bytes_field(field, b"".join(_varint(int(v)) for v in values))
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return (values << 1) ^ (values >> 63)
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, (bool, np.bool_)):
+        return _uint_field(7, int(bool(value)))
+    if isinstance(value, (int, np.integer)):
+        return _uint_field(6, int(_zigzag(np.array([value]))[0]))
+    if isinstance(value, (float, np.floating)):
+        return _key(3, 1) + struct.pack("<d", float(value))
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def _command(cmd: int, count: int) -> int:
+    return (cmd & 0x7) | (count << 3)
+
+
+def _dedupe(coords: np.ndarray) -> np.ndarray:
+    """Drop consecutive duplicate vertices produced by integer rounding."""
+    if len(coords) < 2:
+        return coords
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    return coords[keep]
+
+
+class _GeometryEncoder:
+    """Encode integer tile coordinates as MVT commands, tracking the cursor."""
+
+    def __init__(self):
+        self.cursor = np.zeros(2, dtype=np.int64)
+        self.commands = []
+
+    def _deltas(self, coords: np.ndarray) -> list:
+        deltas = np.diff(coords, axis=0, prepend=self.cursor[None, :])
+        self.cursor = coords[-1]
+        return _zigzag(deltas).ravel().tolist()
+
+    def points(self, coords: np.ndarray):
+        self.commands.append(_command(_CMD_MOVE_TO, len(coords)))
+        self.commands.extend(self._deltas(coords))
+
+    def line(self, coords: np.ndarray, close: bool = False):
+        deltas = self._deltas(coords)
+        self.commands.append(_command(_CMD_MOVE_TO, 1))
+        self.commands.extend(deltas[:2])
+        self.commands.append(_command(_CMD_LINE_TO, len(coords) - 1))
+        self.commands.extend(deltas[2:])
+        if close:
+            self.commands.append(_command(_CMD_CLOSE_PATH, 1))
+
+
+def _signed_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0].astype(np.float64), ring[:, 1].astype(np.float64)
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _encode_geometry(geom):
+    """Return ``(geom_type, commands)`` or ``None`` if nothing survives rounding."""
+    encoder = _GeometryEncoder()
+    parts = shapely.get_parts(geom)
+    kind = shapely.get_type_id(parts[0]) if len(parts) else -1
+
+    if kind == 0:
+        coords = np.rint(shapely.get_coordinates(parts)).astype(np.int64)
+        encoder.points(coords)
+        return _GEOM_POINT, encoder.commands
+
+    if kind in (1, 2):
+        for part in parts:
+            coords = _dedupe(np.rint(shapely.get_coordinates(part)).astype(np.int64))
+            if len(coords) >= 2:
+                encoder.line(coords)
+        return (_GEOM_LINESTRING, encoder.commands) if encoder.commands else None
+
+    if kind == 3:
+        for part in parts:
+            rings = [shapely.get_exterior_ring(part)]
+            rings += list(shapely.get_interior_ring(part, range(shapely.get_num_interior_rings(part))))
+            for i, ring in enumerate(rings):
+                coords = _dedupe(np.rint(shapely.get_coordinates(ring)).astype(np.int64))[:-1]
+                if len(coords) < 3:
+                    if i == 0:
+                        break
+                    continue
+                area = _signed_area(coords)
+                if area == 0:
+                    if i == 0:
+                        break
+                    continue
+                # MVT exterior rings have positive area in y-down tile space,
+                # interior rings negative.
+                if (area > 0) != (i == 0):
+                    coords = coords[::-1]
+                encoder.line(coords, close=True)
+        return (_GEOM_POLYGON, encoder.commands) if encoder.commands else None
+
+    return None
+
+
+def encode_vector_tile(layers: dict, extent: int = 4096) -> bytes:
+    """
+    Encode features already in tile coordinates as a Mapbox Vector Tile.
+
+    Parameters
+    ----------
+    layers : dict
+        Mapping of layer name to an iterable of ``(id, geometry, properties)``
+        tuples. Geometries are shapely objects in integer tile space
+        (``0..extent``, y pointing down); properties are dicts.
+    extent : int, default 4096
+        Tile extent written into each layer.
+
+    Returns
+    -------
+    bytes
+        The uncompressed protobuf-encoded tile.
+    """
+    tile = bytearray()
+    for name, features in layers.items():
+        keys, values = {}, {}
+        encoded_features = bytearray()
+        for fid, geom, properties in features:
+            encoded = _encode_geometry(geom)
+            if encoded is None:
+                continue
+            geom_type, commands = encoded
+            tags = []
+            for key, value in properties.items():
+                if value is None or (not isinstance(value, str) and pd.isna(value)):
+                    continue
+                tags.append(keys.setdefault(key, len(keys)))
+                value_key = (type(value).__name__, value)
+                tags.append(values.setdefault(value_key, len(values)))
+            feature = bytearray()
+            if fid is not None:
+                feature += _uint_field(1, int(fid))
+            if tags:
+                feature += _packed_field(2, tags)
+            feature += _uint_field(3, geom_type)
+            feature += _packed_field(4, commands)
+            encoded_features += _bytes_field(2, bytes(feature))
+        if not encoded_features:
+            continue
+        layer = bytearray()
+        layer += _uint_field(15, 2)
+        layer += _bytes_field(1, name.encode("utf-8"))
+        layer += encoded_features
+        for key in keys:
+            layer += _bytes_field(3, key.encode("utf-8"))
+        for _, value in values:
+            layer += _bytes_field(4, _encode_value(value))
+        layer += _uint_field(5, extent)
+        tile += _bytes_field(3, bytes(layer))
+    return bytes(tile)
+
+
+# ---------------------------------------------------------------------------
+# Tile pyramid generation
+# ---------------------------------------------------------------------------
+
+def _lonlat_to_unit_mercator(coords: np.ndarray) -> np.ndarray:
+    lon = coords[:, 0]
+    lat = np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE)
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - np.arcsinh(np.tan(np.radians(lat))) / (2 * np.pi)
+    return np.column_stack([x, y])
+
+
+def _feature_properties(gdf: GeoDataFrame, columns) -> list:
+    columns = [c for c in (columns if columns is not None else gdf.columns) if c != gdf.geometry.name]
+    records = gdf[columns].to_dict("records")
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, np.generic):
+                record[key] = value.item()
+    return records
+
+
+def _field_types(gdf: GeoDataFrame, columns) -> dict:
+    columns = [c for c in (columns if columns is not None else gdf.columns) if c != gdf.geometry.name]
+    return {
+        c: ("Number" if gdf[c].dtype.kind in "iuf" else "Boolean" if gdf[c].dtype.kind == "b" else "String")
+        for c in columns
+    }
+
+
+def _iter_tiles(layers: dict, zoom: int, extent: int, buffer: int, tolerance: float):
+    """Yield ``(x, y, {layer: features})`` for every non-empty tile at ``zoom``."""
+    scale = (2 ** zoom) * extent
+    prepared = {}
+    tiles = set()
+    for name, (geoms, properties) in layers.items():
+        scaled = shapely.transform(geoms, lambda c: c * scale)
+        if tolerance > 0:
+            scaled = shapely.simplify(scaled, tolerance, preserve_topology=True)
+        valid = ~shapely.is_empty(scaled)
+        tree = shapely.STRtree(scaled)
+        prepared[name] = (scaled, tree, properties)
+        bounds = shapely.bounds(scaled[valid])
+        if len(bounds) == 0:
+            continue
+        x0 = np.floor((bounds[:, 0] - buffer) / extent).astype(int)
+        x1 = np.floor((bounds[:, 2] + buffer) / extent).astype(int)
+        y0 = np.floor((bounds[:, 1] - buffer) / extent).astype(int)
+        y1 = np.floor((bounds[:, 3] + buffer) / extent).astype(int)
+        limit = 2 ** zoom - 1
+        for a, b, c, d in zip(np.clip(x0, 0, limit), np.clip(x1, 0, limit), np.clip(y0, 0, limit), np.clip(y1, 0, limit)):
+            tiles.update((x, y) for x in range(a, b + 1) for y in range(c, d + 1))
+
+    for x, y in sorted(tiles):
+        rect = (x * extent - buffer, y * extent - buffer, (x + 1) * extent + buffer, (y + 1) * extent + buffer)
+        offset = np.array([x * extent, y * extent], dtype=np.float64)
+        content = {}
+        for name, (scaled, tree, properties) in prepared.items():
+            idx = tree.query(shapely.box(*rect))
+            if len(idx) == 0:
+                continue
+            idx.sort()
+            clipped = shapely.clip_by_rect(scaled[idx], *rect)
+            keep = ~shapely.is_empty(clipped)
+            if not keep.any():
+                continue
+            local = shapely.transform(clipped[keep], lambda c: c - offset)
+            content[name] = [(int(i), g, properties[i]) for i, g in zip(idx[keep], local)]
+        if content:
+            yield x, y, content
+
+
+def generate_vector_tiles(
+    path,
+    layers=None,
+    minzoom: int = 0,
+    maxzoom: int = 7,
+    extent: int = 4096,
+    buffer: int = 64,
+    tolerance: float = 8.0,
+    columns: Optional[dict] = None,
+) -> Path:
+    """
+    Cut bundled layers into a Mapbox Vector Tile pyramid stored as MBTiles.
+
+    Each zoom level is simplified and clipped independently, so low zooms stay
+    small while high zooms keep the full detail of the bundled data. Tiles are
+    gzip-compressed inside a single SQLite file following the MBTiles 1.3
+    specification, which any MBTiles-aware server (or :func:`serve_vector_tiles`)
+    can publish. Everything runs offline from the packaged data.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Output ``.mbtiles`` file. An existing file is replaced.
+    layers : list of str or dict, optional
+        Catalogue names (see :func:`list_layers`) or a mapping of tile layer
+        name to a GeoDataFrame. Defaults to every bundled layer.
+    minzoom, maxzoom : int, default 0 and 7
+        Range of zoom levels to generate.
+    extent : int, default 4096
+        Tile extent in integer tile units.
+    buffer : int, default 64
+        Clip buffer around each tile in tile units, avoiding seams when
+        renderers stroke lines across tile edges.
+    tolerance : float, default 8.0
+        Douglas-Peucker simplification tolerance in tile units, applied at
+        every zoom. ``0`` disables simplification.
+    columns : dict, optional
+        Mapping of layer name to the attribute columns to keep. Layers not
+        listed keep all attributes.
+
+    Returns
+    -------
+    pathlib.Path
+        Path to the written MBTiles file.
+
+    Examples
+    --------
+    >>> generate_vector_tiles("china.mbtiles", layers=["nation_line", "river1_line"], maxzoom=6)
+    >>> serve_vector_tiles("china.mbtiles", port=8080)
+
+    See Also
+    --------
+    :class:`MBTilesReader` : Read tiles from the generated archive.
+    """
+    path = Path(path)
+    if layers is None:
+        layers = list_layers()
+    if not isinstance(layers, dict):
+        layers = {name: name for name in layers}
+    columns = columns or {}
+
+    prepared = {}
+    vector_layers = []
+    bounds = None
+    for name, layer in layers.items():
+        gdf = _resolve_layer(layer)
+        gdf = gdf[~gdf.geometry.is_empty & gdf.geometry.notna()]
+        geoms = shapely.transform(np.asarray(gdf.geometry.values), _lonlat_to_unit_mercator)
+        prepared[name] = (geoms, _feature_properties(gdf, columns.get(name)))
+        vector_layers.append({
+            "id": name,
+            "fields": _field_types(gdf, columns.get(name)),
+            "minzoom": minzoom,
+            "maxzoom": maxzoom,
+        })
+        layer_bounds = gdf.total_bounds
+        bounds = layer_bounds if bounds is None else np.concatenate(
+            [np.minimum(bounds[:2], layer_bounds[:2]), np.maximum(bounds[2:], layer_bounds[2:])]
+        )
+
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        db.execute(
+            "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)"
+        )
+        db.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        for zoom in range(minzoom, maxzoom + 1):
+            rows = []
+            for x, y, content in _iter_tiles(prepared, zoom, extent, buffer, tolerance):
+                data = gzip.compress(encode_vector_tile(content, extent=extent), mtime=0)
+                # MBTiles rows follow the TMS scheme, i.e. y grows northwards.
+                rows.append((zoom, x, (2 ** zoom - 1) - y, sqlite3.Binary(data)))
+            db.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", rows)
+
+        bounds = [float(b) for b in (bounds if bounds is not None else (-180, -MAX_LATITUDE, 180, MAX_LATITUDE))]
+        center = [(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2, minzoom]
+        metadata = {
+            "name": path.stem,
+            "format": "pbf",
+            "type": "overlay",
+            "version": "1",
+            "description": "easyclimate-map bundled layers",
+            "minzoom": str(minzoom),
+            "maxzoom": str(maxzoom),
+            "bounds": ",".join(f"{b:.6f}" for b in bounds),
+            "center": ",".join(str(c) for c in center),
+            "json": json.dumps({"vector_layers": vector_layers}, ensure_ascii=False),
+        }
+        db.executemany("INSERT INTO metadata VALUES (?, ?)", list(metadata.items()))
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Tile serving
+# ---------------------------------------------------------------------------
+
+class MBTilesReader:
+    """
+    Thread-safe reader for MBTiles archives with an in-memory LRU tile cache.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        MBTiles file, e.g. written by :func:`generate_vector_tiles`.
+    cache_size : int, default 4096
+        Maximum number of tiles (including empty-tile misses) kept in memory.
+
+    Examples
+    --------
+    >>> reader = MBTilesReader("china.mbtiles")
+    >>> data = reader.get_tile(4, 12, 6)   # gzip-compressed protobuf or None
+    """
+
+    def __init__(self, path, cache_size: int = 4096):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No MBTiles file at {self.path}")
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self.metadata = dict(self._db.execute("SELECT name, value FROM metadata").fetchall())
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """
+        Return the stored tile data for XYZ tile ``(z, x, y)``.
+
+        Returns
+        -------
+        bytes or None
+            Gzip-compressed tile data, or ``None`` if the tile is empty.
+        """
+        key = (z, x, y)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, (2 ** z - 1) - y),
+            ).fetchone()
+            data = bytes(row[0]) if row is not None else None
+            self._cache[key] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return data
+
+    def tilejson(self, tile_url: str) -> dict:
+        """
+        Build a TileJSON 3.0 document for this archive.
+
+        Parameters
+        ----------
+        tile_url : str
+            URL template of the tiles, e.g. ``"http://localhost:8080/{z}/{x}/{y}.pbf"``.
+        """
+        meta = self.metadata
+        tilejson = {
+            "tilejson": "3.0.0",
+            "name": meta.get("name"),
+            "description": meta.get("description"),
+            "tiles": [tile_url],
+            "minzoom": int(meta.get("minzoom", 0)),
+            "maxzoom": int(meta.get("maxzoom", 14)),
+            "bounds": [float(b) for b in meta["bounds"].split(",")] if "bounds" in meta else None,
+        }
+        if "json" in meta:
+            tilejson.update(json.loads(meta["json"]))
+        return tilejson
+
+    def close(self):
+        """Close the underlying database connection."""
+        self._db.close()
+
+
+_TILE_PATTERN = re.compile(r"^/(\d+)/(\d+)/(\d+)\.(?:pbf|mvt)$")
+
+
+def make_tile_handler(reader: MBTilesReader):
+    """
+    Create an :mod:`http.server` request handler serving tiles from ``reader``.
+
+    The handler answers ``/{z}/{x}/{y}.pbf`` with gzip-encoded vector tiles
+    (``204 No Content`` for empty tiles) and ``/tiles.json`` with TileJSON.
+
+    Parameters
+    ----------
+    reader : MBTilesReader
+
+    Returns
+    -------
+    type
+        A :class:`http.server.BaseHTTPRequestHandler` subclass.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class TileHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes = b"", headers: Optional[dict] = None):
+            self.send_response(status)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body and self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_GET(self):
+            route = self.path.split("?", 1)[0]
+            if route in ("/tiles.json", "/metadata.json"):
+                host = self.headers.get("Host", "localhost")
+                body = json.dumps(reader.tilejson(f"http://{host}/{{z}}/{{x}}/{{y}}.pbf"), ensure_ascii=False)
+                self._send(200, body.encode("utf-8"), {"Content-Type": "application/json; charset=utf-8"})
+                return
+            match = _TILE_PATTERN.match(route)
+            if match is None:
+                self._send(404)
+                return
+            data = reader.get_tile(*map(int, match.groups()))
+            if data is None:
+                self._send(204)
+                return
+            self._send(200, data, {
+                "Content-Type": "application/vnd.mapbox-vector-tile",
+                "Content-Encoding": "gzip",
+                "Cache-Control": "public, max-age=86400",
+            })
+
+        do_HEAD = do_GET
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+
+def serve_vector_tiles(path, host: str = "127.0.0.1", port: int = 8080, cache_size: int = 4096):
+    """
+    Serve an MBTiles archive over HTTP until interrupted.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        MBTiles file written by :func:`generate_vector_tiles`.
+    host : str, default "127.0.0.1"
+        Interface to bind.
+    port : int, default 8080
+        Port to listen on.
+    cache_size : int, default 4096
+        Size of the in-memory tile cache, see :class:`MBTilesReader`.
+
+    Examples
+    --------
+    >>> serve_vector_tiles("china.mbtiles", port=8080)
+    # MapLibre source: {"type": "vector", "url": "http://127.0.0.1:8080/tiles.json"}
+    """
+    from http.server import ThreadingHTTPServer
+
+    reader = MBTilesReader(path, cache_size=cache_size)
+    server = ThreadingHTTPServer((host, port), make_tile_handler(reader))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        reader.close()